@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import logging
+import threading
+from typing import NamedTuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import httpx
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Testbook API Request Policy (timeouts, retries, circuit breaker)
+# -----------------------------------------------------------------------------
+# Pehle har call par ek hi `timeout=300` tha, transient errors par retry nahi
+# hota tha aur error ek string ban kar lautta tha. Ab:
+#   - har endpoint class (search / browse / test / submit) ke alag connect,
+#     read, write aur pool timeouts - ek atka hua read 5 minute nahi khaata
+#   - idempotent GETs par connect/timeout/5xx/429 mein jittered exponential
+#     backoff ke saath retry (POST submit kabhi retry nahi hota)
+#   - circuit breaker: lagatar transient failures par API "band" maan li jaati
+#     hai; sirf bulk jobs ki calls (caller `wait_for_breaker=True` deta hai)
+#     cooldown tak rukti hain (jobs pause), baaki sab - search/browse, single
+#     download, prefetch - turant ApiError('circuit_open') lautate hain, taaki
+#     worker threads atke na rahein. Cooldown ke baad ek probe request jaati
+#     hai - safal ho toh sab aage badhte hain.
+#   - errors ApiError (typed) ke roop mein lautte hain
+#   - (opt-in) hedging: test data/answers ka GET haal ki latencies ke percentile
+#     se zyada der le toh wahi GET dobara bhejo, jo pehle aaye woh lo
+# -----------------------------------------------------------------------------
+
+
+class EndpointPolicy(NamedTuple):
+    """Ek endpoint class ke timeouts aur retry/hedging ka bartaav. (Breaker par rukna caller tay karta hai.)"""
+    timeout: httpx.Timeout
+    retry: bool          # Transient errors par retry (sirf idempotent calls)
+    hedge: bool = False  # Hedging on ho toh slow GET ka duplicate bhejna
+
+
+POLICIES = {
+    # Interactive: user jawab ka intezaar kar raha hai - jaldi fail
+    'search': EndpointPolicy(httpx.Timeout(15.0, connect=5.0, pool=5.0), retry=True),
+    'browse': EndpointPolicy(httpx.Timeout(30.0, connect=5.0, pool=10.0), retry=True),
+    # Test extraction: bade responses
+    'test': EndpointPolicy(httpx.Timeout(60.0, connect=10.0, pool=30.0), retry=True, hedge=True),
+    # Attempt start (/instructions GET) aur submit POST: state badalte hain - na retry, na hedge
+    'submit': EndpointPolicy(httpx.Timeout(60.0, connect=10.0, pool=30.0), retry=False),
+}
+
+
+class ApiError(NamedTuple):
+    """
+    Request fail hone ka typed result. `kind`: 'timeout' | 'connect' | 'http' | 'invalid_json' |
+    'circuit_open' | 'request'. `status`/`body` sirf HTTP errors mein.
+    """
+    kind: str
+    message: str
+    status: int | None = None
+    body: str = ''
+    retry_after: float | None = None
+
+    @property
+    def transient(self) -> bool:
+        """Kya yeh API/network ki asthaayi kharabi hai (retry aur breaker ke liye)."""
+        if self.kind in ('timeout', 'connect'):
+            return True
+        return self.kind == 'http' and (self.status == 429 or (self.status or 0) >= 500)
+
+    def __str__(self) -> str:
+        if self.kind == 'http':
+            return f"Client Error: {self.status} - {self.body[:500]}"
+        return f"Request Error ({self.kind}): {self.message}"
+
+
+def classify_error(error: Exception) -> ApiError:
+    """httpx exception (ya HTTP error response) ko ApiError mein badalta hai."""
+    if isinstance(error, httpx.TimeoutException):
+        return ApiError('timeout', f"{type(error).__name__}: {error}")
+    if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+        return ApiError('connect', f"{type(error).__name__}: {error}")
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        retry_after = None
+        try:
+            retry_after = float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            pass
+        return ApiError('http', str(error), response.status_code, response.text, retry_after)
+    if isinstance(error, ValueError):
+        return ApiError('invalid_json', str(error))
+    return ApiError('request', f"{type(error).__name__}: {error}")
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Full-jitter exponential backoff: 0 aur min(cap, base * 2^attempt) ke beech random."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Lagatar `failure_threshold` transient failures par khulta hai. Khula ho toh `cooldown` ke baad
+    ek probe call jaane deta hai; probe fail ho toh cooldown double (max `max_cooldown` tak).
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, max_cooldown: float = 300.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self._cond = threading.Condition()
+        self._failures = 0
+        self._open_until = None # None = band (closed)
+        self._cooldown = cooldown
+        self._probing = False
+
+        # /stats ke liye counters
+        self.times_opened = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._open_until is None:
+            return 'closed'
+        return 'half-open' if self._probing or time.monotonic() >= self._open_until else 'open'
+
+    def acquire(self, wait: bool) -> bool:
+        """Call jaane de (True) ya nahi (False, sirf `wait=False` par). `wait=True` par breaker band hone tak rukta hai."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if self._open_until is None:
+                    break
+                now = time.monotonic()
+                if now >= self._open_until and not self._probing:
+                    self._probing = True # Yahi call probe hai
+                    break
+                if not wait:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(timeout=max(0.5, self._open_until - now) if not self._probing else 5.0)
+        waited = time.monotonic() - started
+        if waited > 0.5:
+            self.waited_seconds += waited
+        return True
+
+    def record_success(self):
+        with self._cond:
+            self._failures = 0
+            if self._open_until is not None:
+                logger.info("Testbook API dobara theek hai - circuit breaker band, rukke hue calls aage badh rahe hain.")
+            self._open_until = None
+            self._probing = False
+            self._cooldown = self.base_cooldown
+            self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self._failures += 1
+            if self._probing:
+                # Probe bhi fail - aur der tak band
+                self._probing = False
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                self._open_until = time.monotonic() + self._cooldown
+                logger.warning(f"Testbook API probe fail - circuit breaker {self._cooldown:.0f}s ke liye phir khula.")
+                self._cond.notify_all()
+            elif self._open_until is None and self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self._cooldown
+                self.times_opened += 1
+                logger.warning(
+                    f"Testbook API par lagatar {self._failures} failures - circuit breaker {self._cooldown:.0f}s ke liye khula "
+                    f"(bulk jobs ruke rahenge)."
+                )
+
+    def release(self):
+        """Probe ka result API ke baare mein kuch nahi batata (local error) - agla call probe ban sake."""
+        with self._cond:
+            self._probing = False
+            self._cond.notify_all()
+
+
+class Hedger:
+    """
+    Hedged GETs: pehla request `percentile` latency (endpoint ki haal ki successful calls se) tak na
+    lautaye toh wahi request dobara jaata hai; jo pehle safal ho uska result, doosre ko cancel signal.
+    Kaafi samples na hon tab tak `max_delay` use hota hai.
+    """
+
+    def __init__(self, percentile: float = 95, min_delay: float = 0.5, max_delay: float = 10.0,
+                 window: int = 200, min_samples: int = 20, max_workers: int = 16):
+        self.percentile = min(max(percentile, 50), 99.9)
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {} # endpoint -> deque(latency seconds)
+        self._pool = ThreadPoolExecutor(max_workers=max(2, max_workers), thread_name_prefix='api-hedge')
+
+        # /stats ke liye counters
+        self.calls = 0
+        self.fired = 0      # Kitni baar duplicate bheja gaya
+        self.hedge_wins = 0 # ...aur duplicate pehle safal hua
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, endpoint: str) -> float:
+        """Duplicate bhejne se pehle kitna rukna hai (haal ki latencies ka percentile)."""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < self.min_samples:
+            return self.max_delay
+        value = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    def _timed(self, endpoint: str, call, cancelled: threading.Event):
+        started = time.monotonic()
+        result = call(cancelled)
+        if not cancelled.is_set():
+            self.record(endpoint, time.monotonic() - started)
+        return result
+
+    def run(self, endpoint: str, call):
+        """
+        `call(cancelled)` (threading.Event leta hai; set ho toh jaldi chhod de) hedging ke saath chalata hai.
+        Pehla safal result return; dono fail hon toh pehle request ki exception raise.
+        """
+        with self._lock:
+            self.calls += 1
+        primary_cancel, hedge_cancel = threading.Event(), threading.Event()
+        primary = self._pool.submit(self._timed, endpoint, call, primary_cancel)
+        done, _ = wait([primary], timeout=self.delay(endpoint))
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.fired += 1
+        hedge = self._pool.submit(self._timed, endpoint, call, hedge_cancel)
+        cancels = {primary: primary_cancel, hedge: hedge_cancel}
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        cancels[other].set() # Haarne wala request body padhe bina band ho jaata hai
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+        raise primary.exception()
+
+    def render_text(self) -> str:
+        win_rate = self.hedge_wins / self.fired * 100 if self.fired else 0
+        return f"hedge: {self.fired}/{self.calls} fired, {self.hedge_wins} jeete ({win_rate:.0f}%)"
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ek admin ka download chal raha ho, tab doosre admin ke message ka reply kitni der mein aata hai?
+
+Bina network ke chalta hai - "download" ek blocking sleep hai (jaise sync extractor call).
+Run:  python benchmarks/bench_concurrent_updates.py
+"""
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update, Message, Chat, User
+from telegram.ext import SimpleUpdateProcessor
+
+from update_processor import PerChatUpdateProcessor
+
+DOWNLOAD_SECONDS = 2.0 # User A ka "test extraction" kitna lamba hai
+SECOND_USER_DELAY = 0.1 # User B kitni der baad message bhejta hai
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Update:
+    user = User(id=chat_id, first_name=f"admin{chat_id}", is_bot=False)
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.now(timezone.utc), chat=chat, from_user=user, text=text)
+    return Update(update_id=update_id, message=message)
+
+
+async def scenario(label: str, processor, sequential: bool, offload: bool) -> float:
+    """User A download shuru karta hai, user B thodi der baad /menu bhejta hai. B ki latency return karta hai."""
+    await processor.initialize()
+    loop = asyncio.get_running_loop()
+    b_sent_at = None
+    b_latency = None
+
+    async def download():
+        if offload:
+            await asyncio.to_thread(time.sleep, DOWNLOAD_SECONDS) # Naya bot: worker thread
+        else:
+            time.sleep(DOWNLOAD_SECONDS) # Purana bot: event loop block
+
+    async def quick_reply():
+        nonlocal b_latency
+        b_latency = loop.time() - b_sent_at
+
+    update_a = make_update(1, 111, "5")
+    update_b = make_update(2, 222, "/menu")
+
+    if sequential:
+        # Default Application: updates ek ke baad ek await hote hain
+        async def feed():
+            nonlocal b_sent_at
+            b_sent_at = loop.time() + SECOND_USER_DELAY # B ka message download ke beech mein aata hai
+            await processor.process_update(update_a, download())
+            await processor.process_update(update_b, quick_reply())
+        await feed()
+    else:
+        # B ka message download ke beech mein aata hai; blocking download mein loop tab tak B ko dekh hi nahi paata
+        b_sent_at = loop.time() + SECOND_USER_DELAY
+        task_a = asyncio.create_task(processor.process_update(update_a, download()))
+        await asyncio.sleep(SECOND_USER_DELAY)
+        task_b = asyncio.create_task(processor.process_update(update_b, quick_reply()))
+        await asyncio.gather(task_a, task_b)
+
+    await processor.shutdown()
+    print(f"{label:<48} second user latency: {b_latency * 1000:8.1f} ms")
+    return b_latency
+
+
+async def check_per_chat_order():
+    """Ek hi chat ke do updates: pehla slow ho tab bhi doosra uske baad hi chalna chahiye."""
+    processor = PerChatUpdateProcessor(16)
+    order = []
+
+    async def handler(name, delay):
+        await asyncio.sleep(delay)
+        order.append(name)
+
+    await asyncio.gather(
+        processor.process_update(make_update(1, 111, "1"), handler("first", 0.3)),
+        processor.process_update(make_update(2, 111, "html"), handler("second", 0.0)),
+    )
+    status = "OK" if order == ["first", "second"] else "FAIL"
+    print(f"{'Per-chat ordering (same chat, slow first update)':<48} {order} -> {status}")
+
+
+async def main():
+    print(f"Download = {DOWNLOAD_SECONDS}s, second user arrives after {SECOND_USER_DELAY}s\n")
+    await scenario("Old: sequential updates, blocking extractor", SimpleUpdateProcessor(1), sequential=True, offload=False)
+    await scenario("Concurrent updates, blocking extractor", PerChatUpdateProcessor(16), sequential=False, offload=False)
+    await scenario("New: per-chat concurrent + worker thread", PerChatUpdateProcessor(16), sequential=False, offload=True)
+    await check_per_chat_order()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Webhook mode ko bina asli Telegram ke test karta hai.
+
+Ek chhota fake Bot API server (getMe/setWebhook/sendMessage) local chalta hai, bot ka
+Application usi par point hota hai, aur script Telegram ki tarah webhook URL par updates
+POST karta hai. Har push se bot ke reply (sendMessage) tak ki latency print hoti hai,
+aur galat secret token wala push reject hona chahiye.
+
+Run:  python benchmarks/simulate_webhook_push.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import bot
+from config import BOT_OWNER_ID
+
+FAKE_API_PORT = 18081
+WEBHOOK_PORT = 18443
+SECRET = "local-simulation-secret"
+PUSHES = 20
+
+bot_user = {"id": 1, "is_bot": True, "first_name": "TestBot", "username": "test_bot"}
+replies = asyncio.Queue() # sendMessage aane par (time, chat_id)
+webhook_calls = []
+
+
+async def fake_bot_api(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Bahut simple Bot API: har method ko 'ok' response deta hai."""
+    try:
+        request_line = (await reader.readline()).decode('latin-1')
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b''
+        method = request_line.split()[1].rsplit('/', 1)[-1]
+
+        result = True
+        if method == 'getMe':
+            result = bot_user
+        elif method in ('setWebhook', 'deleteWebhook'):
+            webhook_calls.append(method)
+        elif method == 'sendMessage':
+            # PTB parameters form-encoded bhejta hai
+            params = dict(parse_qsl(body.decode('utf-8')))
+            chat_id = int(params.get('chat_id'))
+            replies.put_nowait((time.perf_counter(), chat_id))
+            result = {"message_id": 1000, "date": int(time.time()), "text": params.get('text', ''),
+                      "chat": {"id": chat_id, "type": "private"}, "from": bot_user}
+
+        payload = json.dumps({"ok": True, "result": result}).encode('utf-8')
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+def start_update(update_id: int) -> dict:
+    user = {"id": BOT_OWNER_ID, "is_bot": False, "first_name": "Owner"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            "chat": {"id": BOT_OWNER_ID, "type": "private"}, "from": user,
+        },
+    }
+
+
+async def main():
+    api_server = await asyncio.start_server(fake_bot_api, '127.0.0.1', FAKE_API_PORT)
+    application = bot.build_application(base_url=f"http://127.0.0.1:{FAKE_API_PORT}/bot")
+
+    options = bot.webhook_options()
+    options.update(listen='127.0.0.1', port=WEBHOOK_PORT, secret_token=SECRET,
+                   webhook_url=f"http://127.0.0.1:{WEBHOOK_PORT}/{options['url_path']}")
+    push_url = options['webhook_url']
+
+    await application.initialize()
+    await application.updater.start_webhook(**options)
+    await application.start()
+    print(f"Webhook server: {push_url} (setWebhook called: {'setWebhook' in webhook_calls})")
+
+    latencies = []
+    async with httpx.AsyncClient() as client:
+        # Galat secret -> Telegram ke alawa koi aur push nahi kar sakta
+        response = await client.post(push_url, json=start_update(1),
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        print(f"Wrong secret token -> HTTP {response.status_code} ({'OK' if response.status_code == 403 else 'FAIL'})")
+
+        for i in range(PUSHES):
+            pushed_at = time.perf_counter()
+            response = await client.post(push_url, json=start_update(100 + i),
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            response.raise_for_status()
+            replied_at, _ = await asyncio.wait_for(replies.get(), timeout=10)
+            latencies.append((replied_at - pushed_at) * 1000)
+
+    print(f"{PUSHES} pushes: push -> reply latency p50 {statistics.median(latencies):.1f} ms, "
+          f"max {max(latencies):.1f} ms")
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    api_server.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
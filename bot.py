@@ -1,23 +1,53 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import html
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile, BotCommand, InlineQueryResultArticle, InputTextMessageContent, BotCommandScopeChat
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile, BotCommand, InlineQueryResultArticle, InputTextMessageContent, BotCommandScopeChat, InputMediaDocument
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler, ContextTypes, 
-    ConversationHandler, MessageHandler, filters, InlineQueryHandler
+    ConversationHandler, MessageHandler, filters, InlineQueryHandler, TypeHandler
 )
 from telegram.constants import ParseMode
 from telegram.error import BadRequest, Forbidden
 import io
 import asyncio  # Live progress bar ke liye
 import time
+from collections import deque, OrderedDict
 from functools import wraps # Decorator ke liye zaroori
 
-from extractor import TestbookExtractor
+from extractor import TestbookExtractor, Extraction
+from file_cache import FileIdCache, upload_context # Uploaded files ke file_id reuse karne ke liye
+from image_cache import ImageCache, ImageInliner, ImageOptimizer # HTML mein offline images ke liye
+from persistence import SQLitePersistence # Restart ke baad bhi user state bachi rahe
+from job_store import ( # Resumable bulk jobs ke liye
+    BulkJobStore, JOB_COMPLETED, JOB_STOPPED, JOB_FAILED, TEST_SENT, TEST_FAILED
+)
+from delivery_ledger import DeliveryLedger, SyncWatchlist, test_fingerprint # Incremental series sync ke liye
+from prefetcher import Prefetcher # Browsing ke dauraan agla click pehle se fetch
+from question_store import QuestionStore # Tests ke beech repeat questions ek baar store
+from question_index import QuestionIndex # /findq ke liye FTS5 search
+from series_catalog import SeriesCatalog # /search ke liye local fuzzy catalogue
+from session_state import SeriesHit, TestRef, SeriesCache, SessionTracker # Chhoti navigation state
+from zip_bundler import ZipPartWriter # Bulk 'zip' format (streaming ZIP parts)
+from job_scheduler import JobScheduler # Kai bulk jobs ke beech fair scheduling
+from progress_reporter import ProgressReporter # Bulk progress messages (downloads se alag task)
+from update_processor import PerChatUpdateProcessor # Concurrent updates, per-chat order
 from html_generator import generate_html
 from txt_generator import generate_txt # TXT generator import karein
-from config import TELEGRAM_BOT_TOKEN, BOT_OWNER_ID
+from metrics import metrics, start_metrics_server # Stage timings ke liye
+from upload_scheduler import UploadScheduler # Adaptive rate limiting ke liye
+from config import (
+    TELEGRAM_BOT_TOKEN, BOT_OWNER_ID, METRICS_PORT, METRICS_HOST,
+    UPLOAD_GLOBAL_PER_SEC, UPLOAD_PRIVATE_PER_MIN, UPLOAD_GROUP_PER_MIN,
+    BULK_ALBUM_SIZE, BULK_ALBUM_MAX_MB, BULK_ZIP_MAX_MB, BULK_PROGRESS_SECONDS, BULK_GLOBAL_CONCURRENCY, BULK_PER_JOB_CONCURRENCY,
+    CONCURRENT_UPDATES, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN, PERSISTENCE_INTERVAL, SYNC_INTERVAL_MINUTES, TESTS_PAGE_SIZE, TESTS_PAGE_CONCURRENCY,
+    PREFETCH_SERIES, PREFETCH_TESTS, PREFETCH_CONCURRENCY, SEARCH_CACHE_HOURS, INLINE_DEBOUNCE_MS, INLINE_CACHE_SECONDS,
+    IMAGE_INLINE, IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB, IMAGE_FETCH_CONCURRENCY, IMAGE_MAX_KB,
+    IMAGE_MAX_WIDTH, IMAGE_FORMAT, IMAGE_QUALITY, SESSION_IDLE_MINUTES, SERIES_CACHE_SIZE,
+    API_MAX_RETRIES, API_BREAKER_FAILURES, API_BREAKER_COOLDOWN, API_HEDGE_PERCENTILE
+)
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -45,8 +75,70 @@ ASK_EXTRACTOR_NAME, ASK_START_NUMBER, ASK_DESTINATION, ASK_FORMAT_BULK = range(4
 STOP_BULK_DOWNLOAD_FLAG = 'stop_bulk_download'
 
 # extractor instance ko global rakhein taaki token update ho sake
+# (Har extraction/caption apna result object lautata hai, isliye kai threads ek hi instance share karte hain)
 extractor = None
 
+# Sabhi uploads ek hi scheduler se jaate hain taaki Telegram limits ka budget share ho
+upload_scheduler = UploadScheduler(
+    global_per_sec=UPLOAD_GLOBAL_PER_SEC,
+    private_per_min=UPLOAD_PRIVATE_PER_MIN,
+    group_per_min=UPLOAD_GROUP_PER_MIN
+)
+
+# Jin chats mein media group (album) fail hua, unmein kuch der (ALBUM_RETRY_SECONDS) seedha documents bhejein
+album_unsupported_chats = {} # chat_id -> monotonic time jab tak albums band
+ALBUM_RETRY_SECONDS = 3600
+# Sirf in BadRequest texts par album band hota hai; caption/parse ya file ki galtiyan caller tak jaati hain
+ALBUM_ERROR_MARKERS = ('media_group', 'media group', 'group send failed', 'grouped_media', 'media_mixed', 'too many media')
+
+# HTML mein images inline (optional). Downloads extractor ke through, disk cache sab tests share karte hain.
+image_inliner = None
+if IMAGE_INLINE:
+    image_inliner = ImageInliner(
+        ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024),
+        fetch=lambda url, max_bytes: extractor.fetch_image(url, max_bytes) if extractor else None,
+        concurrency=IMAGE_FETCH_CONCURRENCY,
+        max_image_bytes=IMAGE_MAX_KB * 1024,
+        optimizer=ImageOptimizer(IMAGE_MAX_WIDTH, IMAGE_FORMAT, IMAGE_QUALITY)
+    )
+
+# (test id, format, render version) -> Telegram file_id (SQLite mein persistent)
+# (Inline images wali HTML alag file hai - aur resize/format settings badlein toh bhi - isliye uska version alag)
+file_cache = FileIdCache(html_variant=f'img-{image_inliner.variant}' if image_inliner else '')
+
+# Bulk jobs aur har test ka status (restart ke baad resume ke liye)
+job_store = BulkJobStore()
+
+# Sabhi running bulk jobs ke beech slots ka round-robin bantwara
+job_scheduler = JobScheduler(global_limit=BULK_GLOBAL_CONCURRENCY, per_job_limit=BULK_PER_JOB_CONCURRENCY)
+# Jobs sirf counters badalte hain; progress message har chat ka reporter task edit karta hai
+progress_reporter = ProgressReporter(interval=BULK_PROGRESS_SECONDS)
+
+# (series, destination) par kaunse tests bheje ja chuke hain + auto-sync watchlist
+delivery_ledger = DeliveryLedger()
+sync_watchlist = SyncWatchlist()
+running_syncs = set() # (series_id, destination) jinka sync abhi chal raha hai
+
+# Search/section dekhte waqt series details aur tests background mein warm karta hai
+prefetcher = Prefetcher(max_concurrent=PREFETCH_CONCURRENCY)
+
+# Extract hue questions content hash se ek baar store (mocks/PYQs mein repeat questions),
+# aur har naya question turant /findq ke full-text index mein
+question_index = QuestionIndex()
+question_store = QuestionStore(indexer=question_index)
+
+# Dekhi gayi series ka local catalogue - /search pehle yahin dekhta hai, API sirf miss par
+series_catalog = SeriesCatalog(query_ttl=SEARCH_CACHE_HOURS * 3600)
+search_tasks = {} # query -> chal raha API search task (ek query ek hi baar)
+
+# Sessions mein sirf slugs/indexes; series details sab admins ke liye ek shared cache mein
+series_cache = SeriesCache(max_entries=SERIES_CACHE_SIZE)
+session_tracker = SessionTracker(idle_seconds=SESSION_IDLE_MINUTES * 60)
+
+# Inline mode (@bot <query>): har user ka pichhla (superseded) query task + results ka chhota cache
+inline_tasks = {}                  # user_id -> asyncio.Task
+inline_results = OrderedDict()     # query -> (expires_at, results) - pages (offset) dobara compute nahi hote
+
 # =============================================================================
 # === DECORATORS & HELPER FUNCTIONS (MOVED TO TOP) ===
 # =============================================================================
@@ -88,6 +180,8 @@ def admin_required(func):
                 await update.message.reply_text("⛔ Sorry, yeh command sirf admins ke liye hai.")
             elif update.callback_query:
                 await update.callback_query.answer("⛔ Sorry, yeh command sirf admins ke liye hai.", show_alert=True)
+            elif update.inline_query:
+                await update.inline_query.answer([], cache_time=INLINE_CACHE_SECONDS, is_personal=True)
             return
         return await func(update, context, *args, **kwargs)
     return wrapped
@@ -121,15 +215,13 @@ async def send_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, tex
     """Naya main menu (search bar ke saath) bhejta hai."""
     chat_id = update.effective_chat.id
     await clear_previous_message(context, chat_id)
+    prefetcher.cancel_owner(chat_id) # User ne browsing chhod di
     # Clear state when returning to main menu
     context.user_data.pop(STATE_WAITING_SEARCH_NUM, None)
     context.user_data.pop(STATE_WAITING_SECTION_NUM, None)
     context.user_data.pop(STATE_WAITING_TEST_NUM, None)
     context.user_data.pop(STATE_WAITING_FORMAT_SINGLE, None) # Naya state clear karein
-    context.user_data.pop('search_results', None)
-    context.user_data.pop('series_details', None)
-    context.user_data.pop('last_tests', None) # Combined tests list
-    context.user_data.pop('selected_test_info', None) # Selected test info clear karein
+    SessionTracker.clear(context.user_data) # Search hits, series slug, test list, selected test
 
     # keyboard = [[InlineKeyboardButton("🔍 Search New Test", switch_inline_query_current_chat="")]] # Removed inline search
     # reply_markup = InlineKeyboardMarkup(keyboard)
@@ -143,12 +235,23 @@ async def send_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, tex
     )
     context.user_data['last_bot_message_id'] = message.message_id
 
+async def load_series(slug: str) -> dict | None:
+    """Series details shared cache se; na hon toh prefetch/API se la kar cache mein rakhta hai."""
+    if not slug:
+        return None
+    details = series_cache.get(slug)
+    if details is None and extractor:
+        details = await prefetcher.get(('series', slug), lambda: extractor.get_series_details(slug))
+        series_cache.put(slug, details)
+    return details
+
 def get_config():
     """Config file (token/channel/link) load karta hai."""
     # --- NAYA: Default mein private_invite_link add kiya ---
     default_config = {
         "testbook_token": None, 
         "forward_channel_id": None,
+        "extra_forward_channels": [], # Default channel ke alawa forward channels
         "private_invite_link": None # Naya field
     }
     return load_json(CONFIG_FILE, default_config)
@@ -157,6 +260,14 @@ def save_config(config_data):
     """Config file (token/channel/link) save karta hai."""
     save_json(CONFIG_FILE, config_data)
 
+def get_forward_channels(config: dict) -> list:
+    """Sabhi forward channels: pehle default channel, fir extra channels (duplicates hata kar)."""
+    channels = []
+    for channel_id in [config.get('forward_channel_id')] + list(config.get('extra_forward_channels') or []):
+        if channel_id and channel_id not in channels:
+            channels.append(channel_id)
+    return channels
+
 def init_extractor():
     """Extractor ko initialize ya re-initialize karta hai."""
     global extractor
@@ -164,7 +275,11 @@ def init_extractor():
     token = config.get('testbook_token')
     if token:
         try:
-            extractor = TestbookExtractor(token)
+            extractor = TestbookExtractor(
+                token, page_size=TESTS_PAGE_SIZE, page_concurrency=TESTS_PAGE_CONCURRENCY, max_retries=API_MAX_RETRIES,
+                breaker_failures=API_BREAKER_FAILURES, breaker_cooldown=API_BREAKER_COOLDOWN,
+                hedge_percentile=API_HEDGE_PERCENTILE
+            )
             logger.info("Extractor successfully initialized with token.")
             return True
         except Exception as e:
@@ -176,6 +291,239 @@ def init_extractor():
         extractor = None
         return False
 
+# Bulk-only formats: files alag documents ki jagah ZIP parts mein jaati hain
+ZIP_FORMATS = ('zip', 'zipall')
+
+def expand_formats(file_format: str) -> list:
+    """User ki choice ('both', 'all', 'zip', ...) ko formats ki list mein badalta hai."""
+    return {
+        'html': ['html'],
+        'txt': ['txt'],
+        'json': ['json'],
+        'both': ['html', 'txt'],
+        'all': ['html', 'txt', 'json'],
+        'zip': ['html'],
+        'zipall': ['html', 'txt', 'json'],
+    }.get(file_format, ['html'])
+
+def build_test_files(questions_data: dict, details: dict, base_file_name: str, formats: list, channel_link: str | None,
+                     image_report: dict | None = None) -> list:
+    """
+    Diye gaye formats (html/txt/json) ki files (BytesIO) banata hai, usi order mein.
+    Har format ka render time metrics mein record hota hai. `image_report` = ImageInliner.inline ka report dict.
+    """
+    files = []
+
+    # Generate HTML if needed
+    if 'html' in formats:
+        html_quiz_data = questions_data
+        if image_inliner:
+            # Images data URI ban kar HTML ke andar (original questions_data nahi badalta)
+            with metrics.timed('inline_images'):
+                html_quiz_data = image_inliner.inline(questions_data, report=image_report)
+        with metrics.timed('render_html'):
+            html_content = generate_html(html_quiz_data, details, channel_link=channel_link) # Pass link
+            html_file = io.BytesIO(html_content.encode('utf-8'))
+        html_file.name = f"{base_file_name}.html"
+        files.append(html_file)
+
+    # Generate TXT if needed
+    if 'txt' in formats:
+        with metrics.timed('render_txt'):
+            txt_content = generate_txt(questions_data, details) # Use new generator
+            txt_file = io.BytesIO(txt_content.encode('utf-8'))
+        txt_file.name = f"{base_file_name}.txt"
+        files.append(txt_file)
+
+    # Generate JSON if needed
+    if 'json' in formats:
+        with metrics.timed('render_json'):
+            json_content = json.dumps(questions_data, indent=4, ensure_ascii=False)
+            json_file = io.BytesIO(json_content.encode('utf-8'))
+        json_file.name = f"{base_file_name}.json"
+        files.append(json_file)
+
+    return files
+
+def prefetch_questions(test_id: str):
+    """
+    Prefetch ke liye test extract karta hai (Extraction - questions + marks). Error par None.
+    Attempt na hue test ko submit nahi karta - woh sirf asli download karta hai (prefetch miss).
+    """
+    extraction = extractor.extract_questions(test_id, allow_submit=False)
+    return None if extraction.error else extraction
+
+def prepare_test_documents(test: dict, series_details: dict, section: dict, subsection: dict, formats: list,
+                           channel_link: str | None, base_file_name: str, extractor_name: str | None = None,
+                           prefetched: Extraction | None = None, image_report: dict | None = None,
+                           use_file_cache: bool = True, wait_for_breaker: bool = False):
+    """
+    Ek test ke documents taiyaar karta hai. Jo formats pehle upload ho chuke hain unka file_id
+    reuse hota hai; agar sabhi cached hain toh extraction aur rendering dono skip ho jaate hain.
+    Returns (documents, cache_keys, error):
+      documents  = [(BytesIO ya file_id, caption ya None), ...] (caption sirf pehli file par)
+      cache_keys = har document ke liye (test_id, format, context, details), ya None agar file_id se ja raha hai
+    `prefetched` = prefetch_questions() ka result, ho toh extraction dobara nahi hota.
+    `image_report` = inline images ke bytes (original vs optimized) isme jud jaate hain.
+    `use_file_cache=False` par hamesha nayi files banti hain (ZIP ke liye bytes chahiye, file_id nahi).
+    `wait_for_breaker=True` (sirf bulk jobs): API down ho toh fail hone ke bajaye breaker band hone tak rukta hai.
+    """
+    test_id = test.get('id')
+    context = upload_context(base_file_name, series_details, section, subsection)
+    cached = file_cache.lookup(test_id, formats, channel_link, context) if use_file_cache else {}
+    missing = [fmt for fmt in formats if fmt not in cached]
+
+    fresh_files = {}
+    if missing:
+        extraction = prefetched or extractor.extract_questions(test_id, wait_for_breaker=wait_for_breaker)
+        if extraction.error:
+            return None, None, extraction.error
+        # Repeat questions ek hi shared object ban jaate hain (store + rendering caches dono ke liye)
+        questions_data = question_store.record_test(
+            test_id, extraction.quiz_data, series_id=series_details.get('id'), series_name=series_details.get('name')
+        )
+
+        caption, details = extractor.get_caption(
+            test_summary=test,
+            series_details=series_details,
+            selected_section=section,
+            subsection_context=subsection,
+            marks=extraction.marks,
+            extractor_name=extractor_name
+        )
+        fresh_files = dict(zip(missing, build_test_files(
+            questions_data, details, base_file_name, missing, channel_link, image_report=image_report
+        )))
+    else:
+        # Sab formats pehle upload ho chuke hain - cached details se caption banayein
+        details = next(iter(cached.values()))['details']
+        caption = TestbookExtractor.format_caption(details, extractor_name)
+
+    documents, cache_keys = [], []
+    for i, fmt in enumerate(formats):
+        doc_caption = caption if i == 0 else None
+        if fmt in fresh_files:
+            documents.append((fresh_files[fmt], doc_caption))
+            cache_keys.append((test_id, fmt, context, details))
+        else:
+            documents.append((cached[fmt]['file_id'], doc_caption))
+            cache_keys.append(None)
+    return documents, cache_keys, None
+
+def remember_sent_files(sent_messages: list, cache_keys: list, channel_link: str | None):
+    """Naye upload hue documents ke file_id cache mein save karta hai."""
+    for message, key in zip(sent_messages, cache_keys):
+        if key and message and message.document:
+            test_id, fmt, context, details = key
+            file_cache.remember(test_id, fmt, channel_link, message.document.file_id, details, context)
+
+def _document_size(document) -> int:
+    """BytesIO ka size; cached file_id ka upload size 0 maana jaata hai."""
+    return document.getbuffer().nbytes if isinstance(document, io.BytesIO) else 0
+
+def _is_album_error(error: BadRequest) -> bool:
+    """Check karta hai ki BadRequest album (media group) ki wajah se hai, na ki kisi file/caption ki."""
+    message = str(error).lower()
+    return any(marker in message for marker in ALBUM_ERROR_MARKERS)
+
+def _is_bad_file_id(error: BadRequest) -> bool:
+    """Check karta hai ki BadRequest cached file_id invalid hone ki wajah se hai."""
+    message = str(error).lower()
+    return 'file identifier' in message or 'file_id' in message
+
+async def send_document_paced(bot, chat_id, document, caption: str, filename: str | None = None):
+    """
+    Document (file object ya cached file_id) ko upload scheduler ke through bhejta hai.
+    RetryAfter par scheduler wahi file dobara bhejta hai, isliye har attempt se pehle file rewind hoti hai.
+    """
+    async def _send():
+        if hasattr(document, 'seek'):
+            document.seek(0)
+        return await bot.send_document(
+            chat_id=chat_id,
+            document=document,
+            filename=filename,
+            caption=caption,
+            parse_mode=ParseMode.MARKDOWN
+        )
+    return await upload_scheduler.send(chat_id, _send)
+
+async def send_documents_paced(bot, chat_id, documents: list, album_limit: int = 10) -> list:
+    """
+    Documents ki list [(BytesIO ya file_id, caption ya None), ...] bhejta hai.
+    Ek se zyada files ho toh `send_media_group` (album) use hota hai, jisse Bot API calls kam hoti hain.
+    Agar destination album accept nahi karta, toh ek-ek document bhej deta hai.
+    Sent messages ki list return karta hai.
+    """
+    sent_messages = []
+    album_limit = max(1, album_limit)
+
+    for start in range(0, len(documents), album_limit):
+        chunk = documents[start:start + album_limit]
+
+        if len(chunk) > 1 and album_unsupported_chats.get(str(chat_id), 0.0) <= time.monotonic():
+            async def _send_album(chunk=chunk):
+                # InputFile banate waqt file padh li jaati hai, isliye har attempt par naya media banayein
+                media = []
+                for document, caption in chunk:
+                    if isinstance(document, io.BytesIO):
+                        document.seek(0)
+                        media.append(InputMediaDocument(
+                            media=document,
+                            filename=document.name,
+                            caption=caption,
+                            parse_mode=ParseMode.MARKDOWN if caption else None
+                        ))
+                    else: # Cached file_id
+                        media.append(InputMediaDocument(
+                            media=document,
+                            caption=caption,
+                            parse_mode=ParseMode.MARKDOWN if caption else None
+                        ))
+                return await bot.send_media_group(chat_id=chat_id, media=media)
+            try:
+                messages = await upload_scheduler.send(chat_id, _send_album, cost=len(chunk))
+                sent_messages.extend(messages)
+                continue
+            except BadRequest as e:
+                if not _is_album_error(e):
+                    raise # Album ki galti nahi hai (file_id, caption parse, file size) - caller sambhalega
+                logger.warning(f"Chat {chat_id} mein album nahi bhej paya ({e}), ek-ek file bhej raha hoon.")
+                album_unsupported_chats[str(chat_id)] = time.monotonic() + ALBUM_RETRY_SECONDS
+
+        for document, caption in chunk:
+            # Album fallback mein caption har test ki pehli file par hi rehta hai
+            sent_messages.append(await send_document_paced(bot, chat_id, document, caption))
+
+    return sent_messages
+
+async def forward_to_channels(bot, from_chat_id, message_ids: list, channel_ids: list) -> dict:
+    """
+    Messages ko sabhi channels mein batch mein forward karta hai (`forward_messages`, max 100 per call).
+    Channels concurrently chalte hain. Return: {channel_id: error} sirf fail hue channels ke liye.
+    """
+    async def _forward(channel_id):
+        for start in range(0, len(message_ids), 100):
+            batch = message_ids[start:start + 100]
+            await upload_scheduler.send(
+                channel_id,
+                lambda batch=batch: bot.forward_messages(chat_id=channel_id, from_chat_id=from_chat_id, message_ids=batch),
+                cost=len(batch)
+            )
+
+    results = await asyncio.gather(*[_forward(c) for c in channel_ids], return_exceptions=True)
+    return {c: r for c, r in zip(channel_ids, results) if isinstance(r, Exception)}
+
+async def forward_in_background(bot, user_chat_id, message_ids: list, channel_ids: list):
+    """Background task: forward karta hai aur fail hone par user ko batata hai."""
+    failures = await forward_to_channels(bot, user_chat_id, message_ids, channel_ids)
+    for channel_id, e in failures.items():
+        logger.error(f"Channel {channel_id} mein forward karne mein error: {e}")
+        try:
+            await bot.send_message(user_chat_id, f"⚠️ Test send ho gaya hai, lekin channel `{channel_id}` mein forward nahi kar paya. (Error: {e})", parse_mode=ParseMode.MARKDOWN)
+        except Exception as notify_error:
+            logger.warning(f"Forward error notify nahi kar paya: {notify_error}")
+
 # =============================================================================
 # === OWNER COMMANDS ===
 # =============================================================================
@@ -255,28 +603,38 @@ async def admin_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @admin_required
 async def set_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """(Admin/Owner) Forwarding ke liye channel ID set karta hai."""
+    """
+    (Admin/Owner) Forwarding ke liye channel ID set karta hai.
+    Kai IDs di jaa sakti hain: pehli default channel banti hai, baaki extra forward channels.
+    """
     try:
-        new_channel_id = context.args[0]
+        new_channel_ids = list(context.args)
+        new_channel_id = new_channel_ids[0]
         # Check karein ki ID valid hai (yaani @username ya -100... se shuru hota hai)
-        if not (new_channel_id.startswith('@') or new_channel_id.startswith('-100')):
-            await update.message.reply_text("⚠️ Invalid Channel ID. ID `@channel_username` ya `-100...` se shuru hona chahiye.")
-            return
+        for channel_id in new_channel_ids:
+            if not (channel_id.startswith('@') or channel_id.startswith('-100')):
+                await update.message.reply_text("⚠️ Invalid Channel ID. ID `@channel_username` ya `-100...` se shuru hona chahiye.")
+                return
 
         config = get_config()
         config['forward_channel_id'] = new_channel_id
+        config['extra_forward_channels'] = new_channel_ids[1:]
         save_config(config)
-        await update.message.reply_text(f"✅ Forward channel set kar diya gaya hai: `{new_channel_id}`", parse_mode=ParseMode.MARKDOWN)
+        text = f"✅ Forward channel set kar diya gaya hai: `{new_channel_id}`"
+        if new_channel_ids[1:]:
+            text += "\nExtra channels: " + ", ".join(f"`{c}`" for c in new_channel_ids[1:])
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
         
     except (IndexError, ValueError):
-        await update.message.reply_text("Usage: /setchannel <Channel ID ya @username>")
+        await update.message.reply_text("Usage: /setchannel <Channel ID ya @username> [aur channels...]")
 
 @admin_required
 async def remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """(Admin/Owner) Forward channel ko remove karta hai."""
     config = get_config()
-    if 'forward_channel_id' in config and config['forward_channel_id'] is not None:
+    if get_forward_channels(config):
         config['forward_channel_id'] = None
+        config['extra_forward_channels'] = []
         save_config(config)
         await update.message.reply_text("✅ Forward channel hata diya gaya hai. Files ab auto-forward nahi hongi.")
     else:
@@ -287,8 +645,12 @@ async def view_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """(Admin/Owner) Current forward channel dikhata hai."""
     config = get_config()
     channel_id = config.get('forward_channel_id')
-    if channel_id:
-        await update.message.reply_text(f"ℹ️ Current forward channel hai: `{channel_id}`", parse_mode=ParseMode.MARKDOWN)
+    extra_channels = get_forward_channels(config)[1:] if channel_id else get_forward_channels(config)
+    if channel_id or extra_channels:
+        text = f"ℹ️ Current forward channel hai: `{channel_id}`"
+        if extra_channels:
+            text += "\nExtra channels: " + ", ".join(f"`{c}`" for c in extra_channels)
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
     else:
         await update.message.reply_text("ℹ️ Koi forward channel set nahi hai.")
 
@@ -340,6 +702,142 @@ async def view_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # --- END NAYE COMMANDS ---
 
+@admin_required
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Har stage (fetch, submit, parse, render, upload) ka timing summary dikhata hai."""
+    if context.args and context.args[0].lower() == 'reset':
+        metrics.reset()
+        await update.message.reply_text("✅ Stage timings reset kar diye gaye hain.")
+        return
+    await update.message.reply_text(
+        metrics.render_text() + "\n\n" + upload_scheduler.render_text() + "\n" + prefetcher.render_text()
+        + ("\n" + extractor.render_text() if extractor else "")
+        + ("\n" + image_inliner.render_text() if image_inliner else "")
+        + "\n" + question_store.render_text() + "\n" + series_catalog.render_text(),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+
+@admin_required
+async def memstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Sessions (user_data) aur shared series cache ka memory report."""
+    # Snapshot event loop par hi - handlers user_data badalte rehte hain, thread mein live dict iterate karna unsafe hai.
+    # Pickling (mehenga hissa) phir worker thread mein.
+    snapshot = {user_id: dict(user_data) for user_id, user_data in context.application.user_data.items()}
+    report = await asyncio.to_thread(session_tracker.render_text, snapshot)
+    await update.message.reply_text(report + "\n" + series_cache.render_text(), parse_mode=ParseMode.MARKDOWN)
+
+
+@admin_required
+async def findq_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Pehle extract hue questions mein text search (local FTS5 index)."""
+    text = " ".join(context.args)
+    if not text.strip():
+        await update.message.reply_text("Usage: `/findq <question ka koi hissa>`", parse_mode=ParseMode.MARKDOWN)
+        return
+    results, took_ms = await asyncio.to_thread(question_index.search, text, 10)
+    if not results:
+        await update.message.reply_text(f"🔍 Koi question nahi mila ({took_ms:.1f} ms).")
+        return
+
+    lines = [f"🔍 <b>{len(results)} questions</b> ({took_ms:.1f} ms)\n"]
+    for i, result in enumerate(results, 1):
+        snippet = html.escape(result['snippet'] or '').replace('[[', '<b>').replace(']]', '</b>')
+        source = html.escape(result['test_title'] or 'Unknown test')
+        if result['series_name']:
+            source = f"{html.escape(result['series_name'])} › {source}"
+        position = f" (Q.{result['position'] + 1})" if result['position'] is not None else ""
+        more = f" +{result['test_count'] - 1} aur tests" if result['test_count'] > 1 else ""
+        lines.append(f"{i}. [{result['lang']}] {snippet}\n    📄 {source}{position}{more}")
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+
+@admin_required
+async def jobs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Queued/running bulk jobs aur unka throughput dikhata hai."""
+    await update.message.reply_text(job_scheduler.render_text(), parse_mode=ParseMode.MARKDOWN)
+
+
+@admin_required
+async def watch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Khuli hui series ko auto-sync watchlist mein daalta hai."""
+    usage = (
+        "Usage: `/watch <destination> [format] [extractor name]`\n"
+        "Destination: `1` (yahin), `/d` (default channel), `@channel` ya `-100...`\n"
+        "Format: `html` (default), `txt`, `json`, `both`, `all`, `zip`, `zipall`\n\n"
+        "Pehle /search se series kholein. Har sync par sirf woh tests jaate hain jo us destination par pehle nahi gaye ya badal gaye."
+    )
+    series_slug = context.user_data.get('current_series_slug')
+    series_details = await load_series(series_slug) if context.args else None
+    if not context.args or not series_details:
+        await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+        return
+
+    file_format = context.args[1].lower() if len(context.args) > 1 else 'html'
+    if file_format not in ['html', 'txt', 'json', 'both', 'all', *ZIP_FORMATS]:
+        await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+        return
+    extractor_name = " ".join(context.args[2:]) or None
+
+    final_chat_id, error = resolve_destination(context.args[0], update.effective_chat.id, get_config())
+    if error:
+        await update.message.reply_text(error)
+        return
+
+    watch_id = sync_watchlist.add(
+        series_details['id'], series_slug, series_details.get('name', 'Series'), final_chat_id,
+        file_format, extractor_name, update.effective_chat.id
+    )
+    already_sent = delivery_ledger.count(series_details['id'], final_chat_id)
+    schedule_text = f"har {SYNC_INTERVAL_MINUTES} min" if SYNC_INTERVAL_MINUTES else "schedule band hai (SYNC_INTERVAL_MINUTES=0), `/watchlist run` se chalayein"
+    await update.message.reply_text(
+        f"👀 Watch #{watch_id}: **{series_details.get('name', 'Series')}** → `{final_chat_id}` ({file_format})\n"
+        f"Is destination par pehle se {already_sent} tests bheje ja chuke hain.\n"
+        f"Sync: {schedule_text}.",
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+
+@admin_required
+async def unwatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Watchlist se ek series hatata hai."""
+    try:
+        watch_id = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text("Usage: `/unwatch <watch id>` (IDs ke liye /watchlist dekhein)", parse_mode=ParseMode.MARKDOWN)
+        return
+    if sync_watchlist.remove(watch_id):
+        await update.message.reply_text(f"✅ Watch #{watch_id} hata diya gaya.")
+    else:
+        await update.message.reply_text(f"Watch #{watch_id} nahi mila.")
+
+
+@admin_required
+async def watchlist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """(Admin/Owner) Watchlist dikhata hai. `/watchlist run` = abhi sab sync karein."""
+    watches = sync_watchlist.all()
+    if not watches:
+        await update.message.reply_text("📭 Watchlist khaali hai. Series khol kar `/watch <destination>` use karein.", parse_mode=ParseMode.MARKDOWN)
+        return
+
+    if context.args and context.args[0].lower() == 'run':
+        for watch in watches:
+            context.application.create_task(run_watch_sync(context.application, watch))
+        await update.message.reply_text(f"🔄 {len(watches)} series ka sync shuru ho gaya hai.")
+        return
+
+    lines = ["👀 **Sync Watchlist**\n"]
+    for watch in watches:
+        if watch['last_sync_at']:
+            last = f"{time.strftime('%d %b %H:%M', time.localtime(watch['last_sync_at']))} ({watch['last_result']})"
+        else:
+            last = "abhi tak nahi"
+        lines.append(
+            f"#{watch['watch_id']} **{watch['series_name']}** → `{watch['destination']}` ({watch['file_format']})\n"
+            f"    {delivery_ledger.count(watch['series_id'], watch['destination'])} tests bheje gaye | last sync: {last}"
+        )
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.MARKDOWN)
+
 
 # =============================================================================
 # === PUBLIC COMMANDS & BOT LOGIC ===
@@ -361,6 +859,36 @@ async def menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/menu command handle karta hai."""
     await send_main_menu(update, context, "🏠 Main Menu")
 
+async def _api_search(query: str):
+    results = await asyncio.to_thread(extractor.search, query)
+    if results is not None:
+        series_catalog.record_search(query, results)
+    return results
+
+def api_search_task(query: str) -> asyncio.Task:
+    """
+    Query ka API search task - ek query ka ek hi request chalta hai, chahe /search, background refresh
+    aur inline mode teeno maangein. Maangne wala cancel ho jaaye tab bhi result catalogue mein jaata hai.
+    """
+    key = query.lower()
+    task = search_tasks.get(key)
+    if task is None:
+        task = search_tasks[key] = asyncio.create_task(_api_search(query))
+        task.add_done_callback(lambda _: search_tasks.pop(key, None))
+    return task
+
+async def search_series(query: str):
+    """
+    (results, local?) - pehle local catalogue; wahan na mile toh API. Local results purane/fuzzy hon
+    toh API refresh background mein hota hai, taaki agli baar fresh results milein.
+    """
+    results, fresh = series_catalog.lookup(query)
+    if results:
+        if not fresh:
+            api_search_task(query)
+        return results, True
+    return await asyncio.shield(api_search_task(query)), False
+
 @admin_required
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handles the /search command."""
@@ -374,18 +902,19 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        search_results = extractor.search(query)
+        # Pehle local catalogue; miss par network call worker thread mein, taaki doosre users ke updates na rukein
+        search_results, from_catalog = await search_series(query)
         if not search_results:
             await update.message.reply_text(f"'{query}' ke liye koi results nahi mile.")
             return
 
-        context.user_data['search_results'] = search_results # Store full results
-        results_text = f"🔍 **Results for '{query}'**\n\n"
+        # Session mein sirf dikhaye gaye results ke (slug, naam, count) - poore result dicts nahi
+        search_hits = [SeriesHit.from_result(series) for series in search_results[:20]] # Show top 20
+        context.user_data['search_hits'] = search_hits
+        results_text = f"🔍 **Results for '{query}'**{' ⚡' if from_catalog else ''}\n\n"
         
-        for i, series in enumerate(search_results[:20]): # Show top 20
-            series_name = series.get('name', 'Unknown Series')
-            tests_count = series.get('testsCount', 0)
-            results_text += f"**{i+1}.** {series_name} ({tests_count} tests)\n"
+        for i, hit in enumerate(search_hits):
+            results_text += f"**{i+1}.** {hit.name} ({hit.tests_count} tests)\n"
         
         results_text += "\nSeries select karne ke liye **number** reply karein."
         
@@ -394,10 +923,121 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['last_bot_message_id'] = message.message_id
         context.user_data[STATE_WAITING_SEARCH_NUM] = True # Set state
 
+        # Top results ki series details background mein warm karein
+        chat_id = update.effective_chat.id
+        prefetcher.cancel_owner(chat_id)
+        for series in search_results[:PREFETCH_SERIES]:
+            slug = series.get('slug')
+            if slug:
+                prefetcher.schedule(chat_id, ('series', slug), lambda slug=slug: extractor.get_series_details(slug))
+
     except Exception as e:
         logger.error(f"Search command mein error: {e}")
         await update.message.reply_text("Search karne mein error aaya.")
 
+# Inline results ek page mein kitne, aur Telegram ki deadline se pehle kitne seconds mein jawab dena hai
+INLINE_PAGE_SIZE = 10
+INLINE_DEADLINE_SECONDS = 8
+
+def _inline_cached(query: str):
+    entry = inline_results.get(query)
+    if entry and entry[0] > time.monotonic():
+        inline_results.move_to_end(query)
+        return entry[1]
+    return None
+
+def _inline_remember(query: str, results: list):
+    inline_results[query] = (time.monotonic() + INLINE_CACHE_SECONDS, results)
+    inline_results.move_to_end(query)
+    while len(inline_results) > 256:
+        inline_results.popitem(last=False)
+
+def _inline_article(series: dict) -> InlineQueryResultArticle:
+    name = series.get('name', 'Unknown Series')
+    tests_count = series.get('testsCount', 0)
+    slug = series.get('slug', '')
+    return InlineQueryResultArticle(
+        id=(slug or name)[:64],
+        title=name,
+        description=f"{tests_count} tests",
+        input_message_content=InputTextMessageContent(
+            f"📚 <b>{html.escape(name)}</b>\n{tests_count} tests\n<code>{html.escape(slug)}</code>",
+            parse_mode=ParseMode.HTML
+        )
+    )
+
+async def answer_inline_query(inline_query, started: float):
+    """Cache -> local catalogue -> (debounce ke baad) API. Naya query aane par yeh task cancel ho jaata hai."""
+    query = inline_query.query.strip()
+    key = query.lower()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+    # Authoritative = cache, TTL ke andar wala catalogue answer ya safal API search. Baaki (stale/fuzzy local,
+    # deadline ya API fail) ka jawab cache nahi hota - refresh catalogue mein aate hi agla query sahi result dekhe.
+    results, authoritative = _inline_cached(key), True
+    if results is None:
+        results, authoritative = series_catalog.lookup(query)
+        if results:
+            if not authoritative:
+                api_search_task(query) # Background refresh
+        elif extractor:
+            # User abhi type kar raha ho sakta hai - thoda rukein; naya query aaya toh yahin cancel
+            await asyncio.sleep(INLINE_DEBOUNCE_MS / 1000)
+            remaining = INLINE_DEADLINE_SECONDS - (time.monotonic() - started)
+            try:
+                results = await asyncio.wait_for(asyncio.shield(api_search_task(query)), timeout=max(0.1, remaining))
+            except asyncio.TimeoutError:
+                # Deadline se pehle jo local mein hai wahi (API result baad mein catalogue mein aa jaayega)
+                results = [series for _, series in series_catalog.fuzzy(query)]
+                logger.info(f"Inline search '{query}' deadline tak poora nahi hua, {len(results)} local results diye.")
+            else:
+                authoritative = results is not None # None = API search fail
+        results = results or []
+        if authoritative:
+            _inline_remember(key, results)
+
+    page = results[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(results) else ""
+    await inline_query.answer(
+        [_inline_article(series) for series in page],
+        cache_time=INLINE_CACHE_SECONDS if authoritative else 0,
+        is_personal=True,
+        next_offset=next_offset
+    )
+
+@admin_required
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    `@bot <query>` - series results inline. Jawab alag task mein banta hai, taaki us user ka agla
+    (naya) query pichhle ko turant cancel kar sake.
+    """
+    inline_query = update.inline_query
+    user_id = inline_query.from_user.id
+    previous = inline_tasks.pop(user_id, None)
+    if previous and not previous.done():
+        previous.cancel() # User ne aage type kar liya - purana query ab kisi kaam ka nahi
+
+    if len(inline_query.query.strip()) < 2:
+        await inline_query.answer([], cache_time=INLINE_CACHE_SECONDS, is_personal=True)
+        return
+
+    async def _run():
+        try:
+            await answer_inline_query(inline_query, started)
+        except asyncio.CancelledError:
+            pass
+        except BadRequest as e:
+            # "Query is too old" - deadline nikal gayi
+            logger.warning(f"Inline query '{inline_query.query}' ka jawab nahi gaya: {e}")
+        except Exception as e:
+            logger.error(f"Inline query '{inline_query.query}' mein error: {e}")
+        finally:
+            if inline_tasks.get(user_id) is task:
+                inline_tasks.pop(user_id, None)
+
+    started = time.monotonic()
+    task = inline_tasks[user_id] = asyncio.create_task(_run())
+
 @admin_required
 async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handles text input based on the current state."""
@@ -410,8 +1050,10 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # --- Naya: State 4: Format selection (Single Test) ---
     if context.user_data.get(STATE_WAITING_FORMAT_SINGLE):
-        selected_test_info = context.user_data.get('selected_test_info')
-        if not selected_test_info:
+        selected_test = context.user_data.get('selected_test') # TestRef
+        series_details = await load_series(context.user_data.get('current_series_slug')) if selected_test else None
+        resolved = selected_test.resolve(series_details) if series_details else None
+        if not resolved:
             await update.message.reply_text("Session expire ho gaya hai. Dobara `/search` karein.", parse_mode=ParseMode.MARKDOWN)
             context.user_data.pop(STATE_WAITING_FORMAT_SINGLE, None)
             context.user_data.pop(STATE_WAITING_TEST_NUM, None) # Also clear test num state
@@ -423,18 +1065,20 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return # State ko active rakhein
 
         # Format valid hai, process download
+        test_summary, section_context, subsection_context = resolved
         await process_single_test_download(
             update, 
             context, 
-            selected_test_info['test_data'],
-            selected_test_info['section_context'],
-            selected_test_info['subsection_context'],
+            test_summary,
+            series_details,
+            section_context,
+            subsection_context,
             format_choice # Pass the format
         )
         
         # State clear karein, lekin test num state active rakhein
         context.user_data.pop(STATE_WAITING_FORMAT_SINGLE, None)
-        context.user_data.pop('selected_test_info', None) # Selected test info clear karein
+        context.user_data.pop('selected_test', None) # Selected test clear karein
         # STATE_WAITING_TEST_NUM active hai, taaki user agla number daal sake
         await update.message.reply_text("Aap agla test download karne ke liye number reply kar sakte hain.")
         return
@@ -445,23 +1089,24 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # --- State 1: Waiting for Search Result Number ---
         if context.user_data.get(STATE_WAITING_SEARCH_NUM):
-            search_results = context.user_data.get('search_results')
-            if not search_results:
+            search_hits = context.user_data.get('search_hits')
+            if not search_hits:
                 await update.message.reply_text("Session expire ho gaya hai. Dobara `/search` karein.", parse_mode=ParseMode.MARKDOWN)
                 return ConversationHandler.END # End conv if applicable
 
-            if 0 <= number < len(search_results):
-                selected_series = search_results[number]
-                series_slug = selected_series.get('slug')
+            if 0 <= number < len(search_hits):
+                series_slug = search_hits[number].slug
                 
-                details = extractor.get_series_details(series_slug)
+                # Shared cache ya prefetch mein ho toh turant milta hai
+                details = await load_series(series_slug)
+                prefetcher.cancel_owner(chat_id) # Baaki results ki zaroorat nahi
                 if not details:
                     await update.message.reply_text("Error: Is series ki details nahi mil saki.")
                     context.user_data.pop(STATE_WAITING_SEARCH_NUM, None) # Reset state
                     return
 
-                context.user_data['series_details'] = details
-                context.user_data['current_series_slug'] = series_slug # Store slug for bulk download context
+                context.user_data['current_series_slug'] = series_slug # Details series_cache mein, session mein sirf slug
+                series_catalog.add_details(series_slug, details) # Catalogue mein sections/naam update
                 sections = details.get('sections', [])
                 
                 if not sections:
@@ -487,12 +1132,12 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 context.user_data.pop(STATE_WAITING_SEARCH_NUM, None)
                 context.user_data[STATE_WAITING_SECTION_NUM] = True
             else:
-                await update.message.reply_text(f"Invalid number. Kripya 1 aur {len(search_results)} ke beech ka number reply karein.")
+                await update.message.reply_text(f"Invalid number. Kripya 1 aur {len(search_hits)} ke beech ka number reply karein.")
             return # Don't fall through
 
         # --- State 2: Waiting for Section Number ---
         elif context.user_data.get(STATE_WAITING_SECTION_NUM):
-            details = context.user_data.get('series_details')
+            details = await load_series(context.user_data.get('current_series_slug'))
             if not details:
                 await update.message.reply_text("Session expire ho gaya hai. Dobara `/search` karein.", parse_mode=ParseMode.MARKDOWN)
                 return
@@ -500,7 +1145,7 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
             sections = details.get('sections', [])
             if 0 <= number < len(sections):
                 selected_section = sections[number]
-                context.user_data['selected_section'] = selected_section # Store for bulk download context
+                context.user_data['section_index'] = number # Store for bulk download context
                 subsections = selected_section.get('subsections', [])
                 
                 if not subsections:
@@ -513,26 +1158,28 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 all_tests_in_section = []
                 combined_test_list_str = ""
                 test_counter = 1
+                incomplete_subsections = [] # Jinke saare pages fetch nahi hue
 
                 for i, sub in enumerate(subsections):
                     combined_test_list_str += f"\n--- {sub.get('name', f'Subsection {i+1}')} ---\n"
-                    tests = extractor.get_tests_in_subsection(
+                    tests, complete = await asyncio.to_thread(
+                        extractor.get_tests_in_subsection,
                         details['id'], 
                         selected_section['id'], 
                         sub['id']
                     )
+                    if not complete:
+                        incomplete_subsections.append(sub.get('name', f'Subsection {i+1}'))
                     
                     if tests:
                         for test in tests:
-                            # Store test with its context
-                            all_tests_in_section.append({
-                                'test_data': test,
-                                'section_context': selected_section,
-                                'subsection_context': sub
-                            })
+                            # Sirf caption wali fields + subsection ka index (section/subsection dicts nahi)
+                            all_tests_in_section.append(TestRef.from_test(test, number, i))
                             combined_test_list_str += f"{test_counter}. {test.get('title', 'N/A')}\n"
                             test_counter += 1
-                    else:
+                    if not complete:
+                        combined_test_list_str += "(⚠️ List adhoori hai - kuch tests fetch nahi ho sake)\n"
+                    elif not tests:
                          combined_test_list_str += "(No tests found)\n"
 
 
@@ -541,7 +1188,7 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     context.user_data.pop(STATE_WAITING_SECTION_NUM, None) # Reset state
                     return
 
-                context.user_data['last_tests'] = all_tests_in_section # Store combined list with context
+                context.user_data['test_refs'] = all_tests_in_section # Store combined list with context
                 
                 test_list_io = io.BytesIO(combined_test_list_str.encode('utf-8'))
                 test_list_io.name = f"{selected_section.get('name', 'section_tests')}.txt"
@@ -557,7 +1204,9 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     caption=(
                         f"📂 **{selected_section.get('name')}**\n\n"
                         f"Is section mein {len(all_tests_in_section)} tests mile hain (sabhi subsections mila kar).\n\n"
-                        "Test download karne ke liye, list se **test ka number** (jaise `5`) copy karke mujhe reply karein."
+                        + (f"⚠️ **List adhoori hai:** {len(incomplete_subsections)} subsection(s) ke saare tests fetch nahi ho sake "
+                           f"(list mein marked). Poori list ke liye section dobara kholein.\n\n" if incomplete_subsections else "")
+                        + "Test download karne ke liye, list se **test ka number** (jaise `5`) copy karke mujhe reply karein."
                     ),
                     reply_markup=reply_markup,
                     parse_mode=ParseMode.MARKDOWN
@@ -567,6 +1216,13 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 # Update state
                 context.user_data.pop(STATE_WAITING_SECTION_NUM, None)
                 context.user_data[STATE_WAITING_TEST_NUM] = True
+
+                # List ke pehle kuch tests background mein extract karein
+                prefetcher.cancel_owner(chat_id)
+                for ref in all_tests_in_section[:PREFETCH_TESTS]:
+                    test_id = ref.test_id
+                    if test_id:
+                        prefetcher.schedule(chat_id, ('test', test_id), lambda test_id=test_id: prefetch_questions(test_id))
                 
             else:
                  await update.message.reply_text(f"Invalid number. Kripya 1 aur {len(sections)} ke beech ka number reply karein.")
@@ -574,24 +1230,25 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # --- State 3: Waiting for Test Number (after txt file) ---
         elif context.user_data.get(STATE_WAITING_TEST_NUM):
-            combined_tests = context.user_data.get('last_tests')
-            series_details = context.user_data.get('series_details') # Keep series details
+            combined_tests = context.user_data.get('test_refs')
 
-            if not combined_tests or not series_details:
+            if not combined_tests or not context.user_data.get('current_series_slug'):
                 await update.message.reply_text("Session expire ho gaya hai ya test list nahi mili. Dobara `/search` karein.", parse_mode=ParseMode.MARKDOWN)
                 context.user_data.pop(STATE_WAITING_TEST_NUM, None) # Reset state
                 return
 
             if 0 <= number < len(combined_tests):
-                selected_test_info = combined_tests[number]
-                context.user_data['selected_test_info'] = selected_test_info # Store for format selection
+                selected_test = combined_tests[number]
+                context.user_data['selected_test'] = selected_test # Store for format selection
+                # Chune gaye test ke alawa baaki prefetches rok dein
+                prefetcher.cancel_owner(chat_id, keep=('test', selected_test.test_id))
                 
                 # Format poochne ke liye naya state set karein
                 context.user_data[STATE_WAITING_FORMAT_SINGLE] = True
                 # STATE_WAITING_TEST_NUM ko active rakhein
                 
                 await update.message.reply_text(
-                    f"Aapne test select kiya: `{selected_test_info['test_data'].get('title')}`\n\n"
+                    f"Aapne test select kiya: `{selected_test.title}`\n\n"
                     "Aapko kaunsa format chahiye?\n"
                     "Kripya reply karein: `html`, `txt`, `json`\n"
                     "('`both`' = html+txt, '`all`' = html+txt+json)",
@@ -633,38 +1290,16 @@ async def text_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 # --- Modified process_single_test_download to accept format ---
-async def process_single_test_download(update: Update, context: ContextTypes.DEFAULT_TYPE, selected_test: dict, section_context: dict, subsection_context: dict, file_format: str):
+async def process_single_test_download(update: Update, context: ContextTypes.DEFAULT_TYPE, selected_test: dict, series_details: dict, section_context: dict, subsection_context: dict, file_format: str):
     """Ek single test ko download aur send karta hai, specified format mein."""
     processing_message = await update.message.reply_text(f"⏳ **Processing...**\n`{selected_test.get('title')}`\n\nTest extract karne mein 1-2 minute lag sakte hain...", parse_mode=ParseMode.MARKDOWN)
     
     try:
         test_id = selected_test.get('id')
-        series_details = context.user_data.get('series_details') # Get series details from context
 
-        if not series_details:
-             await processing_message.edit_text("Error: Series details nahi mile. Session expire ho gaya hoga.")
-             return
-
-        questions_data = extractor.extract_questions(test_id)
-        
-        if questions_data.get('error'):
-            await processing_message.edit_text(f"Error extracting test: {questions_data.get('error')}")
-            return
-            
-        # Caption generate karein using passed context
-        caption = extractor.get_caption(
-            test_summary=selected_test,
-            series_details=series_details,
-            selected_section=section_context,
-            subsection_context=subsection_context
-            # Extractor name is not needed for single download
-        )
-        
         # File name (bina extension)
         base_file_name = f"{selected_test.get('title', 'test')[:50]}".replace('/', '_')
         
-        files_to_send = []
-        
         # --- NAYA: Config load karein taaki channel link mil sake ---
         config = get_config()
         invite_link = config.get('private_invite_link')
@@ -673,55 +1308,58 @@ async def process_single_test_download(update: Update, context: ContextTypes.DEF
         link_for_button = invite_link if invite_link else public_channel_id
         # --- END NAYA ---
         
-        # Generate HTML if needed
-        if file_format in ['html', 'both', 'all']:
-            html_content = generate_html(questions_data, extractor.last_details, channel_link=link_for_button) # Pass link
-            html_file = io.BytesIO(html_content.encode('utf-8'))
-            html_file.name = f"{base_file_name}.html"
-            files_to_send.append(html_file)
-        
-        # Generate TXT if needed
-        if file_format in ['txt', 'both', 'all']:
-            # --- FIXED: extractor.last_details ko pass kiya ---
-            txt_content = generate_txt(questions_data, extractor.last_details) # Use new generator
-            txt_file = io.BytesIO(txt_content.encode('utf-8'))
-            txt_file.name = f"{base_file_name}.txt"
-            files_to_send.append(txt_file)
-
-        # --- NAYA: Generate JSON if needed ---
-        if file_format in ['json', 'all']:
-            json_content = json.dumps(questions_data, indent=4, ensure_ascii=False)
-            json_file = io.BytesIO(json_content.encode('utf-8'))
-            json_file.name = f"{base_file_name}.json"
-            files_to_send.append(json_file)
+        # Documents taiyaar karein (cached file_id ho toh extraction/render skip)
+        # Extractor name single download mein nahi chahiye
+        formats = expand_formats(file_format)
+        prefetched = None
+        cache_context = upload_context(base_file_name, series_details, section_context, subsection_context)
+        if len(file_cache.lookup(test_id, formats, link_for_button, cache_context)) < len(formats):
+            # Browsing ke dauraan yeh test pehle se extract ho raha tha/ho chuka hai
+            prefetched = await prefetcher.get(('test', test_id))
+        documents, cache_keys, error = await asyncio.to_thread(
+            prepare_test_documents,
+            selected_test, series_details, section_context, subsection_context,
+            formats, link_for_button, base_file_name, None, prefetched
+        )
+        if error:
+            await processing_message.edit_text(f"Error extracting test: {error}")
+            return
 
         # Processing message delete karein
         await processing_message.delete()
         
-        sent_messages = []
-        # Files ko user ko send karein (ek-ek karke)
-        for i, file_to_send in enumerate(files_to_send):
-            sent_msg = await update.message.reply_document(
-                document=file_to_send,
-                caption=caption, # NAYA: Caption sabhi files par
-                parse_mode=ParseMode.MARKDOWN
+        # Files ko user ko ek album mein send karein (caption pehli file par)
+        try:
+            sent_messages = await send_documents_paced(context.bot, update.effective_chat.id, documents)
+        except BadRequest as e:
+            if not _is_bad_file_id(e) or all(cache_keys):
+                raise
+            # Cached file_id ab valid nahi hai - cache saaf karke dobara render/upload karein
+            file_cache.forget(test_id)
+            documents, cache_keys, error = await asyncio.to_thread(
+                prepare_test_documents,
+                selected_test, series_details, section_context, subsection_context,
+                formats, link_for_button, base_file_name, None, prefetched
             )
-            sent_messages.append(sent_msg)
+            if error:
+                await update.message.reply_text(f"Error extracting test: {error}")
+                return
+            sent_messages = await send_documents_paced(context.bot, update.effective_chat.id, documents)
+        remember_sent_files(sent_messages, cache_keys, link_for_button)
         
         # Auto-forward karein (agar set hai)
-        # config = get_config() # Pehle hi load kar liya hai
-        channel_id = config.get('forward_channel_id')
-        if channel_id:
-            try:
-                for sent_message in sent_messages:
-                    await context.bot.forward_message(
-                        chat_id=channel_id,
-                        from_chat_id=update.effective_chat.id,
-                        message_id=sent_message.message_id
-                    )
-            except Exception as e:
-                logger.error(f"Channel {channel_id} mein forward karne mein error: {e}")
-                await update.message.reply_text(f"⚠️ Test send ho gaya hai, lekin channel `{channel_id}` mein forward nahi kar paya. (Error: {e})", parse_mode=ParseMode.MARKDOWN)
+        # Ek batch call per channel, background mein - user ka reply forward ka wait nahi karta
+        channel_ids = get_forward_channels(config)
+        if channel_ids:
+            context.application.create_task(
+                forward_in_background(
+                    context.bot,
+                    update.effective_chat.id,
+                    [m.message_id for m in sent_messages],
+                    channel_ids
+                ),
+                update=update
+            )
 
     except Exception as e:
         logger.error(f"Test download/send karne mein error: {e}")
@@ -774,7 +1412,8 @@ async def bulk_download_start(update: Update, context: ContextTypes.DEFAULT_TYPE
     text = (
         f"🔢 **Kahaan se Shuru Karein?**\n\n"
         "Kripya test ka starting number type karein (jaise list mein 5 number se shuru karne ke liye `5` type karein).\n\n"
-        "Shuru se (number 1 se) start karne ke liye `1` type karein."
+        "Shuru se (number 1 se) start karne ke liye `1` type karein.\n\n"
+        "🔄 Sirf woh tests bhejne ke liye jo is destination par pehle nahi gaye (ya badal gaye hain), `sync` type karein."
         "\n\nCancel karne ke liye /cancel type karein."
     )
     
@@ -796,9 +1435,11 @@ async def receive_start_number(update: Update, context: ContextTypes.DEFAULT_TYP
     Start number save karta hai aur extractor ka naam poochta hai.
     """
     chat_id = update.effective_chat.id
+    # --- NAYA: 'sync' = sirf naye/badle hue tests (delivery ledger ke hisaab se) ---
+    sync_mode = update.message.text.strip().lower() == 'sync'
     try:
         # User-facing number 1-based hai
-        start_number = int(update.message.text.strip())
+        start_number = 1 if sync_mode else int(update.message.text.strip())
         if start_number < 1:
             start_number = 1 # Force start from 1 if user enters 0 or negative
     except ValueError:
@@ -807,6 +1448,7 @@ async def receive_start_number(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # 1-based start number store karein
     context.user_data['bulk_start_number'] = start_number 
+    context.user_data['bulk_sync'] = sync_mode
 
     # "Start Number" prompt ko delete karein
     if 'last_bot_message_id' in context.user_data:
@@ -905,7 +1547,9 @@ async def receive_destination(update: Update, context: ContextTypes.DEFAULT_TYPE
         "- `txt` (Sirf Text files)\n"
         "- `json` (Sirf JSON files)\n"
         "- `both` (HTML aur TXT dono)\n"
-        "- `all` (HTML, TXT, aur JSON teeno)\n\n"
+        "- `all` (HTML, TXT, aur JSON teeno)\n"
+        "- `zip` (Saari HTML files ZIP mein - badi ho toh kai parts)\n"
+        "- `zipall` (HTML, TXT, JSON teeno ZIP mein)\n\n"
         "Cancel karne ke liye /cancel type karein."
     )
     
@@ -921,8 +1565,8 @@ async def receive_format_bulk(update: Update, context: ContextTypes.DEFAULT_TYPE
     """
     file_format = update.message.text.strip().lower()
     
-    if file_format not in ['html', 'txt', 'json', 'both', 'all']: # Add 'json' and 'all'
-        await update.message.reply_text("Invalid format. Kripya `html`, `txt`, `json`, `both`, ya `all` type karein.")
+    if file_format not in ['html', 'txt', 'json', 'both', 'all', *ZIP_FORMATS]: # Add 'json', 'all' aur zip
+        await update.message.reply_text("Invalid format. Kripya `html`, `txt`, `json`, `both`, `all`, `zip` ya `zipall` type karein.")
         return ASK_FORMAT_BULK # State ko active rakhein
 
     context.user_data['bulk_format'] = file_format
@@ -965,16 +1609,68 @@ async def cancel_bulk_conversation(update: Update, context: ContextTypes.DEFAULT
     context.user_data.pop('bulk_start_number', None) 
     context.user_data.pop('bulk_destination', None)
     context.user_data.pop('bulk_format', None) # --- ADDED ---
+    context.user_data.pop('bulk_sync', None)
     
     # Send main menu again
     await send_main_menu(update, context, "🏠 Main Menu")
     return ConversationHandler.END
 
 # --- Bulk Download Logic (MODIFIED) ---
+def resolve_destination(destination: str, user_chat_id: int, config: dict):
+    """
+    Destination input ('1', '/d', '@channel', '-100...') ko chat ID mein badalta hai.
+    (chat_id, error_message) return karta hai.
+    """
+    if destination == '1':
+        return user_chat_id, None
+    if destination == '/d':
+        if not config.get('forward_channel_id'):
+            return None, "Error: Aapne default channel chuna, lekin koi default channel set nahi hai. /setchannel ka istemal karein."
+        return config.get('forward_channel_id'), None
+    if destination.startswith('@') or destination.startswith('-100'):
+        return destination, None
+    return None, "Error: Invalid destination input. Process cancel kar diya gaya hai."
+
+async def collect_tests(series_details: dict, sections: list) -> tuple[list | None, str | None]:
+    """
+    Di gayi sections ke saare subsections ke tests, list order mein: ([(test, section, subsection), ...], None).
+    Koi page fetch na ho toh (None, error) - adhoori list se test numbering khisak jaati, isliye koi list nahi.
+    """
+    tests_to_process = []
+    for sec in sections:
+        for sub in sec.get('subsections', []):
+            # Pages aate hi list mein judte hain (baaki pages background threads mein fetch hote rehte hain)
+            async for page in extractor.aiter_tests_in_subsection(series_details['id'], sec['id'], sub['id']):
+                if page is None:
+                    logger.warning(f"Subsection '{sub.get('name')}' ke saare tests fetch nahi ho sake.")
+                    return None, f"'{sec.get('name')} / {sub.get('name')}' ke saare tests fetch nahi ho sake"
+                tests_to_process.extend([(test, sec, sub) for test in page])
+    return tests_to_process, None
+
+def select_sync_tests(series_id, destination, tests_to_process: list):
+    """
+    Delivery ledger se diff karke sirf naye ya badle hue tests chunta hai (asli numbering ke saath).
+    (numbered_tests, new_count, changed_count) return karta hai.
+    """
+    delivered = delivery_ledger.delivered(series_id, destination)
+    numbered_tests, new_count, changed_count = [], 0, 0
+    for number, (test, sec, sub) in enumerate(tests_to_process, start=1):
+        test_id = str(test.get('id'))
+        previous = delivered.get(test_id)
+        if previous is None:
+            new_count += 1
+        elif previous != test_fingerprint(test):
+            changed_count += 1
+            file_cache.forget(test.get('id')) # Purani file_id mein purana content hai
+        else:
+            continue
+        numbered_tests.append((number, test, sec, sub))
+    return numbered_tests, new_count, changed_count
+
 async def perform_bulk_download(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Asynchronously sabhi tests ko download aur forward karta hai.
-    (MODIFIED: Start number aur format ka istemal karega)
+    Bulk job banata hai (test list + settings SQLite mein save) aur use chalata hai.
+    (MODIFIED: Job store mein checkpoint hota hai, taaki restart ke baad resume ho sake)
     """
     if not extractor:
         await update.message.reply_text("Bot abhi initialized nahi hai. Owner se /settoken karne ko kahein.")
@@ -992,63 +1688,55 @@ async def perform_bulk_download(update: Update, context: ContextTypes.DEFAULT_TY
     start_from_number = context.user_data.get('bulk_start_number', 1) 
     # Slicing ke liye 0-based index banayein
     start_index = max(0, start_from_number - 1)
+    sync_mode = context.user_data.get('bulk_sync', False)
     
     # Stop flag set karein in bot_data using user_chat_id as key
     context.bot_data[user_chat_id] = {STOP_BULK_DOWNLOAD_FLAG: False}
+    job_id = None
 
     try:
         # 1. Destination ID set karein
-        final_chat_id = None
-        config = get_config()
-        
-        if destination == '1':
-            final_chat_id = user_chat_id
-        elif destination == '/d':
-            final_chat_id = config.get('forward_channel_id')
-            if not final_chat_id:
-                await context.bot.send_message(user_chat_id, "Error: Aapne default channel chuna, lekin koi default channel set nahi hai. /setchannel ka istemal karein.")
-                return ConversationHandler.END # End here if default channel not set
-        elif destination.startswith('@') or destination.startswith('-100'):
-            final_chat_id = destination
-        else:
-            await context.bot.send_message(user_chat_id, "Error: Invalid destination input. Process cancel kar diya gaya hai.")
+        final_chat_id, error = resolve_destination(destination, user_chat_id, get_config())
+        if error:
+            await context.bot.send_message(user_chat_id, error)
             return ConversationHandler.END # End here for invalid input
 
         # 2. Tests ki list fetch karein
-        series_details = context.user_data.get('series_details')
+        series_details = await load_series(context.user_data.get('current_series_slug'))
         if not series_details:
             await context.bot.send_message(user_chat_id, "Error: Session expire ho gaya hai. /start se dobara search karein.")
             return ConversationHandler.END
 
-        tests_to_process = []
+        tests_to_process, error = [], None
         parts = query_data.split('_') # e.g., "bulk_section_all" or "bulk_subsection_single"
         bulk_level_name = series_details.get('name', 'Series') # Default name
 
         if parts[1] == "section": # Download all tests in the entire series
             bulk_level_name = series_details.get('name', 'Series')
-            for sec_idx, sec in enumerate(series_details.get('sections', [])):
-                for sub_idx, sub in enumerate(sec.get('subsections', [])):
-                    tests = extractor.get_tests_in_subsection(series_details['id'], sec['id'], sub['id'])
-                    if tests:
-                        tests_to_process.extend([(test, sec, sub) for test in tests])
+            tests_to_process, error = await collect_tests(series_details, series_details.get('sections', []))
                         
         elif parts[1] == "subsection": # Download related to a specific section
-            selected_section = context.user_data.get('selected_section')
+            section_index = context.user_data.get('section_index')
+            sections = series_details.get('sections', [])
+            selected_section = sections[section_index] if section_index is not None and section_index < len(sections) else None
             if not selected_section:
                 await context.bot.send_message(user_chat_id, "Error: Section data nahi mila. /start se dobara search karein.")
                 return ConversationHandler.END
             bulk_level_name = selected_section.get('name', 'Section')
 
             if parts[2] == "all": # Download all tests in the selected section
-                for sub_idx, sub in enumerate(selected_section.get('subsections', [])):
-                    tests = extractor.get_tests_in_subsection(series_details['id'], selected_section['id'], sub['id'])
-                    if tests:
-                        tests_to_process.extend([(test, selected_section, sub) for test in tests])
+                tests_to_process, error = await collect_tests(series_details, [selected_section])
             
             # (Note: "bulk_subsection_single" case yahaan se hata diya gaya hai kyonki UI use ab trigger nahi karta, 
             #  lekin logic rakha ja sakta hai agar zaroorat ho. Abhi ke liye yeh 'all' par hi chalega.)
 
 
+        if error:
+            await context.bot.send_message(
+                user_chat_id, f"❌ Test list poori nahi mili ({error}). Bulk job shuru nahi kiya gaya - thodi der baad dobara try karein."
+            )
+            return ConversationHandler.END
+
         if not tests_to_process:
             await context.bot.send_message(user_chat_id, f"Error: '{bulk_level_name}' mein download karne ke liye koi tests nahi mile.")
             return ConversationHandler.END # End if no tests found
@@ -1060,25 +1748,178 @@ async def perform_bulk_download(update: Update, context: ContextTypes.DEFAULT_TY
                 await context.bot.send_message(user_chat_id, f"Error: Aapne {start_from_number} se start karne ko kaha, lekin total {original_total} tests hi hain. Process cancel kar diya gaya hai.")
                 return ConversationHandler.END
             
-            # List ko slice karein
-            tests_to_process = tests_to_process[start_index:]
-            
-        total_tests_in_batch = len(tests_to_process) # Yeh naya total hai jo process hoga
+        # Asli test number (original list ke hisab se) ke saath job save karein
+        if sync_mode:
+            # --- NAYA: Sirf woh tests jo is destination par pehle nahi gaye ya badal gaye ---
+            numbered_tests, new_count, changed_count = select_sync_tests(series_details['id'], final_chat_id, tests_to_process)
+            if not numbered_tests:
+                await context.bot.send_message(user_chat_id, f"✅ **{bulk_level_name}** already up to date hai - `{final_chat_id}` par koi naya ya badla hua test nahi mila.", parse_mode=ParseMode.MARKDOWN)
+                return ConversationHandler.END
+            await context.bot.send_message(user_chat_id, f"🔄 Sync: {new_count} naye aur {changed_count} badle hue tests mile ({original_total} mein se).")
+            bulk_level_name = f"{bulk_level_name} (sync)"
+        else:
+            numbered_tests = [
+                (start_index + i + 1, test, sec, sub)
+                for i, (test, sec, sub) in enumerate(tests_to_process[start_index:])
+            ]
+        job_id = job_store.create_job(
+            user_chat_id=user_chat_id,
+            destination=final_chat_id,
+            file_format=file_format,
+            extractor_name=extractor_name,
+            level_name=bulk_level_name,
+            series_details=series_details,
+            start_number=start_from_number,
+            original_total=original_total,
+            tests=numbered_tests
+        )
         # --- End Naya Code ---
 
-        progress_message = await context.bot.send_message(
+    except Exception as e:
+        logger.error(f"Bulk download mein bada error: {e}")
+        await context.bot.send_message(user_chat_id, f"❌ Bulk download fail ho gaya: {e}")
+        
+    finally:
+        # Job na ban paya ho toh stop flag yahin saaf karein (warna run_bulk_job karega)
+        if job_id is None:
+            context.bot_data.pop(user_chat_id, None)
+        # Clean up user_data specific to this bulk download (MODIFIED)
+        context.user_data.pop('bulk_query_data', None)
+        context.user_data.pop('bulk_extractor_name', None)
+        context.user_data.pop('bulk_start_number', None) 
+        context.user_data.pop('bulk_destination', None)
+        context.user_data.pop('bulk_format', None) # --- ADDED ---
+        context.user_data.pop('bulk_sync', None)
+        # Reset general state flags as well
+        context.user_data.pop(STATE_WAITING_SEARCH_NUM, None)
+        context.user_data.pop(STATE_WAITING_SECTION_NUM, None)
+        context.user_data.pop(STATE_WAITING_TEST_NUM, None)
+
+    if job_id is not None:
+        await run_bulk_job(context.application, job_id)
+
+
+async def run_bulk_job(application: Application, job_id: int, resumed: bool = False):
+    """
+    Job store se ek bulk job chalata hai. Sirf 'pending' tests process hote hain aur har
+    album bhejne ke baad unka status checkpoint hota hai - isliye restart ke baad yahi
+    function wahi se resume kar sakta hai.
+    """
+    bot = application.bot
+    job = job_store.get_job(job_id)
+    if not job:
+        logger.error(f"Bulk job {job_id} nahi mila.")
+        return
+
+    user_chat_id = job['user_chat_id']
+    final_chat_id = job['destination']
+    file_format = job['file_format']
+    extractor_name = job['extractor_name']
+    bulk_level_name = job['level_name']
+    series_details = job['series']
+    start_from_number = job['start_number']
+    original_total = job['original_total']
+
+    # Stop flag (resume par naya banta hai)
+    application.bot_data.setdefault(user_chat_id, {STOP_BULK_DOWNLOAD_FLAG: False})
+
+    def stop_requested() -> bool:
+        return application.bot_data.get(user_chat_id, {}).get(STOP_BULK_DOWNLOAD_FLAG, False)
+
+    zip_writer = None # 'zip' format mein neeche banta hai
+    progress = None   # Progress message milne ke baad reporter mein register hota hai
+    try:
+        if not extractor:
+            await bot.send_message(user_chat_id, f"⚠️ Bulk job #{job_id} resume nahi ho saka: bot abhi initialized nahi hai. /settoken ke baad bot restart karein.")
+            return
+
+        pending_tests = job_store.pending_tests(job_id)
+        counts = job_store.counts(job_id)
+        total_tests_in_batch = sum(counts.values()) # Yeh naya total hai jo process hoga
+        completed_in_this_batch = total_tests_in_batch - len(pending_tests)
+        failed_in_this_batch = 0 # Is run mein fail hue tests (completed mein nahi gine jaate)
+        job_scheduler.register(job_id, bulk_level_name, user_chat_id, final_chat_id, total_tests_in_batch, completed_in_this_batch)
+
+        progress_message = await bot.send_message(
             user_chat_id, 
-            f"✅ Starting bulk download for **{bulk_level_name}** ({total_tests_in_batch} tests).\n"
-            f"(Starting from number {start_from_number} of {original_total} total)\n" # User ko batayein
+            (f"♻️ Resuming bulk job #{job_id} for **{bulk_level_name}** ({len(pending_tests)} tests baaki).\n"
+             if resumed else
+             f"✅ Starting bulk download for **{bulk_level_name}** ({total_tests_in_batch} tests).\n")
+            + f"(Starting from number {start_from_number} of {original_total} total)\n" # User ko batayein
             f"Destination: `{final_chat_id}`\n"
             f"Format: `{file_format}`\n\n"
             "Rokne ke liye /stop type karein.",
             parse_mode=ParseMode.MARKDOWN
         )
+        job_store.set_progress_message(job_id, progress_message.message_id)
+        progress = progress_reporter.track(
+            job_id, user_chat_id, progress_message, bulk_level_name, total_tests_in_batch,
+            completed_in_this_batch, original_total, file_format, final_chat_id
+        )
 
         # --- Asli Download Loop (MODIFIED) ---
-        last_update_time = asyncio.get_event_loop().time()
-        completed_in_this_batch = 0 # Variable ka naam badal diya
+
+        # --- NAYA: Album buffer - lagatar chhote tests ki files ek media group mein jaati hain ---
+        pending_album = [] # [(BytesIO ya file_id, caption ya None), ...]
+        pending_keys = []  # Har document ki file_id cache key (ya None)
+        pending_names = [] # Error message ke liye test names
+        pending_test_ids = []
+        pending_positions = [] # Job store checkpoint ke liye
+        pending_sent_tests = [] # Delivery ledger ke liye test summaries
+        album_max_bytes = BULK_ALBUM_MAX_MB * 1024 * 1024
+
+        # --- NAYA: 'zip' format - files album ki jagah ZIP parts mein (har part upload limit ke andar) ---
+        if file_format in ZIP_FORMATS:
+            zip_writer = ZipPartWriter(bulk_level_name.replace('/', '_')[:60], BULK_ZIP_MAX_MB * 1024 * 1024)
+
+        async def upload_zip_part(part):
+            """Band hua ZIP part bhejta hai aur uske tests ko sent mark karta hai."""
+            items = part.labels
+            positions = [zip_item['position'] for zip_item in items]
+            # Naam mein asli test numbers - resume ke baad part numbering 1 se shuru hoti hai, naam phir bhi unique rehte hain
+            test_range = f"Tests {items[0]['test_number']}-{items[-1]['test_number']}"
+            caption = f"📦 **{bulk_level_name}** - {test_range}\n{len(items)} tests"
+            filename = f"{zip_writer.base_name} - {test_range}.zip"
+            try:
+                await send_document_paced(bot, final_chat_id, part.file, caption, filename=filename)
+                job_store.mark_tests(job_id, positions, TEST_SENT)
+                delivery_ledger.record(series_details.get('id'), final_chat_id, [zip_item['test'] for zip_item in items], job_id)
+            except Exception as e:
+                logger.error(f"ZIP part {part.number} ({part.size} bytes) bhejne mein error: {e}")
+                job_store.mark_tests(job_id, positions, TEST_FAILED, str(e))
+                await bot.send_message(user_chat_id, f"⚠️ ZIP part {part.number} bhejne mein error aaya ({len(items)} tests).\n(Error: {e})")
+            finally:
+                part.close()
+
+        async def flush_album():
+            """Buffer mein padi files destination par bhejta hai, naye file_ids cache karta hai aur checkpoint karta hai."""
+            if zip_writer:
+                part = zip_writer.close_part() # ZIP mode mein "buffer" = adhoora ZIP part
+                if part:
+                    await upload_zip_part(part)
+                return
+            if not pending_album:
+                return
+            try:
+                sent = await send_documents_paced(bot, final_chat_id, list(pending_album), album_limit=BULK_ALBUM_SIZE)
+                remember_sent_files(sent, pending_keys, link_for_button)
+                job_store.mark_tests(job_id, list(pending_positions), TEST_SENT)
+                delivery_ledger.record(series_details.get('id'), final_chat_id, pending_sent_tests, job_id)
+            except Exception as e:
+                logger.error(f"Album ({', '.join(pending_names)}) bhejne mein error: {e}")
+                job_store.mark_tests(job_id, list(pending_positions), TEST_FAILED, str(e))
+                if isinstance(e, BadRequest) and _is_bad_file_id(e):
+                    # Agli baar yeh tests dobara render/upload honge
+                    for album_test_id in pending_test_ids:
+                        file_cache.forget(album_test_id)
+                await bot.send_message(user_chat_id, f"⚠️ In tests ki files bhejne mein error aaya: {', '.join(pending_names)}\n(Error: {e})")
+            finally:
+                pending_album.clear()
+                pending_keys.clear()
+                pending_names.clear()
+                pending_test_ids.clear()
+                pending_positions.clear()
+                pending_sent_tests.clear()
 
         # --- NAYA: Config (link ke liye) ko loop ke bahar ek baar load karein ---
         config = get_config()
@@ -1087,124 +1928,215 @@ async def perform_bulk_download(update: Update, context: ContextTypes.DEFAULT_TY
         # Private link ko priority dein, agar nahi hai toh public ID use karein
         link_for_button = invite_link if invite_link else public_channel_id
         # --- END NAYA ---
+        formats = expand_formats(file_format)
+        image_report = {} # Is run mein inline hui images ke bytes (original vs optimized)
+
+        def file_name_for(item: dict) -> str:
+            # File name mein asli number add karein
+            return f"{item['test_number']}. {item['test'].get('title', 'test')[:50]}".replace('/', '_')
+
+        async def prepare_item(item: dict):
+            """Scheduler se slot lekar test ko worker thread mein extract/render karta hai."""
+            async with job_scheduler.slot(job_id):
+                started_at = time.perf_counter()
+                result = await asyncio.to_thread(
+                    prepare_test_documents,
+                    item['test'], series_details, item['section'], item['subsection'],
+                    formats, link_for_button, file_name_for(item),
+                    extractor_name, # Add extractor name here
+                    image_report=image_report,
+                    use_file_cache=zip_writer is None,
+                    wait_for_breaker=True # API down ho toh job rukta hai, tests fail nahi hote
+                )
+                metrics.observe('test_total', time.perf_counter() - started_at)
+                return result
+
+        # Per-job limit jitne tests aage se taiyaar hote hain; bhejna hamesha list ke order mein hota hai
+        upcoming = iter(pending_tests)
+        in_flight = deque()
+
+        def schedule_next():
+            item = next(upcoming, None)
+            if item is not None:
+                in_flight.append((item, asyncio.create_task(prepare_item(item))))
 
-        for test, sec, sub in tests_to_process:
+        for _ in range(job_scheduler.per_job_limit):
+            schedule_next()
+
+        while in_flight:
+            item, prepare_task = in_flight.popleft()
+            test = item['test']
             # Check for stop flag using user_chat_id as key in bot_data
-            if context.bot_data.get(user_chat_id, {}).get(STOP_BULK_DOWNLOAD_FLAG, False):
-                await progress_message.edit_text(f"🛑 Bulk download for **{bulk_level_name}** stopped after {completed_in_this_batch}/{total_tests_in_batch} tests.", parse_mode=ParseMode.MARKDOWN)
+            if stop_requested():
+                prepare_task.cancel()
+                for _, queued_task in in_flight:
+                    queued_task.cancel()
+                await flush_album() # Jo files ban chuki hain, woh bhej dein
+                job_store.set_status(job_id, JOB_STOPPED)
+                await progress_reporter.finish(progress)
+                failed_text = f" ({failed_in_this_batch} failed)" if failed_in_this_batch else ""
+                await progress_message.edit_text(f"🛑 Bulk download for **{bulk_level_name}** stopped after {completed_in_this_batch}/{total_tests_in_batch} tests{failed_text}.", parse_mode=ParseMode.MARKDOWN)
                 break # Exit the loop
                 
-            completed_in_this_batch += 1
+            schedule_next()
             # Asli test number (original list ke hisab se)
-            actual_test_number = start_index + completed_in_this_batch 
-            
-            # File name mein asli number add karein
-            base_file_name = f"{actual_test_number}. {test.get('title', 'test')[:50]}".replace('/', '_')
-
+            actual_test_number = item['test_number']
+            base_file_name = file_name_for(item)
+            progress.waiting_on(base_file_name) # Atak jaaye toh reporter "kitni der se" dikhata hai
 
             try:
-                # 1. Questions extract karein
-                questions_data = extractor.extract_questions(test.get('id'))
-                if questions_data.get('error'):
-                    logger.warning(f"Test {base_file_name} skip kiya (Error: {questions_data.get('error')})")
+                # 1-3. Questions extract karein, caption aur files banayein
+                # (Pehle upload ho chuke formats ka file_id reuse hota hai - extraction/render skip)
+                test_documents, cache_keys, error = await prepare_task
+                if error:
+                    logger.warning(f"Test {base_file_name} skip kiya (Error: {error})")
+                    job_store.mark_tests(job_id, [item['position']], TEST_FAILED, error)
+                    progress.advance(actual_test_number, failed=True)
+                    failed_in_this_batch += 1
+                    job_scheduler.record_failed(job_id)
                     continue
                 
-                # 2. Caption generate karein
-                caption = extractor.get_caption(
-                    test_summary=test,
-                    series_details=series_details,
-                    selected_section=sec,
-                    subsection_context=sub,
-                    extractor_name=extractor_name # Add extractor name here
-                )
-                
-                # 3. Files generate karein
-                files_to_send = []
-                
-                # Generate HTML if needed
-                if file_format in ['html', 'both', 'all']:
-                    html_content = generate_html(questions_data, extractor.last_details, channel_link=link_for_button) # Pass link
-                    html_file = io.BytesIO(html_content.encode('utf-8'))
-                    html_file.name = f"{base_file_name}.html"
-                    files_to_send.append(html_file)
-                
-                # Generate TXT if needed
-                if file_format in ['txt', 'both', 'all']:
-                    # --- FIXED: extractor.last_details ko pass kiya ---
-                    txt_content = generate_txt(questions_data, extractor.last_details) # Use new generator
-                    txt_file = io.BytesIO(txt_content.encode('utf-8'))
-                    txt_file.name = f"{base_file_name}.txt"
-                    files_to_send.append(txt_file)
-                
-                # --- NAYA: Generate JSON if needed ---
-                if file_format in ['json', 'all']:
-                    json_content = json.dumps(questions_data, indent=4, ensure_ascii=False)
-                    json_file = io.BytesIO(json_content.encode('utf-8'))
-                    json_file.name = f"{base_file_name}.json"
-                    files_to_send.append(json_file)
-
-                
-                # 4. Files ko destination par send karein
-                for i, file_to_send in enumerate(files_to_send):
-                    await context.bot.send_document(
-                        chat_id=final_chat_id,
-                        document=file_to_send,
-                        caption=caption, # NAYA: Caption sabhi files par
-                        parse_mode=ParseMode.MARKDOWN
+                if zip_writer:
+                    # 4. ZIP mode: files current part mein; part bhar gaya ho toh woh pehle upload hota hai
+                    part = zip_writer.add_files(
+                        [(document.name, document.getvalue()) for document, _ in test_documents], label=item
                     )
+                    if part:
+                        await upload_zip_part(part)
+                else:
+                    # 4. Files ko album buffer mein daalein (caption har test ki pehli file par)
+                    # (Rate limits aur RetryAfter upload scheduler handle karta hai)
+                    test_bytes = sum(_document_size(d) for d, _ in test_documents)
+                    pending_bytes = sum(_document_size(d) for d, _ in pending_album)
+                    if pending_album and (len(pending_album) + len(test_documents) > BULK_ALBUM_SIZE
+                                          or pending_bytes + test_bytes > album_max_bytes):
+                        await flush_album()
+                    pending_album.extend(test_documents)
+                    pending_keys.extend(cache_keys)
+                    pending_names.append(base_file_name)
+                    pending_test_ids.append(test.get('id'))
+                    pending_positions.append(item['position'])
+                    pending_sent_tests.append(test)
+                    if len(pending_album) >= BULK_ALBUM_SIZE or test_bytes > album_max_bytes:
+                        await flush_album()
                 
-                # 5. Progress update karein (MODIFIED)
-                current_time = asyncio.get_event_loop().time()
-                # Har 5 file ya 3 second mein message update karein
-                if completed_in_this_batch % 5 == 0 or current_time - last_update_time > 3:
-                    last_update_time = current_time 
-                    progress = completed_in_this_batch / total_tests_in_batch
-                    bar = "🟩" * int(progress * 10) + "⬜️" * (10 - int(progress * 10))
-                    
-                    try:
-                        await progress_message.edit_text(
-                            f"📥 Downloading **{bulk_level_name}**...\n\n"
-                            f"Progess: {bar} {completed_in_this_batch}/{total_tests_in_batch} ({int(progress * 100)}%)\n"
-                            f"(Overall Test {actual_test_number}/{original_total})\n\n"
-                            f"File: `{base_file_name}` (Format: {file_format})\n"
-                            f"Destination: `{final_chat_id}`\n\n"
-                            "Rokne ke liye /stop type karein.",
-                            parse_mode=ParseMode.MARKDOWN
-                        )
-                    except BadRequest as e:
-                        if "message is not modified" in str(e): pass
-                        else: raise 
-                
-                await asyncio.sleep(1) # Rate limit avoidance
+                # 5. Progress counters (message reporter task apni cadence par edit karta hai).
+                # Sirf buffer/ZIP tak pahunche tests "done" hain - fail hue alag gine jaate hain.
+                progress.advance(actual_test_number)
+                completed_in_this_batch += 1
+                job_scheduler.record_done(job_id)
                 
             except Exception as e:
                 logger.error(f"Test {base_file_name} process karne mein error: {e}")
-                await context.bot.send_message(user_chat_id, f"⚠️ Test `{base_file_name}` ko process karne mein error aaya: {e}", parse_mode=ParseMode.MARKDOWN)
-                await asyncio.sleep(2) 
+                job_store.mark_tests(job_id, [item['position']], TEST_FAILED, str(e))
+                progress.advance(actual_test_number, failed=True)
+                failed_in_this_batch += 1
+                job_scheduler.record_failed(job_id)
+                await bot.send_message(user_chat_id, f"⚠️ Test `{base_file_name}` ko process karne mein error aaya: {e}", parse_mode=ParseMode.MARKDOWN)
+
+        await flush_album() # Bachi hui files bhejein
 
         # Check if download completed without being stopped (MODIFIED)
-        if not context.bot_data.get(user_chat_id, {}).get(STOP_BULK_DOWNLOAD_FLAG, False):
-            actual_test_number = start_index + completed_in_this_batch
-            await progress_message.edit_text(f"✅ **Bulk Download Complete!**\n\n{completed_in_this_batch}/{total_tests_in_batch} tests (from {start_from_number} to {actual_test_number}) from **{bulk_level_name}** sent to `{final_chat_id}`.", parse_mode=ParseMode.MARKDOWN)
+        if not stop_requested():
+            job_store.set_status(job_id, JOB_COMPLETED)
+            await progress_reporter.finish(progress)
+            counts = job_store.counts(job_id)
+            failed_text = f"\n⚠️ {counts[TEST_FAILED]} tests fail hue." if counts.get(TEST_FAILED) else ""
+            image_text = ""
+            if image_report.get('images'):
+                saved_kb = (image_report['original_bytes'] - image_report['inlined_bytes']) // 1024
+                image_text = (f"\n🖼️ Images: {image_report['images']} inlined, "
+                              f"{image_report['original_bytes'] // 1024} KB -> {image_report['inlined_bytes'] // 1024} KB ({saved_kb} KB saved).")
+            zip_text = ""
+            if zip_writer and zip_writer.parts_closed:
+                zip_text = (f"\n📦 {zip_writer.parts_closed} ZIP part(s), "
+                            f"{zip_writer.bytes_in // 1024} KB -> {zip_writer.bytes_out // 1024} KB.")
+            await progress_message.edit_text(f"✅ **Bulk Download Complete!**\n\n{counts.get(TEST_SENT, 0)}/{total_tests_in_batch} tests (from {start_from_number}) from **{bulk_level_name}** sent to `{final_chat_id}`.{failed_text}{image_text}{zip_text}", parse_mode=ParseMode.MARKDOWN)
 
     except Exception as e:
-        logger.error(f"Bulk download mein bada error: {e}")
-        await context.bot.send_message(user_chat_id, f"❌ Bulk download fail ho gaya: {e}")
+        logger.error(f"Bulk job {job_id} mein bada error: {e}")
+        job_store.set_status(job_id, JOB_FAILED)
+        await bot.send_message(user_chat_id, f"❌ Bulk download fail ho gaya: {e}")
         
     finally:
-        # Clean up stop flag from bot_data
-        context.bot_data.pop(user_chat_id, None)
-        # Clean up user_data specific to this bulk download (MODIFIED)
-        context.user_data.pop('bulk_query_data', None)
-        context.user_data.pop('bulk_extractor_name', None)
-        context.user_data.pop('bulk_start_number', None) 
-        context.user_data.pop('bulk_destination', None)
-        context.user_data.pop('bulk_format', None) # --- ADDED ---
-        # Reset general state flags as well
-        context.user_data.pop(STATE_WAITING_SEARCH_NUM, None)
-        context.user_data.pop(STATE_WAITING_SECTION_NUM, None)
-        context.user_data.pop(STATE_WAITING_TEST_NUM, None)
+        if progress:
+            await progress_reporter.finish(progress)
+        if zip_writer:
+            zip_writer.discard() # Error ke baad adhoora part (agar ho) temp file mein na pada rahe
+        job_scheduler.unregister(job_id)
+        # Clean up stop flag from bot_data (agar is user ka koi aur job nahi chal raha)
+        if not job_scheduler.has_jobs_for(user_chat_id):
+            application.bot_data.pop(user_chat_id, None)
+
+
+async def run_watch_sync(application: Application, watch: dict):
+    """Watchlist ki ek series ko sync karta hai: naye/badle tests ka bulk job banakar chalata hai."""
+    key = (watch['series_id'], watch['destination'])
+    if key in running_syncs or not extractor:
+        return # Pichhla sync abhi chal raha hai (ya bot initialized nahi hai)
+    running_syncs.add(key)
+    try:
+        series_details = await asyncio.to_thread(extractor.get_series_details, watch['series_slug'])
+        if not series_details:
+            sync_watchlist.mark_synced(watch['watch_id'], "series details nahi mili")
+            return
+        tests_to_process, error = await collect_tests(series_details, series_details.get('sections', []))
+        if error:
+            # mark_synced nahi - agle sweep mein yeh watch phir se try hoga
+            logger.warning(f"Watch #{watch['watch_id']}: test list adhoori ({error}), sync agli baar.")
+            return
+        numbered_tests, new_count, changed_count = select_sync_tests(series_details['id'], watch['destination'], tests_to_process)
+        sync_watchlist.mark_synced(watch['watch_id'], f"{new_count} new, {changed_count} changed")
+        if not numbered_tests:
+            return
+
+        logger.info(f"Watch #{watch['watch_id']}: {new_count} naye, {changed_count} badle tests mile.")
+        job_id = job_store.create_job(
+            user_chat_id=watch['added_by'],
+            destination=watch['destination'],
+            file_format=watch['file_format'],
+            extractor_name=watch['extractor_name'],
+            level_name=f"{series_details.get('name', watch['series_name'])} (sync)",
+            series_details=series_details,
+            start_number=1,
+            original_total=len(tests_to_process),
+            tests=numbered_tests
+        )
+        await run_bulk_job(application, job_id)
+    except Exception as e:
+        logger.error(f"Watch #{watch['watch_id']} sync mein error: {e}")
+        sync_watchlist.mark_synced(watch['watch_id'], f"error: {e}")
+    finally:
+        running_syncs.discard(key)
+
+
+async def sync_watchlist_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: watchlist ki har series ka sync background mein shuru karta hai."""
+    for watch in sync_watchlist.all():
+        context.application.create_task(run_watch_sync(context.application, watch))
+
+
+async def track_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Har update se pehle (group -1): user ka last seen update karta hai (idle eviction ke liye)."""
+    if update.effective_user:
+        session_tracker.touch(update.effective_user.id, context.user_data)
+
+
+async def evict_idle_sessions_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: SESSION_IDLE_MINUTES se idle users ki navigation state memory (aur SQLite) se hatata hai."""
+    waiting_flags = (STATE_WAITING_SEARCH_NUM, STATE_WAITING_SECTION_NUM, STATE_WAITING_TEST_NUM, STATE_WAITING_FORMAT_SINGLE)
+    evicted = session_tracker.evict_idle(context.application.user_data, extra_keys=waiting_flags)
+    if evicted:
+        # Hatayi gayi keys agli persistence flush mein SQLite se bhi delete hon
+        context.application.mark_data_for_update_persistence(user_ids=evicted)
+
 
+async def resume_bulk_jobs(application: Application):
+    """Startup par adhoore ('running') bulk jobs ko background mein resume karta hai."""
+    for job_id in job_store.unfinished_jobs():
+        logger.info(f"Bulk job {job_id} resume ho raha hai...")
+        # (post_init ke waqt application abhi 'running' nahi hai, isliye seedha asyncio task)
+        asyncio.create_task(run_bulk_job(application, job_id, resumed=True))
 
 
 @admin_required
@@ -1233,19 +2165,48 @@ async def set_bot_commands(application: Application):
     # If kept, it needs error handling for application.bot access
     pass # Keeping it empty for now
 
-def main():
-    """Bot ko run karta hai."""
-    
-    # Pehli baar config files load/create karein
-    load_json(ADMIN_FILE, {'admin_ids': []})
-    # --- NAYA: Default config yahaan set hoga ---
-    get_config() 
-    
-    # Extractor ko initialize karein
-    if not init_extractor():
-        logger.warning("Bot shuru ho raha hai, lekin Testbook Token set nahi hai. /settoken ka istemal karein.")
+async def on_startup(application: Application):
+    """Application start hone ke baad background services (jaise metrics endpoint) shuru karta hai."""
+    if METRICS_PORT:
+        try:
+            application.bot_data['metrics_server'] = await start_metrics_server(METRICS_PORT, METRICS_HOST)
+        except OSError as e:
+            logger.error(f"Metrics endpoint shuru nahi ho paya (port {METRICS_PORT}): {e}")
+
+    # Restart se pehle chal rahe bulk jobs ko wahi se aage badhayein
+    await resume_bulk_jobs(application)
+
+    # Search index banne se pehle store hue questions (ek baar, background mein)
+    asyncio.create_task(asyncio.to_thread(question_index.backfill, question_store))
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Watchlist ki series ka regular sync (JobQueue ke liye 'job-queue' extra chahiye)
+    if SYNC_INTERVAL_MINUTES:
+        if application.job_queue is None:
+            logger.warning("JobQueue available nahi hai (pip install \"python-telegram-bot[job-queue]\"), watchlist auto-sync band hai.")
+        else:
+            application.job_queue.run_repeating(sync_watchlist_job, interval=SYNC_INTERVAL_MINUTES * 60, first=60, name="sync_watchlist")
+
+    # Idle admins ki navigation state hatana (har kuch minute check)
+    if SESSION_IDLE_MINUTES and application.job_queue is not None:
+        interval = max(60, SESSION_IDLE_MINUTES * 60 // 4)
+        application.job_queue.run_repeating(evict_idle_sessions_job, interval=interval, first=interval, name="evict_idle_sessions")
+
+def build_application(base_url: str | None = None) -> Application:
+    """
+    Saare handlers ke saath Application banata hai (polling aur webhook dono isi ko use karte hain).
+    `base_url` sirf local Bot API server / simulation ke liye hai (jaise benchmarks/simulate_webhook_push.py).
+    """
+    # Updates concurrently process hote hain (CONCURRENT_UPDATES tak), lekin ek chat ke andar order mein
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence(update_interval=PERSISTENCE_INTERVAL))
+        .post_init(on_startup)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     # --- Bulk Download Conversation Handler (MODIFIED) ---
     bulk_download_conv = ConversationHandler(
@@ -1267,12 +2228,16 @@ def main():
             CommandHandler("stop", stop_bulk_download) # Stop can also exit the conversation
         ],
         conversation_timeout=600, # --- Timeout 600 seconds (10 min) kar diya ---
-        per_message=False 
+        per_message=False,
+        name="bulk_download", # Persistence ke liye
+        persistent=True # Restart ke baad bhi conversation wahi se chale
     )
     
     application.add_handler(bulk_download_conv)
 
     # --- Command Handlers ---
+    # Har update par session ka last seen (baaki handlers se pehle, alag group mein)
+    application.add_handler(TypeHandler(Update, track_session), group=-1)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("menu", menu))
     application.add_handler(CommandHandler("search", search_command)) # Added /search
@@ -1288,6 +2253,14 @@ def main():
     application.add_handler(CommandHandler("removechannel", remove_channel))
     application.add_handler(CommandHandler("viewchannel", view_channel))
     application.add_handler(CommandHandler("stop", stop_bulk_download)) 
+    application.add_handler(CommandHandler("stats", stats_command)) # Stage timings
+    application.add_handler(CommandHandler("jobs", jobs_command)) # Bulk jobs ki list
+    application.add_handler(CommandHandler("findq", findq_command)) # Extract hue questions mein search
+    application.add_handler(CommandHandler("memstats", memstats_command)) # Sessions/series cache memory report
+    application.add_handler(InlineQueryHandler(inline_query_handler)) # @bot <query> se series search
+    application.add_handler(CommandHandler("watch", watch_command)) # Series auto-sync
+    application.add_handler(CommandHandler("unwatch", unwatch_command))
+    application.add_handler(CommandHandler("watchlist", watchlist_command))
     
     # --- NAYE HANDLERS: Link ke liye ---
     application.add_handler(CommandHandler("setlink", set_link))
@@ -1302,10 +2275,43 @@ def main():
     # Yeh handler naye STATE_WAITING_FORMAT_SINGLE ko bhi handle karega
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_input_handler))
 
-    logger.info("Bot shuru ho raha hai...")
+    return application
+
+def webhook_options() -> dict:
+    """config.py ki webhook settings ko run_webhook/start_webhook arguments mein badalta hai."""
+    return {
+        'listen': WEBHOOK_LISTEN,
+        'port': WEBHOOK_PORT,
+        'url_path': WEBHOOK_PATH,
+        'webhook_url': f"{WEBHOOK_URL}/{WEBHOOK_PATH}",
+        'secret_token': WEBHOOK_SECRET_TOKEN,
+    }
+
+def main():
+    """Bot ko run karta hai."""
+    
+    # Pehli baar config files load/create karein
+    load_json(ADMIN_FILE, {'admin_ids': []})
+    # --- NAYA: Default config yahaan set hoga ---
+    get_config() 
     
+    # Extractor ko initialize karein
+    if not init_extractor():
+        logger.warning("Bot shuru ho raha hai, lekin Testbook Token set nahi hai. /settoken ka istemal karein.")
+
+    application = build_application()
+
     # Bot ko run karein
-    application.run_polling()
+    if BOT_MODE == 'webhook':
+        # Telegram updates push karta hai; band hone par webhook delete ho jaata hai
+        options = webhook_options()
+        logger.info(f"Bot webhook mode mein shuru ho raha hai ({options['listen']}:{options['port']}/{options['url_path']})...")
+        if not WEBHOOK_SECRET_TOKEN:
+            logger.warning("WEBHOOK_SECRET_TOKEN set nahi hai - koi bhi webhook URL par fake updates bhej sakta hai.")
+        application.run_webhook(**options)
+    else:
+        logger.info("Bot polling mode mein shuru ho raha hai...")
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
@@ -47,6 +47,126 @@ else:
         logger.critical(f"CRITICAL ERROR: 'BOT_OWNER_ID' ({BOT_OWNER_ID_STR}) ek valid number nahi hai.")
         raise ValueError(f"CRITICAL ERROR: 'BOT_OWNER_ID' ({BOT_OWNER_ID_STR}) ek valid number nahi hai.")
 
+# --- NAYA: Optional settings (sab ke defaults hain) ---
+
+def _env_int(name: str, default: int | None = None) -> int | None:
+    """Optional integer environment variable padhta hai. Galat value par default use hota hai."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"'{name}' ({value}) ek valid number nahi hai, default ({default}) use ho raha hai.")
+        return default
+
+# Agar METRICS_PORT set hai, toh bot localhost par Prometheus text format mein
+# stage timings serve karega (jaise http://127.0.0.1:9100/metrics).
+METRICS_PORT = _env_int('METRICS_PORT')
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+
+# Telegram upload budgets (UploadScheduler ke liye). Bot API limits se zyada na rakhein.
+UPLOAD_GLOBAL_PER_SEC = _env_int('UPLOAD_GLOBAL_PER_SEC', 30)
+UPLOAD_PRIVATE_PER_MIN = _env_int('UPLOAD_PRIVATE_PER_MIN', 60)
+UPLOAD_GROUP_PER_MIN = _env_int('UPLOAD_GROUP_PER_MIN', 20)
+
+# Bulk job scheduler: poore bot mein ek saath kitne tests process hon, aur ek job kitne le sakta hai.
+# (Per-job limit 1 se zyada ho toh tests aage se taiyaar hote hain, lekin bhejna order mein hi hota hai)
+BULK_GLOBAL_CONCURRENCY = _env_int('BULK_GLOBAL_CONCURRENCY', 2)
+BULK_PER_JOB_CONCURRENCY = _env_int('BULK_PER_JOB_CONCURRENCY', 1)
+
+# Watchlist ki series har kitne minute mein sync hon (naye/badle tests bhejne ke liye). 0 = schedule band.
+SYNC_INTERVAL_MINUTES = max(0, _env_int('SYNC_INTERVAL_MINUTES', 360))
+
+# Subsection ke tests kitne-kitne ke pages mein aayein, aur total pata hone par kitne pages ek saath fetch hon
+TESTS_PAGE_SIZE = max(1, _env_int('TESTS_PAGE_SIZE', 100))
+TESTS_PAGE_CONCURRENCY = max(1, _env_int('TESTS_PAGE_CONCURRENCY', 4))
+
+# Testbook API: idempotent GET transient error (timeout/connection/5xx/429) par kitni baar retry ho,
+# lagatar kitne failures par circuit breaker khule, aur pehli baar kitne seconds khula rahe
+# (breaker khula ho toh bulk jobs rukte hain, search/browse turant error dete hain).
+API_MAX_RETRIES = max(0, _env_int('API_MAX_RETRIES', 3))
+API_BREAKER_FAILURES = max(1, _env_int('API_BREAKER_FAILURES', 5))
+API_BREAKER_COOLDOWN = max(1, _env_int('API_BREAKER_COOLDOWN', 30))
+# Hedged requests (opt-in): test data/answers ka GET haal ki latencies ke is percentile se zyada der le toh
+# wahi GET dobara jaata hai aur jo pehle aaye woh use hota hai. 0 = band; jaise 95.
+API_HEDGE_PERCENTILE = min(99, max(0, _env_int('API_HEDGE_PERCENTILE', 0)))
+
+# Browsing ke dauraan speculative prefetch: top kitni search results ki series details, aur chune gaye
+# section ke pehle kitne tests pehle se fetch hon (0 = band). Test prefetch kabhi submit nahi karta -
+# attempt na hue tests asli download par hi submit hote hain. PREFETCH_CONCURRENCY = ek saath kitne prefetch chalein.
+PREFETCH_SERIES = max(0, _env_int('PREFETCH_SERIES', 3))
+PREFETCH_TESTS = max(0, _env_int('PREFETCH_TESTS', 2))
+PREFETCH_CONCURRENCY = max(1, _env_int('PREFETCH_CONCURRENCY', 2))
+
+# /search pehle local series catalogue se: jo query pehle API se poochhi ja chuki hai uske results
+# itne ghante tak bina API call ke aate hain (purane hon toh bhi turant, refresh background mein).
+SEARCH_CACHE_HOURS = max(0, _env_int('SEARCH_CACHE_HOURS', 24))
+# Inline mode (@bot <query>, BotFather mein /setinline on karna hoga): typing rukne ke kitne ms baad API search ho,
+# aur ek query ke results (bot aur Telegram dono taraf) kitne seconds cache rahein.
+INLINE_DEBOUNCE_MS = max(0, _env_int('INLINE_DEBOUNCE_MS', 400))
+INLINE_CACHE_SECONDS = max(0, _env_int('INLINE_CACHE_SECONDS', 300))
+
+# HTML files mein images ko data URI bana kar daalein (offline diagrams). Band by default.
+IMAGE_INLINE = os.environ.get('IMAGE_INLINE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_MAX_MB = max(1, _env_int('IMAGE_CACHE_MAX_MB', 500)) # Isse bada hone par purani images hatengi
+IMAGE_FETCH_CONCURRENCY = max(1, _env_int('IMAGE_FETCH_CONCURRENCY', 8))
+IMAGE_MAX_KB = max(1, _env_int('IMAGE_MAX_KB', 2048)) # Isse badi image URL hi rehti hai
+# Inline se pehle images chhoti karein (Pillow install ho tab): IMAGE_MAX_WIDTH px se chaudi image resize
+# (0 = resize nahi), IMAGE_FORMAT = webp | jpeg | keep, IMAGE_QUALITY = 1-100. Chhoti na ho toh original.
+IMAGE_MAX_WIDTH = max(0, _env_int('IMAGE_MAX_WIDTH', 800))
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'webp').strip().lower()
+if IMAGE_FORMAT not in ('webp', 'jpeg', 'keep'):
+    logger.warning(f"IMAGE_FORMAT '{IMAGE_FORMAT}' samajh nahi aaya (webp | jpeg | keep), 'webp' use ho raha hai.")
+    IMAGE_FORMAT = 'webp'
+IMAGE_QUALITY = min(100, max(1, _env_int('IMAGE_QUALITY', 80)))
+
+# Ek saath kitne Telegram updates process hon (alag chats concurrently, ek chat ke andar order mein)
+CONCURRENT_UPDATES = max(1, _env_int('CONCURRENT_UPDATES', 16))
+
+# Bot kaise updates le: 'polling' (default, local development ke liye) ya 'webhook'
+# (Telegram updates seedha bot ke local HTTP server par push karta hai - kam latency).
+BOT_MODE = os.environ.get('BOT_MODE', 'polling').strip().lower()
+# Webhook mode settings. WEBHOOK_URL = public HTTPS base URL (jaise https://mybot.herokuapp.com);
+# reverse proxy/Heroku router us URL ko WEBHOOK_LISTEN:WEBHOOK_PORT par forward karta hai.
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_LISTEN = os.environ.get('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = _env_int('WEBHOOK_PORT', _env_int('PORT', 8443)) # Heroku 'PORT' deta hai
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', 'telegram').strip('/')
+# Telegram har push ke saath yeh secret header mein bhejta hai; galat secret wale requests reject hote hain.
+WEBHOOK_SECRET_TOKEN = os.environ.get('WEBHOOK_SECRET_TOKEN') or None
+
+if BOT_MODE not in ('polling', 'webhook'):
+    logger.warning(f"BOT_MODE '{BOT_MODE}' samajh nahi aaya, 'polling' use ho raha hai.")
+    BOT_MODE = 'polling'
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    logger.critical("CRITICAL ERROR: BOT_MODE=webhook hai lekin 'WEBHOOK_URL' set nahi hai.")
+    raise ValueError("CRITICAL ERROR: BOT_MODE=webhook ke liye 'WEBHOOK_URL' zaroori hai.")
+
+# Browsing sessions: itne minute koi update na aaye toh admin ki navigation state (search results,
+# test list) memory se hat jaati hai (0 = kabhi nahi). Series details sab admins ke beech ek shared
+# cache mein rehti hain - SERIES_CACHE_SIZE series tak (purani wali zaroorat par dobara load hoti hain).
+SESSION_IDLE_MINUTES = max(0, _env_int('SESSION_IDLE_MINUTES', 60))
+SERIES_CACHE_SIZE = max(1, _env_int('SERIES_CACHE_SIZE', 32))
+
+# Local SQLite database (file_id cache waghera ke liye)
+BOT_DB_FILE = os.environ.get('BOT_DB_FILE', 'bot_data.db')
+# Admins ki navigation/conversation state kitne seconds mein SQLite mein save ho (sirf badli hui keys)
+PERSISTENCE_INTERVAL = max(1, _env_int('PERSISTENCE_INTERVAL', 30))
+
+# Bulk mein lagatar tests ki files ek album (media group) mein jaati hain.
+# BULK_ALBUM_SIZE = ek album mein max documents (Telegram limit 10; 1 = albums band).
+BULK_ALBUM_SIZE = min(10, max(1, _env_int('BULK_ALBUM_SIZE', 10)))
+# Ek album ka max total size (MB). Isse bade tests alag album mein jaate hain.
+BULK_ALBUM_MAX_MB = _env_int('BULK_ALBUM_MAX_MB', 20)
+# Bulk progress message kitne seconds mein edit ho (ek chat mein kai jobs hon toh bhi har tick par ek edit).
+BULK_PROGRESS_SECONDS = max(1, _env_int('BULK_PROGRESS_SECONDS', 3))
+# `zip`/`zipall` bulk format: ek ZIP part ka max size (MB). Bot API upload limit 50 MB hai,
+# isliye isse pehle hi naya part shuru hota hai.
+BULK_ZIP_MAX_MB = min(50, max(1, _env_int('BULK_ZIP_MAX_MB', 45)))
+# --- END NAYA ---
+
 # Testbook Auth Token aur Gemini Key ko config.json mein move kar diya gaya hai,
 # taaki unhe bot commands se update kiya ja sake.
 # Unhe yahaan define karne ki zaroorat nahi hai.
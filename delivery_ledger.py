@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import hashlib
+import logging
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Delivery Ledger + Sync Watchlist
+# -----------------------------------------------------------------------------
+# Har (series, destination) ke liye yaad rakhta hai ki kaunse tests kis roop
+# (fingerprint) mein bheje ja chuke hain. "Sync" mode isi se diff karke sirf
+# naye ya badle hue tests bhejta hai. Watchlist ki series JobQueue se
+# regular interval par apne-aap sync hoti hain.
+# -----------------------------------------------------------------------------
+
+# Test list ki woh fields jo file/caption ko badalti hain. User-specific fields
+# (attempt status waghera) jaan-boojh kar shaamil nahi - woh hamare submit se hi badal jaati hain.
+FINGERPRINT_FIELDS = ('title', 'questionCount', 'duration', 'totalMark')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS delivery_ledger (
+    series_id TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    test_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    job_id INTEGER,
+    delivered_at REAL NOT NULL,
+    PRIMARY KEY (series_id, destination, test_id)
+);
+CREATE TABLE IF NOT EXISTS sync_watchlist (
+    watch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    series_id TEXT NOT NULL,
+    series_slug TEXT NOT NULL,
+    series_name TEXT,
+    destination TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    extractor_name TEXT,
+    added_by INTEGER NOT NULL,
+    last_sync_at REAL,
+    last_result TEXT,
+    UNIQUE (series_id, destination)
+);
+"""
+
+
+def test_fingerprint(test: dict) -> str:
+    """Test summary ka chhota hash (sirf FINGERPRINT_FIELDS se)."""
+    picked = {field: test.get(field) for field in FINGERPRINT_FIELDS}
+    raw = json.dumps(picked, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+class DeliveryLedger:
+    """(series, destination) -> {test_id: fingerprint} ka SQLite ledger."""
+
+    def __init__(self):
+        storage.executescript(_SCHEMA)
+
+    def delivered(self, series_id, destination) -> dict:
+        rows = storage.execute(
+            "SELECT test_id, fingerprint FROM delivery_ledger WHERE series_id = ? AND destination = ?",
+            (str(series_id), str(destination))
+        ).fetchall()
+        return {row['test_id']: row['fingerprint'] for row in rows}
+
+    def record(self, series_id, destination, tests: list, job_id: int | None = None):
+        """Bheje gaye tests (summary dicts) ledger mein likhta hai."""
+        now = time.time()
+        rows = [
+            (str(series_id), str(destination), str(test.get('id')), test_fingerprint(test), job_id, now)
+            for test in tests if test.get('id')
+        ]
+        if rows:
+            storage.executemany(
+                "INSERT OR REPLACE INTO delivery_ledger (series_id, destination, test_id, fingerprint, job_id, delivered_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def count(self, series_id, destination) -> int:
+        row = storage.execute(
+            "SELECT COUNT(*) AS n FROM delivery_ledger WHERE series_id = ? AND destination = ?",
+            (str(series_id), str(destination))
+        ).fetchone()
+        return row['n']
+
+
+class SyncWatchlist:
+    """Jin series ko schedule par sync karna hai unki list."""
+
+    def __init__(self):
+        storage.executescript(_SCHEMA)
+
+    def add(self, series_id, series_slug: str, series_name: str, destination, file_format: str,
+            extractor_name: str | None, added_by: int) -> int:
+        """Series ko watchlist mein daalta hai (pehle se ho toh settings update). watch_id return karta hai."""
+        storage.execute(
+            "INSERT INTO sync_watchlist (series_id, series_slug, series_name, destination, file_format, extractor_name, added_by) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (series_id, destination) DO UPDATE SET series_slug = excluded.series_slug, "
+            "series_name = excluded.series_name, file_format = excluded.file_format, "
+            "extractor_name = excluded.extractor_name, added_by = excluded.added_by",
+            (str(series_id), series_slug, series_name, str(destination), file_format, extractor_name, added_by)
+        )
+        row = storage.execute(
+            "SELECT watch_id FROM sync_watchlist WHERE series_id = ? AND destination = ?",
+            (str(series_id), str(destination))
+        ).fetchone()
+        return row['watch_id']
+
+    def remove(self, watch_id: int) -> bool:
+        return storage.execute("DELETE FROM sync_watchlist WHERE watch_id = ?", (watch_id,)).rowcount > 0
+
+    def all(self) -> list:
+        rows = storage.execute("SELECT * FROM sync_watchlist ORDER BY watch_id").fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_synced(self, watch_id: int, result: str):
+        storage.execute(
+            "UPDATE sync_watchlist SET last_sync_at = ?, last_result = ? WHERE watch_id = ?",
+            (time.time(), result, watch_id)
+        )
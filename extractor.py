@@ -4,16 +4,56 @@ import httpx
 import time
 import json
 import base64
+import asyncio
+import logging
+import threading
+from typing import NamedTuple
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics # Stage timings ke liye
+from api_policy import POLICIES, ApiError, CircuitBreaker, Hedger, classify_error, backoff_delay # Timeouts/retry/breaker/hedging
 # html_generator import ki ab yahaan zaroorat nahi hai
 # from config import TESTBOOK_AUTH_TOKEN (Ab config.py se nahi, bot.py se token milega)
 
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+class Marks(NamedTuple):
+    """Test ki marking scheme (sahi par +, galat par -)."""
+    positive: object = 'N/A'
+    negative: object = 'N/A'
+
+
+class Extraction(NamedTuple):
+    """
+    `extract_questions` ka result (har call ka apna, immutable). Error ho toh `quiz_data` None aur `error` mein message.
+    Extractor par koi state nahi rehti, isliye ek hi instance kai threads se ek saath extract kar sakta hai.
+    """
+    quiz_data: dict | None
+    marks: Marks = Marks()
+    error: str | None = None
+
+
+class Caption(NamedTuple):
+    """`get_caption` ka result: caption text + details dict (HTML/TXT header aur file_id cache ke liye)."""
+    text: str
+    details: dict
+
+
 class TestbookExtractor:
     """
     Testbook Extractor, synchronous (non-async) version.
     Token ab constructor ke through pass kiya jayega.
     """
     
-    def __init__(self, token: str):
+    # API response mein total tests ki ginti in mein se kisi key mein aati hai
+    _TOTAL_KEYS = ('count', 'totalCount', 'total', 'testCount')
+    # Total pata na ho toh sequential paging ki upper limit (galat API response par infinite loop se bachne ke liye)
+    _MAX_PAGES = 200
+    # API 'skip' ignore kare toh ek hi request mein itne tests (purane code ki limit)
+    _FULL_LIST_LIMIT = 500
+
+    def __init__(self, token: str, page_size: int = 100, page_concurrency: int = 4, max_retries: int = 3,
+                 breaker_failures: int = 5, breaker_cooldown: float = 30.0, hedge_percentile: float | None = None):
         self.base_url_new = "https://api-new.testbook.com"
         self.base_url_old = "https://api.testbook.com"
         
@@ -23,9 +63,20 @@ class TestbookExtractor:
             print("WARNING: TestbookExtractor ko bina token ke initialize kiya gaya hai!")
             raise ValueError("Auth Token zaroori hai.")
             
-        self.posMarks = 'N/A'
-        self.negMarks = 'N/A'
-        self.last_details = {} # HTML generation ke liye details store karein
+        self.page_size = max(1, page_size) # Subsection tests ek request mein kitne
+        self.page_concurrency = max(1, page_concurrency) # Baaki pages ek saath kitne fetch hon
+        self.max_retries = max(0, max_retries) # Idempotent GET transient error par kitni baar dobara
+        # Lagatar failures par saare API calls rokta hai (bulk jobs pause, interactive calls turant fail)
+        self.breaker = CircuitBreaker(failure_threshold=breaker_failures, cooldown=breaker_cooldown)
+        # Ek hi connection pool sab threads share karte hain (har request par naya TLS handshake nahi)
+        self._client = httpx.Client(limits=httpx.Limits(max_connections=20, max_keepalive_connections=10))
+        # Opt-in: slow test data/answers GET ka duplicate (percentile delay ke baad), jo pehle aaye
+        self.hedger = Hedger(percentile=hedge_percentile) if hedge_percentile else None
+
+        # /stats ke liye counters
+        self.retries = 0
+        self.errors = Counter() # ApiError.kind -> count
+        self._stats_lock = threading.Lock() # Counters kai worker threads (aur hedge pool) se badalte hain
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -36,37 +87,115 @@ class TestbookExtractor:
             'Authorization': f"Bearer {self.token}" # Header mein token set karein
         }
 
-    def _make_request(self, url: str, params: dict = None, method: str = 'GET', payload: dict = None, timeout: int = 300):
-        """Synchronous request method"""
-        try:
-            # Har request ke liye headers copy karein (kyonki self.token static hai)
-            request_headers = self.headers.copy()
-            
-            # Auth code ko params mein bhi daalna zaroori hai (Testbook API ke liye)
-            if params is None: params = {}
-            if 'auth_code' not in params:
-                params['auth_code'] = self.token
-            if 'language' not in params:
-                params['language'] = 'English'
-                
-            with httpx.Client() as client:
-                if method.upper() == 'POST':
-                    response = client.post(url, params=params, headers=request_headers, json=payload, timeout=timeout)
+    def _make_request(self, url: str, params: dict = None, method: str = 'GET', payload: dict = None,
+                      endpoint: str = 'browse', wait_for_breaker: bool = False):
+        """
+        Synchronous request method. (True, JSON) ya (False, ApiError) return karta hai.
+        `endpoint` (api_policy.POLICIES ki key) se timeouts, retry aur hedging ka bartaav tay hota hai.
+        Circuit breaker khula ho toh `wait_for_breaker=True` (sirf bulk jobs) cooldown tak rukta hai,
+        warna turant ApiError('circuit_open').
+        """
+        policy = POLICIES[endpoint]
+        method = method.upper()
+
+        # Auth code ko params mein bhi daalna zaroori hai (Testbook API ke liye)
+        params = dict(params or {})
+        params.setdefault('auth_code', self.token)
+        params.setdefault('language', 'English')
+
+        attempt = 0
+        while True:
+            if not self.breaker.acquire(wait=wait_for_breaker):
+                return False, self._count(ApiError('circuit_open', "Testbook API abhi fail ho rahi hai, thodi der baad try karein."))
+            try:
+                if self.hedger and policy.hedge and method == 'GET':
+                    data = self.hedger.run(endpoint, lambda cancelled: self._send(method, url, params, payload, policy, cancelled))
                 else:
-                    response = client.get(url, params=params, headers=request_headers, timeout=timeout)
-                
-                response.raise_for_status()
-                return True, response.json()
+                    data = self._send(method, url, params, payload, policy)
+            except Exception as e:
+                error = self._count(classify_error(e))
+            else:
+                self.breaker.record_success()
+                return True, data
+
+            if not error.transient:
+                if error.kind == 'request':
+                    self.breaker.release() # Local error - API ke baare mein kuch pata nahi chala
+                else:
+                    self.breaker.record_success() # API ne jawab diya (4xx / galat JSON), woh chal rahi hai
+                return False, error
+            self.breaker.record_failure()
+            if not policy.retry or attempt >= self.max_retries:
+                return False, error
+            delay = error.retry_after if error.retry_after is not None else backoff_delay(attempt)
+            attempt += 1
+            with self._stats_lock:
+                self.retries += 1
+            logger.warning(f"{endpoint} request fail ({error.kind}), {delay:.1f}s baad retry {attempt}/{self.max_retries}: {url}")
+            time.sleep(min(delay, 60))
+
+    def _send(self, method: str, url: str, params: dict, payload: dict | None, policy, cancelled=None):
+        """Ek HTTP attempt; JSON return ya httpx/JSON exception. `cancelled` set ho jaaye toh body padhe bina chhod deta hai."""
+        request = self._client.build_request(
+            method, url, params=params, headers=self.headers,
+            json=payload if method == 'POST' else None, timeout=policy.timeout
+        )
+        response = self._client.send(request, stream=True)
+        try:
+            if cancelled is not None and cancelled.is_set():
+                return None # Hedge ki doosri request jeet chuki hai
+            response.read()
+        finally:
+            response.close()
+        response.raise_for_status()
+        return response.json()
+
+    def _count(self, error: ApiError) -> ApiError:
+        with self._stats_lock:
+            self.errors[error.kind] += 1
+        return error
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        with self._stats_lock:
+            errors = ", ".join(f"`{kind}` {count}" for kind, count in sorted(self.errors.items())) or "koi nahi"
+        return (
+            f"🌐 **Testbook API:** breaker {self.breaker.state} (khula {self.breaker.times_opened}x, "
+            f"{self.breaker.rejected} rejected, {self.breaker.waited_seconds:.0f}s ruke) | "
+            f"{self.retries} retries | errors: {errors}"
+            + (f" | {self.hedger.render_text()}" if self.hedger else "")
+        )
+
+    def fetch_image(self, url: str, max_bytes: int = 2 * 1024 * 1024, timeout: int = 30):
+        """
+        Question/solution ki image download karta hai. (bytes, content_type) ya None.
+        Body stream hoti hai - `max_bytes` se badi image beech mein hi chhod di jaati hai (poori padhi nahi jaati).
+        """
+        try:
+            # Images CDN par hoti hain - wahan auth token bhejne ki zaroorat nahi
+            with httpx.Client(follow_redirects=True, max_redirects=3) as client:
+                with client.stream('GET', url, headers={'User-Agent': self.headers['User-Agent']}, timeout=timeout) as response:
+                    response.raise_for_status()
+                    declared = response.headers.get('content-length')
+                    if declared and declared.isdigit() and int(declared) > max_bytes:
+                        print(f"Image bahut badi hai ({url}): {declared} bytes")
+                        return None
+                    chunks, size = [], 0
+                    for chunk in response.iter_bytes():
+                        size += len(chunk)
+                        if size > max_bytes:
+                            print(f"Image bahut badi hai ({url}): {max_bytes} bytes se zyada")
+                            return None
+                        chunks.append(chunk)
+                    return b"".join(chunks), response.headers.get('content-type', '')
         except Exception as e:
-            error_message = f"Request Error: {str(e)}"
-            if 'response' in locals() and hasattr(response, 'status_code'):
-                error_message = f"Client Error: {response.status_code} - {response.text}"
-            return False, error_message
+            print(f"Image download error ({url}): {e}")
+            return None
 
     def search(self, query: str) -> list | None:
         search_url = f"{self.base_url_new}/api/v1/search/individual"
         params = {'term': query, 'searchObj': 'testSeries', 'limit': 30}
-        success, data = self._make_request(search_url, params=params)
+        success, data = self._make_request(search_url, params=params, endpoint='search')
         if success and data.get("success"):
             return data.get("data", {}).get("results", {}).get("testSeries")
         return None
@@ -79,14 +208,124 @@ class TestbookExtractor:
             return data.get("data", {}).get("details")
         return None
 
-    def get_tests_in_subsection(self, series_id: str, section_id: str, subsection_id: str) -> list | None:
+    def _get_tests_page(self, series_id: str, section_id: str, subsection_id: str, skip: int, limit: int):
+        """Subsection tests ka ek page. (tests ya error par None, total ya None) return karta hai."""
         url = f"{self.base_url_old}/api/v2/test-series/{series_id}/tests/details"
-        params = {'sectionId': section_id, 'subSectionId': subsection_id, 'limit': 500, 'testType': 'all'}
+        params = {'sectionId': section_id, 'subSectionId': subsection_id, 'skip': skip, 'limit': limit, 'testType': 'all'}
         success, data = self._make_request(url, params=params)
-        if success and data.get("success"):
-            return data.get("data", {}).get("tests")
-        return None
+        if not (success and data.get("success")):
+            return None, None
+        payload = data.get("data") or {}
+        total = next((payload[key] for key in self._TOTAL_KEYS if isinstance(payload.get(key), int)), None)
+        return payload.get("tests") or [], total
+
+    def iter_test_pages(self, series_id: str, section_id: str, subsection_id: str, page_size: int = None):
+        """
+        Subsection ke tests pages mein (order mein) yield karta hai. Pehla page turant milta hai;
+        agar usse total pata chal jaaye toh baaki pages threads mein ek saath fetch hote hain,
+        warna chhota page aane tak ek-ek karke. Kisi page par error ho toh None yield karke ruk jaata hai.
+        Doosra page pehle jaisa hi aaye (API ne 'skip' ignore kiya) toh poori list ek hi badi request mein aati hai.
+        """
+        page_size = page_size or self.page_size
+        first, total = self._get_tests_page(series_id, section_id, subsection_id, 0, page_size)
+        if first is None:
+            yield None
+            return
+
+        seen = set() # API 'skip' ignore kare toh duplicate tests na aayein
+        def fresh(page):
+            unique = [test for test in page if test.get('id') not in seen]
+            seen.update(test.get('id') for test in unique)
+            return unique
+
+        yield fresh(first)
+        if len(first) < page_size:
+            return
+
+        # Doosra page akele: isse pata chalta hai ki API 'skip' maanti hai ya nahi
+        second, _ = self._get_tests_page(series_id, section_id, subsection_id, page_size, page_size)
+        if second is None:
+            yield None
+            return
+        if second and second[0].get('id') == first[0].get('id'):
+            limit = max(total or 0, self._FULL_LIST_LIMIT)
+            logger.warning(f"Subsection {subsection_id}: API ne 'skip' ignore kiya, poori list (limit {limit}) ek saath la rahe hain.")
+            full, _ = self._get_tests_page(series_id, section_id, subsection_id, 0, limit)
+            if full is None:
+                yield None
+                return
+            unique = fresh(full)
+            if unique:
+                yield unique
+            return
+        unique = fresh(second)
+        if unique:
+            yield unique
+        if len(second) < page_size or not unique:
+            return
+
+        if total is not None:
+            skips = range(2 * page_size, total, page_size)
+            with ThreadPoolExecutor(max_workers=self.page_concurrency) as pool:
+                # map() results order mein deta hai, jabki fetch ek saath chalte hain
+                pages = pool.map(lambda skip: self._get_tests_page(series_id, section_id, subsection_id, skip, page_size)[0], skips)
+                for page in pages:
+                    if page is None:
+                        yield None
+                        return
+                    yield fresh(page)
+            return
+
+        skip = 2 * page_size
+        for _ in range(self._MAX_PAGES):
+            page, _ = self._get_tests_page(series_id, section_id, subsection_id, skip, page_size)
+            if page is None:
+                yield None
+                return
+            unique = fresh(page)
+            if unique:
+                yield unique
+            if len(page) < page_size or not unique:
+                return
+            skip += page_size
+
+    async def aiter_tests_in_subsection(self, series_id: str, section_id: str, subsection_id: str, page_size: int = None):
+        """`async for page in extractor.aiter_tests_in_subsection(...)` - har page aate hi milta hai (event loop block nahi hota)."""
+        pages = self.iter_test_pages(series_id, section_id, subsection_id, page_size)
+        done = object()
+        try:
+            while True:
+                page = await asyncio.to_thread(next, pages, done)
+                if page is done:
+                    return
+                yield page
+        finally:
+            await asyncio.to_thread(pages.close)
+
+    def get_tests_in_subsection(self, series_id: str, section_id: str, subsection_id: str) -> tuple[list | None, bool]:
+        """
+        (tests, complete) - subsection ke saare tests (sabhi pages). Pehla page hi fail ho toh (None, False);
+        baad ka koi page fail ho toh (ab tak mile tests, False).
+        """
+        tests = []
+        for page_number, page in enumerate(self.iter_test_pages(series_id, section_id, subsection_id)):
+            if page is None:
+                if page_number == 0:
+                    return None, False
+                logger.warning(f"Subsection {subsection_id} ka ek page fetch nahi hua, {len(tests)} tests hi mile.")
+                return tests, False
+            tests.extend(page)
+        return tests, True
     
+    @staticmethod
+    def _parse_marks(ans_map: dict) -> Marks:
+        """Pehle question ke answer data se marking scheme."""
+        try:
+            first_q_id = next(iter(ans_map))
+            return Marks(ans_map[first_q_id].get('posMarks', 'N/A'), ans_map[first_q_id].get('negMarks', 'N/A'))
+        except Exception:
+            return Marks() # Fallback
+
     def _parse_multi_language_data(self, base_data: dict, answers_data: dict) -> dict | None:
         """
         Yeh function waise hi hai, isme async kuch nahi tha.
@@ -99,14 +338,6 @@ class TestbookExtractor:
 
         result = {'title': q_data.get('title', 'Unknown Test'), 'questions': [], 'available_languages': []}
         lang_set = set()
-        
-        try:
-            first_q_id = list(ans_map.keys())[0]
-            self.posMarks = ans_map[first_q_id].get('posMarks', 'N/A')
-            self.negMarks = ans_map[first_q_id].get('negMarks', 'N/A')
-        except Exception:
-            self.posMarks = 'N/A' # Fallback
-            self.negMarks = 'N/A' # Fallback
 
         for section in q_data.get('sections', []):
             for q in section.get('questions', []):
@@ -153,13 +384,15 @@ class TestbookExtractor:
         result['available_languages'] = sorted(list(lang_set))
         return result
 
-    def _perform_instant_submit(self, test_id: str) -> (bool, str):
+    def _perform_instant_submit(self, test_id: str, wait_for_breaker: bool = False) -> (bool, str):
         """
         Synchronous instant submit.
         """
         try:
+            # "Start test" GET bhi state badalta hai - submit policy (na retry, na hedge)
             success_init, init_data = self._make_request(
-                f"{self.base_url_new}/api/v2/tests/{test_id}/instructions"
+                f"{self.base_url_new}/api/v2/tests/{test_id}/instructions", endpoint='submit',
+                wait_for_breaker=wait_for_breaker
             )
             if not success_init:
                 return False, f"Failed to start test (instructions): {init_data}"
@@ -169,7 +402,8 @@ class TestbookExtractor:
             url = f"{self.base_url_new}/api/v2/tests/{test_id}"
             params = {"attemptNo": attempt_no}
             submit_success, submit_data = self._make_request(
-                url, params=params, method='POST', payload={"task": "submit"}
+                url, params=params, method='POST', payload={"task": "submit"}, endpoint='submit',
+                wait_for_breaker=wait_for_breaker
             )
             
             if not submit_success:
@@ -181,51 +415,68 @@ class TestbookExtractor:
         except Exception as e:
             return False, f"Exception during submit: {str(e)}"
 
-    def extract_questions(self, test_id: str) -> dict:
+    @staticmethod
+    def _needs_submit(answers_data) -> bool:
+        """Answers isliye nahi mile ki test attempt/submit nahi hua (HTTP error body ya success:false response)."""
+        text = answers_data.body if isinstance(answers_data, ApiError) else json.dumps(answers_data, default=str)
+        return "not completed" in text.lower()
+
+    def extract_questions(self, test_id: str, allow_submit: bool = True, wait_for_breaker: bool = False) -> Extraction:
         """
-        Synchronous extract method.
+        Synchronous extract method. Parsed questions aur marks ek `Extraction` mein return hote hain.
+        `allow_submit=False` (prefetch): test attempt nahi hua ho toh submit nahi hota, error lautta hai.
+        `wait_for_breaker=True` (sirf bulk jobs): API down ho toh breaker band hone tak rukta hai.
         """
-        self.posMarks, self.negMarks = 'N/A', 'N/A'
-        
-        success_q, base_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}")
+        wait = wait_for_breaker
+        with metrics.timed('fetch_test'):
+            success_q, base_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}", endpoint='test',
+                                                      wait_for_breaker=wait)
         
         if not success_q or not base_data.get("success"):
-            return {'error': f'Failed to fetch test data: {base_data}'}
+            return Extraction(None, error=f'Failed to fetch test data: {base_data}')
 
         params_a = {'attemptNo': 1}
-        success_a, answers_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}/answers", params=params_a)
+        with metrics.timed('fetch_answers'):
+            success_a, answers_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}/answers", params=params_a, endpoint='test',
+                                                         wait_for_breaker=wait)
         
         if not success_a or not answers_data.get("success"):
-            if "not completed" in str(answers_data).lower():
+            if self._needs_submit(answers_data) and not allow_submit:
+                return Extraction(None, error='Test not attempted (submit skipped)')
+            if self._needs_submit(answers_data):
                 print(f"Test {test_id} not attempted. Performing instant submit...")
                 
-                submit_success, submit_message = self._perform_instant_submit(test_id)
+                with metrics.timed('submit_wait'):
+                    submit_success, submit_message = self._perform_instant_submit(test_id, wait)
                 
                 if not submit_success:
-                    return {'error': f"Failed to instant submit: {submit_message}"}
+                    return Extraction(None, error=f"Failed to instant submit: {submit_message}")
                 
                 print(f"Test {test_id} submitted. Fetching answers again...")
                 
-                success_a, answers_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}/answers", params=params_a)
+                with metrics.timed('fetch_answers'):
+                    success_a, answers_data = self._make_request(f"{self.base_url_new}/api/v2/tests/{test_id}/answers", params=params_a, endpoint='test',
+                                                         wait_for_breaker=wait)
                 
                 if not success_a or not answers_data.get("success"):
-                    return {'error': f'Failed to fetch answers even after submit: {answers_data}'}
+                    return Extraction(None, error=f'Failed to fetch answers even after submit: {answers_data}')
             
             else:
-                return {'error': f'Failed to fetch test answers/solutions: {answers_data}'}
+                return Extraction(None, error=f'Failed to fetch test answers/solutions: {answers_data}')
         
-        final_data = self._parse_multi_language_data(base_data, answers_data)
+        with metrics.timed('parse'):
+            final_data = self._parse_multi_language_data(base_data, answers_data)
         
         if not final_data or not final_data.get('questions'):
-            return {'error': 'Could not parse or merge test data.'}
+            return Extraction(None, error='Could not parse or merge test data.')
             
-        return final_data
+        return Extraction(final_data, self._parse_marks(answers_data.get('data') or {}))
 
-    def _get_caption_details(self, test_summary: dict, series_details: dict, selected_section: dict, subsection_context: dict) -> dict:
-        """Helper function jo caption ke liye details nikalta hai."""
-        
-        # Details ko 'last_details' mein save karein taaki html_generator use kar sake
-        self.last_details = {
+    @staticmethod
+    def _get_caption_details(test_summary: dict, series_details: dict, selected_section: dict, subsection_context: dict,
+                             marks: Marks) -> dict:
+        """Helper function jo caption ke liye details nikalta hai (har call par naya dict)."""
+        return {
             "Test Series": series_details.get('name', 'N/A'),
             "Section": selected_section.get('name', 'N/A'),
             "Subsection": subsection_context.get('name', 'N/A'),
@@ -233,24 +484,31 @@ class TestbookExtractor:
             "Questions": test_summary.get('questionCount', '?'),
             "Duration": f"{test_summary.get('duration', 'N/A')} min",
             "Total Marks": str(test_summary.get('totalMark', 'N/A')),
-            "Correct": f"+{self.posMarks}", 
-            "Incorrect": f"{self.negMarks}"
+            "Correct": f"+{marks.positive}", 
+            "Incorrect": f"{marks.negative}"
         }
-        return self.last_details
 
-    def get_caption(self, test_summary: dict, series_details: dict, selected_section: dict, subsection_context: dict, extractor_name: str = None) -> str:
+    def get_caption(self, test_summary: dict, series_details: dict, selected_section: dict, subsection_context: dict,
+                    marks: Marks = Marks(), extractor_name: str = None) -> Caption:
         """
         Test file ke liye ek formatted, cool caption generate karta hai.
+        Details bhi saath lautati hai (html_generator/txt_generator ke header ke liye).
         """
         # Pehle details fetch/calculate karein
         details = self._get_caption_details(
             test_summary=test_summary,
             series_details=series_details,
             selected_section=selected_section,
-            subsection_context=subsection_context
+            subsection_context=subsection_context,
+            marks=marks
         )
+        return Caption(self.format_caption(details, extractor_name), details)
 
-        # Ab caption banayein
+    @staticmethod
+    def format_caption(details: dict, extractor_name: str = None) -> str:
+        """
+        Details dict se caption banata hai. (Cached file_id reuse karte waqt bina extraction ke bhi kaam aata hai)
+        """
         caption = (
             f"✨ **{details.get('Test Name')}** ✨\n\n"
             f"📚 **Test Series:** {details.get('Test Series')}\n"
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import hashlib
+import logging
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Telegram file_id Cache
+# -----------------------------------------------------------------------------
+# Pehli baar upload hone par Telegram har document ka `file_id` deta hai. Wahi
+# file kisi bhi chat mein dobara bhejni ho toh file_id kaafi hai - na extraction,
+# na rendering, na upload. Key: (test id, format, render version). Render
+# version mein file ka naam aur series/section/subsection bhi hote hain -
+# file_id ka naam/caption header baad mein badla nahi ja sakta.
+# -----------------------------------------------------------------------------
+
+# html_generator / txt_generator ka output badle toh yeh number badhayein,
+# taaki purane file_ids reuse na hon.
+RENDER_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS telegram_file_ids (
+    test_id TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    render_version TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    details TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (test_id, file_format, render_version)
+);
+"""
+
+
+def upload_context(base_file_name: str, series_details: dict, section: dict, subsection: dict) -> str:
+    """
+    File ka naam aur series/section/subsection (header/caption details inhi se bante hain) ka chhota hash.
+    Single download ("{title}") aur bulk ("{n}. {title}") ki files isliye alag cache hoti hain.
+    """
+    parts = [base_file_name]
+    for level in (series_details, section, subsection):
+        level = level or {}
+        parts.append(str(level.get('id') or level.get('name') or ''))
+    return hashlib.sha1("\x1f".join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def render_version(file_format: str, channel_link: str | None, html_variant: str = '', context: str = '') -> str:
+    """
+    HTML mein channel button hota hai, isliye link badalne par version bhi badalta hai.
+    `html_variant` = HTML output badalne wali settings (jaise inline images).
+    `context` = upload_context() - file name aur section details.
+    """
+    version = str(RENDER_VERSION)
+    if context:
+        version = f"{version}@{context}"
+    if file_format == 'html':
+        if html_variant:
+            version = f"{version}+{html_variant}"
+        if channel_link:
+            link_hash = hashlib.sha1(channel_link.encode('utf-8')).hexdigest()[:10]
+            version = f"{version}:{link_hash}"
+    return version
+
+
+class FileIdCache:
+    """(test id, format, render version) -> Telegram file_id ka persistent map."""
+
+    def __init__(self, html_variant: str = ''):
+        self.html_variant = html_variant
+        storage.executescript(_SCHEMA)
+
+    def lookup(self, test_id: str, formats: list, channel_link: str | None, context: str = '') -> dict:
+        """
+        Diye gaye formats mein se jo cached hain, unka {format: {'file_id', 'details'}} return karta hai.
+        """
+        found = {}
+        for file_format in formats:
+            row = storage.execute(
+                "SELECT file_id, details FROM telegram_file_ids WHERE test_id = ? AND file_format = ? AND render_version = ?",
+                (str(test_id), file_format, render_version(file_format, channel_link, self.html_variant, context))
+            ).fetchone()
+            if row:
+                found[file_format] = {
+                    'file_id': row['file_id'],
+                    'details': json.loads(row['details']) if row['details'] else {}
+                }
+        return found
+
+    def remember(self, test_id: str, file_format: str, channel_link: str | None, file_id: str, details: dict,
+                 context: str = ''):
+        storage.execute(
+            "INSERT OR REPLACE INTO telegram_file_ids (test_id, file_format, render_version, file_id, details, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(test_id), file_format, render_version(file_format, channel_link, self.html_variant, context), file_id,
+             json.dumps(details, ensure_ascii=False), time.time())
+        )
+
+    def forget(self, test_id: str):
+        """Test ke sabhi cached file_ids hata deta hai (jaise file_id invalid ho jaaye)."""
+        storage.execute("DELETE FROM telegram_file_ids WHERE test_id = ?", (str(test_id),))
+        logger.info(f"Test {test_id} ke cached file_ids hata diye gaye.")
+
+    def count(self) -> int:
+        return storage.execute("SELECT COUNT(*) FROM telegram_file_ids").fetchone()[0]
@@ -6,6 +6,11 @@ import logging # Logging ke liye
 
 logger = logging.getLogger(__name__) # Logger instance banayein
 
+# Har <img> (inline ho ya URL wali) par lazy loading aur async decoding - jo attribute pehle se hai woh nahi badalta.
+# Yeh JSON string par chalte hain, isliye single quotes (JSON mein escape nahi karne padte).
+_IMG_NO_LOADING_RE = re.compile(r'<img\b(?![^>]*\bloading=)', re.IGNORECASE)
+_IMG_NO_DECODING_RE = re.compile(r'<img\b(?![^>]*\bdecoding=)', re.IGNORECASE)
+
 # --- HTML Template ---
 # JavaScript <script> block ke andar badlaav kiye gaye hain
 HTML_TEMPLATE = """
@@ -752,6 +757,10 @@ def generate_html(quiz_data: dict, details: dict, channel_link: str | None = Non
         <body><h1>Error: Invalid Quiz Data</h1><p>Could not serialize quiz data to JSON: {e}</p></body></html>
         """
 
+    if '<img' in processed_content_str or '<IMG' in processed_content_str:
+        processed_content_str = _IMG_NO_LOADING_RE.sub("<img loading='lazy'", processed_content_str)
+        processed_content_str = _IMG_NO_DECODING_RE.sub("<img decoding='async'", processed_content_str)
+
     final_html = HTML_TEMPLATE.replace('/* QUIZ_DATA_PLACEHOLDER */', processed_content_str)
 
     # Duration processing ko safe banayein
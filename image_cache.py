@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+import time
+import base64
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+try:
+    from PIL import Image # Optional: resize/re-encode ke liye (pip install pillow)
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Image Inlining + Content-Addressed Image Cache
+# -----------------------------------------------------------------------------
+# Question/solution HTML mein images URL se aati hain, isliye generated HTML
+# bina internet ke diagrams nahi dikhata. Yeh pipeline images ko ek saath
+# (threads mein) download karke disk par sha256 naam se save karti hai aur HTML
+# mein data URI bana kar daal deti hai. Ek hi image kai tests mein ho toh
+# sirf ek baar download/save hoti hai. Cache size se bada ho toh sabse purani
+# (least recently used) images hat jaati hain.
+#
+# Inline karne se pehle ImageOptimizer badi images ko max width tak chhota aur
+# WebP/JPEG mein re-encode karta hai (sirf tab jab result sach mein chhota ho),
+# aur <img> tags mein width/height + loading="lazy" decoding="async" jodta hai.
+# -----------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_urls (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_blobs (
+    sha256 TEXT PRIMARY KEY,
+    mime TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_image_blobs_last_used ON image_blobs (last_used);
+CREATE TABLE IF NOT EXISTS image_variants (
+    url TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    source_size INTEGER NOT NULL,
+    PRIMARY KEY (url, variant)
+);
+"""
+
+# <img ... src="..."> (quote ke saath)
+_IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=)(["\'])(.*?)\2([^>]*)', re.IGNORECASE | re.DOTALL)
+
+# Content-Type na mile toh file ke shuru ke bytes se pehchaan
+_MAGIC_MIME = (
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+    (b'<svg', 'image/svg+xml'),
+    (b'<?xml', 'image/svg+xml'),
+)
+
+
+def normalize_image_url(url: str) -> str | None:
+    """txt_generator jaisa: '//host/x' -> https, '/x' -> testbook.com. data: URIs ko None."""
+    url = (url or '').strip()
+    if not url or url.startswith('data:'):
+        return None
+    if url.startswith('//'):
+        return 'https:' + url
+    if url.startswith('/'):
+        return 'https://testbook.com' + url
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+    return None
+
+
+def image_dimensions(data: bytes):
+    """Bina Pillow ke PNG/GIF/JPEG header se (width, height). Pata na chale toh (None, None)."""
+    try:
+        if data.startswith(b'\x89PNG') and data[12:16] == b'IHDR':
+            return struct.unpack('>II', data[16:24])
+        if data[:4] == b'GIF8':
+            return struct.unpack('<HH', data[6:10])
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            chunk = data[12:16]
+            if chunk == b'VP8X':
+                return 1 + int.from_bytes(data[24:27], 'little'), 1 + int.from_bytes(data[27:30], 'little')
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                b0, b1, b2, b3 = data[21:25]
+                return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | (b1 >> 6))
+        if data.startswith(b'\xff\xd8'):
+            i = 2
+            while i + 9 < len(data):
+                if data[i] != 0xFF:
+                    i += 1
+                    continue
+                marker = data[i + 1]
+                length = struct.unpack('>H', data[i + 2:i + 4])[0]
+                # SOF0..SOF15 (DHT/JPG/DAC ko chhod kar) mein dimensions hote hain
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                    return width, height
+                i += 2 + length
+    except struct.error:
+        pass
+    return None, None
+
+
+def _sniff_mime(data: bytes, content_type: str) -> str | None:
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type.startswith('image/'):
+        return content_type
+    head = data[:64].lstrip()
+    for magic, mime in _MAGIC_MIME:
+        if head.startswith(magic):
+            return mime
+    return None
+
+
+class ImageCache:
+    """sha256 -> image bytes, disk par; url -> sha256 aur LRU info SQLite mein."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        storage.executescript(_SCHEMA)
+        row = storage.execute("SELECT COALESCE(SUM(size), 0) AS total FROM image_blobs").fetchone()
+        self.total_bytes = row['total']
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def get(self, url: str):
+        """(bytes, mime, sha256) ya None."""
+        row = storage.execute(
+            "SELECT b.sha256, b.mime FROM image_urls u JOIN image_blobs b ON b.sha256 = u.sha256 WHERE u.url = ?",
+            (url,)
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            with open(self._path(row['sha256']), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None # File disk se hat gayi - dobara download hogi
+        return data, row['mime'], row['sha256']
+
+    def put(self, url: str, data: bytes, mime: str) -> str:
+        """Image save karta hai (same content pehle se ho toh sirf URL map hota hai). sha256 return karta hai."""
+        sha = self._put_blob(data, mime)
+        storage.execute("INSERT OR REPLACE INTO image_urls (url, sha256) VALUES (?, ?)", (url, sha))
+        return sha
+
+    def _put_blob(self, data: bytes, mime: str) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._path(sha)
+        with self._lock:
+            exists = storage.execute("SELECT 1 FROM image_blobs WHERE sha256 = ?", (sha,)).fetchone()
+            if not exists or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path) # Adhoori file kabhi cache mein na dikhe
+                if not exists:
+                    self.total_bytes += len(data)
+            storage.execute(
+                "INSERT OR REPLACE INTO image_blobs (sha256, mime, size, last_used) VALUES (?, ?, ?, ?)",
+                (sha, mime, len(data), time.time())
+            )
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+        return sha
+
+    def get_variant(self, url: str, variant: str):
+        """Optimized copy: (bytes, mime, sha256, width, height, source_size) ya None."""
+        row = storage.execute(
+            "SELECT v.sha256, v.width, v.height, v.source_size, b.mime FROM image_variants v "
+            "JOIN image_blobs b ON b.sha256 = v.sha256 WHERE v.url = ? AND v.variant = ?",
+            (url, variant)
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            with open(self._path(row['sha256']), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return data, row['mime'], row['sha256'], row['width'], row['height'], row['source_size']
+
+    def put_variant(self, url: str, variant: str, data: bytes, mime: str, width, height, source_size: int) -> str:
+        """Optimized copy save karta hai (content-addressed, original jaisa hi ho toh wahi file)."""
+        sha = self._put_blob(data, mime)
+        storage.execute(
+            "INSERT OR REPLACE INTO image_variants (url, variant, sha256, width, height, source_size) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, variant, sha, width, height, source_size)
+        )
+        return sha
+
+    def touch(self, shas: list):
+        """Use hui images ka last_used update (LRU ke liye)."""
+        if shas:
+            now = time.time()
+            storage.executemany("UPDATE image_blobs SET last_used = ? WHERE sha256 = ?", [(now, sha) for sha in set(shas)])
+
+    def _evict(self):
+        """Sabse purani images hatata hai jab tak cache limit ke 90% tak na aa jaaye."""
+        target = int(self.max_bytes * 0.9)
+        rows = storage.execute("SELECT sha256, size FROM image_blobs ORDER BY last_used").fetchall()
+        removed = []
+        for row in rows:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(self._path(row['sha256']))
+            except OSError:
+                pass
+            self.total_bytes -= row['size']
+            removed.append(row['sha256'])
+        if removed:
+            with storage.transaction() as conn:
+                conn.executemany("DELETE FROM image_blobs WHERE sha256 = ?", [(sha,) for sha in removed])
+                conn.executemany("DELETE FROM image_urls WHERE sha256 = ?", [(sha,) for sha in removed])
+                conn.executemany("DELETE FROM image_variants WHERE sha256 = ?", [(sha,) for sha in removed])
+            logger.info(f"Image cache se {len(removed)} purani images hatayi gayi.")
+
+
+class ImageOptimizer:
+    """
+    Inline hone se pehle image ko `max_width` tak chhota aur WebP/JPEG mein re-encode karta hai.
+    Naya version original se chhota na ho toh original hi rehta hai. Pillow na ho toh kuch nahi badalta.
+    """
+
+    # fmt -> (Pillow format, mime); 'keep' = original format hi rehta hai
+    FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg'), 'keep': (None, None)}
+
+    def __init__(self, max_width: int = 800, fmt: str = 'webp', quality: int = 80):
+        self.max_width = max(0, max_width)
+        self.fmt = fmt if fmt in self.FORMATS else 'keep'
+        self.quality = min(max(quality, 1), 100)
+        wanted = bool(self.max_width) or self.fmt != 'keep'
+        self.enabled = wanted and Image is not None
+        if wanted and Image is None:
+            logger.warning("Pillow install nahi hai - images resize/re-encode nahi hongi (pip install pillow).")
+
+    @property
+    def signature(self) -> str:
+        """Settings ki pehchaan (cached variants aur file_id cache isi se alag hote hain)."""
+        if not self.enabled:
+            return 'orig'
+        quality = f"q{self.quality}" if self.fmt != 'keep' else ''
+        return f"w{self.max_width}-{self.fmt}{quality}"
+
+    @staticmethod
+    def _normalize_mode(img, target: str):
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+        if target == 'JPEG' and img.mode == 'RGBA':
+            # JPEG mein transparency nahi hoti - white background par flatten
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        return img
+
+    def _save_options(self, target: str) -> dict:
+        if target == 'WEBP':
+            return {'quality': self.quality, 'method': 4}
+        if target == 'JPEG':
+            return {'quality': self.quality, 'optimize': True, 'progressive': True}
+        if target == 'PNG':
+            return {'optimize': True}
+        return {}
+
+    def optimize(self, data: bytes, mime: str):
+        """(bytes, mime, width, height) return karta hai."""
+        width, height = image_dimensions(data)
+        if not self.enabled or mime == 'image/svg+xml':
+            return data, mime, width, height
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                width, height = img.size
+                if getattr(img, 'is_animated', False):
+                    return data, mime, width, height # Animation tootni nahi chahiye
+                target, new_mime = self.FORMATS[self.fmt]
+                resize = bool(self.max_width) and width > self.max_width
+                if target is None:
+                    if not resize:
+                        return data, mime, width, height
+                    target, new_mime = (img.format or 'PNG'), mime
+                out = self._normalize_mode(img, target)
+                if resize:
+                    out = out.resize((self.max_width, max(1, round(height * self.max_width / width))), Image.LANCZOS)
+                buffer = io.BytesIO()
+                out.save(buffer, format=target, **self._save_options(target))
+                new_width, new_height = out.size
+        except Exception as e:
+            logger.debug(f"Image optimize nahi hui, original use hogi: {e}")
+            return data, mime, width, height
+        optimized = buffer.getvalue()
+        if len(optimized) >= len(data):
+            return data, mime, width, height # Skip-if-smaller: original hi behtar hai
+        return optimized, new_mime, new_width, new_height
+
+
+class ImageInliner:
+    """
+    Quiz data ki HTML strings mein <img src> ko data URI se badalta hai.
+    `fetch(url, max_bytes)` -> (bytes, content_type) ya None (jaise TestbookExtractor.fetch_image).
+    Fail hue URL `failure_ttl` seconds tak dobara try nahi hote.
+    """
+
+    def __init__(self, cache: ImageCache, fetch, concurrency: int = 8, max_image_bytes: int = 2 * 1024 * 1024,
+                 memory_bytes: int = 32 * 1024 * 1024, optimizer: ImageOptimizer | None = None,
+                 failure_ttl: float = 600):
+        self.cache = cache
+        self.fetch = fetch
+        self.max_image_bytes = max_image_bytes
+        self.memory_bytes = memory_bytes
+        self.optimizer = optimizer or ImageOptimizer(max_width=0, fmt='keep')
+        self.variant = self.optimizer.signature
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='image-fetch')
+        self._lock = threading.Lock()
+        self._inflight = {}           # url -> Future (ek URL ek hi baar load ho, chahe kai tests maangein)
+        # url -> (data URI, sha256, width, height, original size, inlined size) - bulk run mein base64 dobara na bane
+        self._data_uris = OrderedDict()
+        self._data_uri_bytes = 0
+        self.failure_ttl = failure_ttl
+        self._failed = {}             # url -> monotonic time jab tak dobara try nahi (baar-baar try na karein)
+
+        # /stats ke liye counters
+        self.inlined = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fetched = 0
+        self.failed = 0
+        self.bytes_fetched = 0
+        self.bytes_original = 0 # Inline hui images ka original size
+        self.bytes_inlined = 0  # ...aur optimize ke baad ka size
+
+    @staticmethod
+    def _entry(data: bytes, mime: str, sha: str, width, height, source_size: int) -> tuple:
+        data_uri = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+        return data_uri, sha, width, height, source_size, len(data)
+
+    def _optimized_entry(self, url: str, data: bytes, mime: str) -> tuple:
+        """Original bytes ko optimize karke variant disk par save karta hai."""
+        new_data, new_mime, width, height = self.optimizer.optimize(data, mime)
+        sha = self.cache.put_variant(url, self.variant, new_data, new_mime, width, height, len(data))
+        return self._entry(new_data, new_mime, sha, width, height, len(data))
+
+    def _load(self, url: str):
+        """Pool thread mein: pehle optimized variant, phir disk wali original, warna download."""
+        stored = self.cache.get_variant(url, self.variant)
+        if stored:
+            data, mime, sha, width, height, source_size = stored
+            with self._lock:
+                self.disk_hits += 1
+            return self._entry(data, mime, sha, width, height, source_size)
+
+        original = self.cache.get(url)
+        if original:
+            data, mime, _ = original
+            with self._lock:
+                self.disk_hits += 1
+            return self._optimized_entry(url, data, mime)
+
+        result = self.fetch(url, self.max_image_bytes)
+        if not result:
+            return None
+        data, content_type = result
+        mime = _sniff_mime(data, content_type)
+        if not mime or len(data) > self.max_image_bytes:
+            return None
+        self.cache.put(url, data, mime)
+        with self._lock:
+            self.fetched += 1
+            self.bytes_fetched += len(data)
+        return self._optimized_entry(url, data, mime)
+
+    def _remember(self, url: str, entry: tuple):
+        with self._lock:
+            if url in self._data_uris:
+                return
+            self._data_uris[url] = entry
+            self._data_uri_bytes += len(entry[0])
+            while self._data_uri_bytes > self.memory_bytes and self._data_uris:
+                _, old = self._data_uris.popitem(last=False)
+                self._data_uri_bytes -= len(old[0])
+
+    def _resolve(self, urls: set) -> dict:
+        """{url: entry} jin URLs ki image mil gayi."""
+        resolved, used_shas, futures = {}, [], {}
+        for url in urls:
+            with self._lock:
+                if self._failed.get(url, 0.0) > time.monotonic():
+                    continue
+                self._failed.pop(url, None)
+                cached = self._data_uris.get(url)
+                if cached:
+                    self._data_uris.move_to_end(url)
+                    self.memory_hits += 1
+                else:
+                    future = self._inflight.get(url)
+                    if future is None:
+                        future = self._inflight[url] = self._pool.submit(self._load, url)
+                    futures[url] = future
+            if cached:
+                resolved[url] = cached
+                used_shas.append(cached[1])
+
+        for url, future in futures.items():
+            try:
+                entry = future.result()
+            except Exception as e:
+                logger.warning(f"Image load fail ({url}): {e}")
+                entry = None
+            finally:
+                with self._lock:
+                    self._inflight.pop(url, None)
+            if not entry:
+                with self._lock:
+                    if url not in self._failed:
+                        self.failed += 1
+                    self._failed[url] = time.monotonic() + self.failure_ttl
+                    if len(self._failed) > 10000: # Expire ho chuki entries saaf karein
+                        now = time.monotonic()
+                        self._failed = {key: until for key, until in self._failed.items() if until > now}
+                continue
+            resolved[url] = entry
+            used_shas.append(entry[1])
+            self._remember(url, entry)
+
+        self.cache.touch(used_shas)
+        return resolved
+
+    @staticmethod
+    def _collect_urls(value, urls: set):
+        if isinstance(value, str):
+            if '<img' in value or '<IMG' in value:
+                for match in _IMG_SRC_RE.finditer(value):
+                    url = normalize_image_url(match.group(3))
+                    if url:
+                        urls.add(url)
+        elif isinstance(value, dict):
+            for item in value.values():
+                ImageInliner._collect_urls(item, urls)
+        elif isinstance(value, list):
+            for item in value:
+                ImageInliner._collect_urls(item, urls)
+
+    def _rewrite(self, value, resolved: dict, tally: list):
+        """`tally[0]` mein is call mein inline hui images ginta hai (counter inline() lock ke andar jodta hai)."""
+        if isinstance(value, str):
+            if '<img' not in value and '<IMG' not in value:
+                return value
+
+            def replace(match):
+                attrs = (match.group(1) + match.group(4)).lower()
+                extra = '' # loading/decoding attributes html_generator har <img> par lagata hai
+                quote = match.group(2)
+                entry = resolved.get(normalize_image_url(match.group(3)))
+                if not entry:
+                    return f"{match.group(1)}{quote}{match.group(3)}{quote}{extra}{match.group(4)}"
+                data_uri, _, width, height = entry[:4]
+                # Explicit dimensions: image decode hone se pehle hi jagah ban jaati hai (layout jump nahi)
+                if width and height and 'width=' not in attrs and 'height=' not in attrs:
+                    extra += f' width="{width}" height="{height}"'
+                tally[0] += 1
+                return f"{match.group(1)}{quote}{data_uri}{quote}{extra}{match.group(4)}"
+            return _IMG_SRC_RE.sub(replace, value)
+        if isinstance(value, dict):
+            return {key: self._rewrite(item, resolved, tally) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._rewrite(item, resolved, tally) for item in value]
+        return value
+
+    def inline(self, quiz_data: dict, report: dict | None = None) -> dict:
+        """
+        Images inline ki hui nayi copy return karta hai (original data nahi badalta).
+        `report` diya ho toh usme images / original_bytes / inlined_bytes jud jaate hain (bulk run summary ke liye).
+        """
+        urls = set()
+        self._collect_urls(quiz_data, urls)
+        if not urls:
+            return quiz_data
+        resolved = self._resolve(urls)
+        original = sum(entry[4] for entry in resolved.values())
+        inlined = sum(entry[5] for entry in resolved.values())
+        with self._lock: # Bulk job ke kai worker threads ek hi report mein jodte hain
+            self.bytes_original += original
+            self.bytes_inlined += inlined
+            if report is not None:
+                report['images'] = report.get('images', 0) + len(resolved)
+                report['original_bytes'] = report.get('original_bytes', 0) + original
+                report['inlined_bytes'] = report.get('inlined_bytes', 0) + inlined
+        tally = [0]
+        rewritten = self._rewrite(quiz_data, resolved, tally)
+        with self._lock:
+            self.inlined += tally[0]
+        return rewritten
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        saved_kb = (self.bytes_original - self.bytes_inlined) // 1024
+        return (
+            f"🖼️ **Images:** {self.inlined} inlined, {self.fetched} downloaded ({self.bytes_fetched // 1024} KB), "
+            f"{self.disk_hits} disk + {self.memory_hits} memory cache hits, {self.failed} failed | "
+            f"optimize ({self.variant}): {saved_kb} KB saved | "
+            f"cache {self.cache.total_bytes // (1024 * 1024)}/{self.cache.max_bytes // (1024 * 1024)} MB"
+        )
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Fair Bulk Job Scheduler
+# -----------------------------------------------------------------------------
+# Kai admins ek saath series download karein toh sab jobs ek hi extractor aur
+# Bot API limits share karte hain. Yeh scheduler "slots" baant-ta hai:
+#   - global limit: poore bot mein ek waqt par kitne tests process ho sakte hain
+#   - per-job limit: ek job ek waqt par kitne slots le sakta hai
+#   - round-robin: free slot agle waiting job ko milta hai, taaki koi job bhookha na rahe
+# -----------------------------------------------------------------------------
+
+
+class _JobInfo:
+    """Scheduler ke andar ek job ki state."""
+
+    __slots__ = ('job_id', 'label', 'user_chat_id', 'destination', 'total', 'done',
+                 'start_done', 'failed', 'active', 'waiters', 'registered_at', 'started_at')
+
+    def __init__(self, job_id, label, user_chat_id, destination, total, done):
+        self.job_id = job_id
+        self.label = label
+        self.user_chat_id = user_chat_id
+        self.destination = destination
+        self.total = total
+        self.done = done
+        self.start_done = done # Resume se pehle ho chuke tests (speed mein nahi gine jaate)
+        self.failed = 0        # Is run mein fail hue tests (done mein nahi)
+        self.active = 0
+        self.waiters = deque()
+        self.registered_at = time.monotonic()
+        self.started_at = None # Pehla slot milne par set hota hai
+
+    @property
+    def state(self) -> str:
+        return 'running' if self.started_at is not None else 'queued'
+
+
+class JobScheduler:
+    """Bulk jobs ke beech slots ko round-robin se baant-ta hai."""
+
+    def __init__(self, global_limit: int = 2, per_job_limit: int = 1):
+        self.global_limit = max(1, global_limit)
+        self.per_job_limit = max(1, per_job_limit)
+        self._jobs = {}          # job_id -> _JobInfo (registration order mein)
+        self._rotation = deque() # Round-robin order
+        self._active = 0
+
+    def register(self, job_id: int, label: str, user_chat_id: int, destination, total: int, done: int = 0):
+        self._jobs[job_id] = _JobInfo(job_id, label, user_chat_id, destination, total, done)
+        self._rotation.append(job_id)
+
+    def unregister(self, job_id: int):
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        self._rotation.remove(job_id)
+        for waiter in job.waiters:
+            if not waiter.done():
+                waiter.cancel()
+        self._dispatch()
+
+    def record_done(self, job_id: int, count: int = 1):
+        job = self._jobs.get(job_id)
+        if job:
+            job.done += count
+
+    def record_failed(self, job_id: int, count: int = 1):
+        job = self._jobs.get(job_id)
+        if job:
+            job.failed += count
+
+    def has_jobs_for(self, user_chat_id: int) -> bool:
+        return any(job.user_chat_id == user_chat_id for job in self._jobs.values())
+
+    def _dispatch(self):
+        """Jab tak global slots free hain, round-robin mein waiting jobs ko slot dein."""
+        scanned = 0
+        while self._active < self.global_limit and scanned < len(self._rotation):
+            job_id = self._rotation[0]
+            self._rotation.rotate(-1)
+            job = self._jobs[job_id]
+            # Cancelled waiters ko hata dein
+            while job.waiters and job.waiters[0].done():
+                job.waiters.popleft()
+            if job.waiters and job.active < self.per_job_limit:
+                job.waiters.popleft().set_result(None)
+                job.active += 1
+                self._active += 1
+                if job.started_at is None:
+                    job.started_at = time.monotonic()
+                scanned = 0 # Slot diya, dobara poori rotation check karein
+            else:
+                scanned += 1
+
+    @asynccontextmanager
+    async def slot(self, job_id: int):
+        """`async with scheduler.slot(job_id):` - ek test process karne ki permission."""
+        job = self._jobs[job_id]
+        waiter = asyncio.get_running_loop().create_future()
+        job.waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot mil chuka tha lekin caller cancel ho gaya - slot wapas karein
+                self._release(job)
+            raise
+        try:
+            yield
+        finally:
+            self._release(job)
+
+    def _release(self, job: _JobInfo):
+        job.active -= 1
+        self._active -= 1
+        self._dispatch()
+
+    def render_text(self) -> str:
+        """/jobs command ke liye summary (Markdown)."""
+        if not self._jobs:
+            return "📭 Abhi koi bulk job queued ya running nahi hai."
+
+        lines = [f"🗂️ **Bulk Jobs** (slots: {self._active}/{self.global_limit} busy, per job max {self.per_job_limit})\n"]
+        now = time.monotonic()
+        for job in self._jobs.values():
+            if job.started_at is not None and now > job.started_at:
+                per_min = (job.done - job.start_done) / ((now - job.started_at) / 60)
+                speed = f"{per_min:.1f} tests/min"
+            else:
+                speed = f"queued {int(now - job.registered_at)}s"
+            failed = f" ({job.failed} failed)" if job.failed else ""
+            lines.append(
+                f"#{job.job_id} [{job.state}] **{job.label}**\n"
+                f"    {job.done}/{job.total} done{failed} | {speed} | → `{job.destination}` | by `{job.user_chat_id}`"
+            )
+        return "\n".join(lines)
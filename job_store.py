@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import logging
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Durable Bulk Job Store
+# -----------------------------------------------------------------------------
+# Har bulk download ek "job" hai jiski test list aur har test ka status SQLite
+# mein save hota hai. Bot restart hone par 'running' jobs wahi se resume hote
+# hain jahaan ruke the - na test index dobara fetch hota hai, na bheje hue tests
+# dobara bheje jaate hain.
+# -----------------------------------------------------------------------------
+
+# Job status
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_STOPPED = 'stopped'
+JOB_FAILED = 'failed'
+
+# Test status
+TEST_PENDING = 'pending'
+TEST_SENT = 'sent'
+TEST_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bulk_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_chat_id INTEGER NOT NULL,
+    destination TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    extractor_name TEXT,
+    level_name TEXT,
+    series TEXT NOT NULL,
+    start_number INTEGER NOT NULL,
+    original_total INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    progress_message_id INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bulk_job_tests (
+    job_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    test_number INTEGER NOT NULL,
+    test TEXT NOT NULL,
+    section TEXT NOT NULL,
+    subsection TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_bulk_jobs_status ON bulk_jobs (status);
+"""
+
+
+def _compact(context: dict) -> dict:
+    """Section/subsection/series dict mein se sirf caption ke kaam ki fields rakhein."""
+    return {'id': context.get('id'), 'name': context.get('name')}
+
+
+class BulkJobStore:
+    """Bulk jobs aur unke per-test status ka SQLite store."""
+
+    def __init__(self):
+        storage.executescript(_SCHEMA)
+
+    def create_job(self, user_chat_id: int, destination, file_format: str, extractor_name: str | None,
+                   level_name: str, series_details: dict, start_number: int, original_total: int,
+                   tests: list) -> int:
+        """
+        Naya job banata hai. `tests` = [(test_number, test, section, subsection), ...]
+        Naye job ka ID return karta hai.
+        """
+        now = time.time()
+        with storage.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO bulk_jobs (user_chat_id, destination, file_format, extractor_name, level_name, series, "
+                "start_number, original_total, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_chat_id, str(destination), file_format, extractor_name, level_name,
+                 json.dumps(_compact(series_details), ensure_ascii=False),
+                 start_number, original_total, JOB_RUNNING, now, now)
+            )
+            job_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO bulk_job_tests (job_id, position, test_number, test, section, subsection, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, position, test_number, json.dumps(test, ensure_ascii=False),
+                     json.dumps(_compact(sec), ensure_ascii=False), json.dumps(_compact(sub), ensure_ascii=False),
+                     TEST_PENDING)
+                    for position, (test_number, test, sec, sub) in enumerate(tests)
+                ]
+            )
+        logger.info(f"Bulk job {job_id} banaya gaya ({len(tests)} tests).")
+        return job_id
+
+    def get_job(self, job_id: int) -> dict | None:
+        row = storage.execute("SELECT * FROM bulk_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['series'] = json.loads(job['series'])
+        return job
+
+    def pending_tests(self, job_id: int) -> list:
+        """Jo tests abhi bheje nahi gaye, unki list (position order mein)."""
+        rows = storage.execute(
+            "SELECT position, test_number, test, section, subsection FROM bulk_job_tests "
+            "WHERE job_id = ? AND status = ? ORDER BY position",
+            (job_id, TEST_PENDING)
+        ).fetchall()
+        return [
+            {
+                'position': row['position'],
+                'test_number': row['test_number'],
+                'test': json.loads(row['test']),
+                'section': json.loads(row['section']),
+                'subsection': json.loads(row['subsection']),
+            }
+            for row in rows
+        ]
+
+    def mark_tests(self, job_id: int, positions: list, status: str, error: str | None = None):
+        """Kai tests ka status ek transaction mein update karta hai (checkpoint)."""
+        if not positions:
+            return
+        with storage.transaction() as conn:
+            conn.executemany(
+                "UPDATE bulk_job_tests SET status = ?, error = ? WHERE job_id = ? AND position = ?",
+                [(status, error, job_id, position) for position in positions]
+            )
+            conn.execute("UPDATE bulk_jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def counts(self, job_id: int) -> dict:
+        """{status: count} - progress dikhane ke liye."""
+        rows = storage.execute(
+            "SELECT status, COUNT(*) AS n FROM bulk_job_tests WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def set_status(self, job_id: int, status: str):
+        storage.execute("UPDATE bulk_jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+    def set_progress_message(self, job_id: int, message_id: int):
+        storage.execute("UPDATE bulk_jobs SET progress_message_id = ? WHERE job_id = ?", (message_id, job_id))
+
+    def unfinished_jobs(self) -> list:
+        """Restart ke baad resume karne layak jobs ke IDs."""
+        rows = storage.execute("SELECT job_id FROM bulk_jobs WHERE status = ? ORDER BY job_id", (JOB_RUNNING,)).fetchall()
+        return [row['job_id'] for row in rows]
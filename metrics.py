@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Stage Timing Metrics
+# -----------------------------------------------------------------------------
+# Bulk run ke har test ke stages (fetch, submit, parse, render, upload) ka time
+# yahaan histograms mein jama hota hai. /stats command aur optional Prometheus
+# endpoint dono isi registry se padhte hain.
+# -----------------------------------------------------------------------------
+
+# Histogram buckets (seconds mein)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Stages ka display order (/stats ke liye). Anjaan stages end mein aate hain.
+STAGE_ORDER = (
+    'fetch_test', 'fetch_answers', 'submit_wait', 'parse',
+    'inline_images', 'render_html', 'render_txt', 'render_json', 'upload_wait', 'upload', 'test_total',
+)
+
+
+class Histogram:
+    """Ek simple cumulative-bucket histogram (Prometheus jaisa)."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Bucket boundaries se approximate quantile nikalta hai."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            running += bucket_count
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class StageMetrics:
+    """Stage name -> Histogram registry. Thread-safe (extractor threads se bhi call ho sakta hai)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self.started_at = time.time()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """`with metrics.timed('parse'):` - block ka time stage mein record karta hai."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def _sorted_items(self):
+        with self._lock:
+            items = list(self._histograms.items())
+        order = {name: i for i, name in enumerate(STAGE_ORDER)}
+        return sorted(items, key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+    def render_text(self) -> str:
+        """/stats command ke liye human-readable summary (Markdown)."""
+        items = self._sorted_items()
+        if not items:
+            return "📊 Abhi tak koi timing data nahi hai."
+
+        uptime_min = (time.time() - self.started_at) / 60
+        lines = [f"📊 **Stage Timings** (pichhle {uptime_min:.0f} min)\n", "```"]
+        lines.append(f"{'stage':<14}{'count':>7}{'avg':>8}{'p50':>8}{'p95':>8}{'max':>8}")
+        for stage, h in items:
+            lines.append(
+                f"{stage:<14}{h.count:>7}{h.average:>8.2f}{h.quantile(0.5):>8.2f}"
+                f"{h.quantile(0.95):>8.2f}{h.max:>8.2f}"
+            )
+        lines.append("```")
+        lines.append("(Sabhi values seconds mein hain)")
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP testbook_stage_duration_seconds Bulk/single download stages ka time.",
+            "# TYPE testbook_stage_duration_seconds histogram",
+        ]
+        for stage, h in self._sorted_items():
+            running = 0
+            for bound, bucket_count in zip(h.buckets, h.bucket_counts):
+                running += bucket_count
+                lines.append(f'testbook_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {running}')
+            lines.append(f'testbook_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'testbook_stage_duration_seconds_sum{{stage="{stage}"}} {h.total:.6f}')
+            lines.append(f'testbook_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+# Global registry (extractor aur bot dono yahi use karte hain)
+metrics = StageMetrics()
+
+
+# =============================================================================
+# === OPTIONAL PROMETHEUS ENDPOINT ===
+# =============================================================================
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Bahut chhota HTTP handler: sirf GET /metrics serve karta hai."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Baaki headers padh kar discard karein
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if not line or line in (b'\r\n', b'\n'):
+                break
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = "200 OK", metrics.render_prometheus().encode('utf-8')
+        else:
+            status, body = "404 Not Found", b"Not Found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.warning(f"Metrics request handle karne mein error: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int, host: str = '127.0.0.1') -> asyncio.AbstractServer:
+    """Local Prometheus endpoint shuru karta hai (http://host:port/metrics)."""
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    logger.info(f"Metrics endpoint shuru ho gaya: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import logging
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# SQLite Persistence (user_data + ConversationHandler states)
+# -----------------------------------------------------------------------------
+# Admins ki navigation state (search_hits, series slug, test_refs - session_state.py
+# ke chhote records - STATE_WAITING_* flags, bulk settings) restart ke baad bhi bachi rehti hai.
+# PicklePersistence ki tarah poori file dobara nahi likhi jaati:
+#   - har (user, key) ek alag row hai; sirf badli hui keys likhi/delete hoti hain
+#   - bade values (jaise lambi test_refs list) zlib se compress hokar save hote hain
+#   - kisi user ka data pehli baar uska update aane par hi load hota hai (lazy)
+# bot_data aur chat_data persist nahi hote (stop flags aur server handles runtime-only hain).
+# -----------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS persist_user_data (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS persist_conversations (
+    name TEXT NOT NULL,
+    conv_key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (name, conv_key)
+);
+"""
+
+
+def _digest(raw: bytes) -> bytes:
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class SQLitePersistence(BasePersistence):
+    """Key-level, lazy loading SQLite persistence (sirf user_data aur conversations)."""
+
+    def __init__(self, update_interval: float = 30, compress_threshold: int = 1024):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.compress_threshold = compress_threshold
+        self._loaded_users = set() # Jin users ka data DB se load ho chuka hai
+        self._digests = {}         # user_id -> {key: stored value ka digest}
+        self._skipped_keys = set() # (user_id, key) jo save nahi ho sakte (warning ek hi baar)
+
+        # Counters (debugging/stats ke liye)
+        self.rows_written = 0
+        self.rows_unchanged = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+        storage.executescript(_SCHEMA)
+
+    # --- Encoding ---
+
+    def _encode(self, value) -> tuple[bytes, bool, int]:
+        """(stored blob, compressed?, raw size) return karta hai."""
+        raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(raw) >= self.compress_threshold:
+            packed = zlib.compress(raw, 6)
+            if len(packed) < len(raw):
+                return packed, True, len(raw)
+        return raw, False, len(raw)
+
+    @staticmethod
+    def _decode(blob: bytes, compressed: bool):
+        return pickle.loads(zlib.decompress(blob) if compressed else blob)
+
+    # --- user_data ---
+
+    async def get_user_data(self) -> dict:
+        # Startup par kuch load nahi hota - har user ka data refresh_user_data mein aata hai
+        return {}
+
+    def _load_user(self, user_id: int) -> dict:
+        rows = storage.execute(
+            "SELECT key, value, compressed FROM persist_user_data WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        data, digests = {}, {}
+        for row in rows:
+            try:
+                value = self._decode(row['value'], bool(row['compressed']))
+            except Exception as e:
+                logger.warning(f"User {user_id} ki saved key '{row['key']}' padh nahi paye, chhod rahe hain: {e}")
+                continue
+            data[row['key']] = value
+            digests[row['key']] = _digest(row['value'])
+        self._digests[user_id] = digests
+        self._loaded_users.add(user_id)
+        return data
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """User ka pehla update aane par uska saved data (ek hi baar) load karta hai."""
+        if user_id in self._loaded_users:
+            return
+        for key, value in self._load_user(user_id).items():
+            # Handler ne jo abhi set kiya hai woh saved value se naya hai
+            user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        """Sirf wahi keys likhta hai jinki value pichhli save se badli hai."""
+        # Agar user load hi nahi hua, toh missing keys ko "deleted" nahi maan sakte
+        loaded = user_id in self._loaded_users
+        old_digests = self._digests.setdefault(user_id, {})
+        upserts, now = [], time.time()
+        new_digests = {}
+        for key, value in data.items():
+            if not isinstance(key, str):
+                self._warn_skip(user_id, key, "key string nahi hai")
+                continue
+            try:
+                blob, compressed, raw_size = self._encode(value)
+            except Exception as e:
+                self._warn_skip(user_id, key, e)
+                continue
+            digest = _digest(blob)
+            new_digests[key] = digest
+            if old_digests.get(key) == digest:
+                self.rows_unchanged += 1
+                continue
+            upserts.append((user_id, key, blob, int(compressed), now))
+            self.bytes_raw += raw_size
+            self.bytes_stored += len(blob)
+
+        deleted = [key for key in old_digests if key not in data] if loaded else []
+        if not upserts and not deleted:
+            return
+
+        with storage.transaction() as conn:
+            if upserts:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO persist_user_data (user_id, key, value, compressed, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    upserts
+                )
+            if deleted:
+                conn.executemany(
+                    "DELETE FROM persist_user_data WHERE user_id = ? AND key = ?",
+                    [(user_id, key) for key in deleted]
+                )
+        self.rows_written += len(upserts) + len(deleted)
+        for key in deleted:
+            old_digests.pop(key, None)
+        old_digests.update(new_digests)
+
+    def _warn_skip(self, user_id: int, key, reason):
+        if (user_id, key) not in self._skipped_keys:
+            self._skipped_keys.add((user_id, key))
+            logger.warning(f"User {user_id} ki key '{key}' persist nahi ho sakti ({reason}), skip kar rahe hain.")
+
+    async def drop_user_data(self, user_id: int) -> None:
+        storage.execute("DELETE FROM persist_user_data WHERE user_id = ?", (user_id,))
+        self._digests[user_id] = {}
+        self._loaded_users.add(user_id)
+
+    # --- ConversationHandler states ---
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = storage.execute(
+            "SELECT conv_key, state FROM persist_conversations WHERE name = ?", (name,)
+        ).fetchall()
+        return {tuple(json.loads(row['conv_key'])): pickle.loads(row['state']) for row in rows}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object | None) -> None:
+        conv_key = json.dumps(list(key))
+        if new_state is None:
+            storage.execute("DELETE FROM persist_conversations WHERE name = ? AND conv_key = ?", (name, conv_key))
+        else:
+            storage.execute(
+                "INSERT OR REPLACE INTO persist_conversations (name, conv_key, state) VALUES (?, ?, ?)",
+                (name, conv_key, pickle.dumps(new_state, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+
+    # --- Jo data persist nahi hota (store_data mein band hai) ---
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        # Har update_* turant commit hota hai (WAL), alag se flush ki zaroorat nahi
+        if self.rows_written:
+            logger.info(
+                f"Persistence: {self.rows_written} rows likhi gayi, {self.rows_unchanged} unchanged skip hui "
+                f"({self.bytes_raw} bytes -> {self.bytes_stored} bytes stored)."
+            )
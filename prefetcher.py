@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Speculative Prefetcher
+# -----------------------------------------------------------------------------
+# Admin jab search results ya test list dekh raha hota hai, tab agla sabse
+# sambhavit click (top series ki details, section ke pehle kuch tests) background
+# mein pehle se fetch ho jaata hai. Har user ke prefetches ek "owner" ke neeche
+# rehte hain; user kahin aur navigate kare toh uske pending prefetches cancel.
+# -----------------------------------------------------------------------------
+
+
+class Prefetcher:
+    """Budget ke andar background fetches chalata hai aur unke results thodi der rakhta hai."""
+
+    def __init__(self, max_concurrent: int = 2, ttl: float = 600, max_entries: int = 64):
+        self.max_concurrent = max(1, max_concurrent)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._results = OrderedDict() # key -> (expires_at, value)
+        self._inflight = {}           # key -> asyncio.Task
+        self._owners = {}             # owner -> set(keys)
+
+        # /stats ke liye counters
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def _store(self, key, value):
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl, value)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def _take(self, key):
+        """Cached result nikalta hai (ek hi baar use hota hai). Na ho ya expire ho gaya ho toh None."""
+        with self._lock:
+            entry = self._results.pop(key, None)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def _run(self, key, fetch):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1 # Thread shuru hi nahi hua - yahi kaam sach mein bacha
+            raise
+        # Thread cancel nahi ho sakta: task cancel ho tab bhi slot thread khatam hone par hi free hota hai
+        # (taaki ek saath chalte extractions max_concurrent se zyada na hon), aur result phir bhi cache hota hai
+        future = asyncio.ensure_future(asyncio.to_thread(fetch))
+
+        def _finished(done: asyncio.Future):
+            self._semaphore.release()
+            if not done.cancelled() and done.exception() is None and done.result() is not None:
+                self._store(key, done.result())
+        future.add_done_callback(_finished)
+        return await asyncio.shield(future)
+
+    def schedule(self, owner, key, fetch):
+        """`fetch` (sync, zero-argument) ko background mein chalata hai, agar pehle se cached/in-flight na ho."""
+        if key in self._inflight:
+            self._owners.setdefault(owner, set()).add(key)
+            return
+        with self._lock:
+            if key in self._results:
+                return
+        task = asyncio.create_task(self._run(key, fetch))
+        self.started += 1
+        self._inflight[key] = task
+        self._owners.setdefault(owner, set()).add(key)
+
+        def _done(finished: asyncio.Task):
+            self._inflight.pop(key, None)
+            if not finished.cancelled() and finished.exception():
+                logger.debug(f"Prefetch {key} fail hua: {finished.exception()}")
+        task.add_done_callback(_done)
+
+    def cancel_owner(self, owner, keep=None):
+        """User ne navigate kar liya - uske pending prefetches (`keep` ke alawa) cancel karein."""
+        keys = self._owners.pop(owner, set())
+        if keep in keys:
+            keys.discard(keep)
+            self._owners[owner] = {keep}
+        for key in keys:
+            task = self._inflight.get(key)
+            if task and not task.done() and not any(key in keys for keys in self._owners.values()):
+                task.cancel() # `cancelled` counter _run ginta hai (sirf jab fetch shuru hi na hua ho)
+
+    async def get(self, key, fetch=None):
+        """
+        Prefetched result ho toh turant, in-flight ho toh usi ka wait, warna `fetch` khud chalata hai
+        (`fetch` na diya ho toh None).
+        """
+        value = self._take(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task and not task.done():
+            try:
+                value = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise # Caller khud cancel hua hai
+                value = None
+            except Exception:
+                value = None
+            if value is not None:
+                self._take(key)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        if fetch is None:
+            return None
+        return await asyncio.to_thread(fetch)
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        return (
+            f"⚡ **Prefetch:** {self.started} started, {self.hits} hits, {self.misses} misses, "
+            f"{self.cancelled} cancelled"
+        )
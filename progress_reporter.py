@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import logging
+from collections import deque
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Bulk Progress Reporter
+# -----------------------------------------------------------------------------
+# Pehle download loop khud hi har 5 files / 3 second mein progress message edit
+# karta tha - dheema edit_text downloads rokta tha, aur koi test atak jaaye toh
+# progress bhi ruk jaata tha. Ab job sirf JobProgress ke counters badalta hai;
+# har chat ka ek alag reporter task fixed cadence par counters padh kar message
+# edit karta hai (tests/min aur ETA ke saath). Ek chat mein kai jobs hon toh
+# bhi us chat mein har tick par ek hi edit hota hai (jo job sabse purana
+# dikh raha hai uska), isliye edits Telegram ki per-chat limit mein rehte hain.
+# -----------------------------------------------------------------------------
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+
+class JobProgress:
+    """Ek bulk job ke counters. Job (workers) sirf inhe badalta hai; message reporter edit karta hai."""
+
+    __slots__ = ('job_id', 'chat_id', 'message', 'label', 'total', 'done', 'failed', 'original_total',
+                 'file_format', 'destination', 'test_number', 'current', 'current_since', 'started_at',
+                 'start_done', 'samples', 'last_text', 'last_edit_at', 'finished', 'edit_lock')
+
+    def __init__(self, job_id, chat_id, message, label, total, done, original_total, file_format, destination):
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.message = message
+        self.label = label
+        self.total = total
+        self.done = done
+        self.failed = 0
+        self.original_total = original_total
+        self.file_format = file_format
+        self.destination = destination
+        self.test_number = None   # Aakhri poore hue test ka asli number
+        self.current = None       # Jis test ka abhi intezaar hai
+        self.current_since = None
+        self.started_at = time.monotonic()
+        self.start_done = done    # Resume par pehle se ho chuke tests (speed mein nahi gine jaate)
+        self.samples = deque()    # (time, done) - haal ki speed ke liye
+        self.last_text = None
+        self.last_edit_at = 0.0
+        self.finished = False
+        self.edit_lock = asyncio.Lock()
+
+    def waiting_on(self, name: str):
+        """Job ab is test ka intezaar kar raha hai."""
+        self.current = name
+        self.current_since = time.monotonic()
+
+    def advance(self, test_number, failed: bool = False):
+        """Ek test poora hua (bheja gaya, buffer mein gaya ya fail)."""
+        self.done += 1
+        self.test_number = test_number
+        if failed:
+            self.failed += 1
+
+    def rate(self, now: float, window: float) -> float:
+        """Tests per second - pichhle `window` seconds ki speed, warna shuru se ab tak ki."""
+        self.samples.append((now, self.done))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= window:
+            self.samples.popleft()
+        then, done_then = self.samples[0]
+        if now - then >= 5 and self.done > done_then:
+            return (self.done - done_then) / (now - then)
+        elapsed = now - self.started_at
+        return (self.done - self.start_done) / elapsed if elapsed > 0 else 0.0
+
+    def render(self, now: float, window: float, stuck_after: float) -> str:
+        progress = self.done / self.total if self.total else 1.0
+        bar = "🟩" * int(progress * 10) + "⬜️" * (10 - int(progress * 10))
+        per_sec = self.rate(now, window)
+        remaining = max(0, self.total - self.done)
+        if per_sec > 0:
+            speed = f"⚡ {per_sec * 60:.1f} tests/min | ETA {_format_duration(remaining / per_sec)}"
+        else:
+            speed = "⚡ speed abhi pata nahi"
+        lines = [
+            f"📥 Downloading **{self.label}**...\n",
+            f"Progress: {bar} {self.done}/{self.total} ({int(progress * 100)}%)",
+        ]
+        if self.test_number is not None:
+            lines.append(f"(Overall Test {self.test_number}/{self.original_total})")
+        lines.append(speed)
+        if self.failed:
+            lines.append(f"⚠️ {self.failed} failed")
+        if self.current:
+            waiting = now - self.current_since
+            stuck = f" - {_format_duration(waiting)} se" if waiting >= stuck_after else ""
+            lines.append(f"\nFile: `{self.current}` (Format: {self.file_format}){stuck}")
+        lines.append(f"Destination: `{self.destination}`\n")
+        lines.append("Rokne ke liye /stop type karein.")
+        return "\n".join(lines)
+
+
+class ProgressReporter:
+    """Har chat ke liye ek background task jo us chat ke jobs ke progress messages edit karta hai."""
+
+    def __init__(self, interval: float = 3.0, window: float = 60.0):
+        self.interval = max(1.0, interval)
+        self.window = window
+        self._chats = {}  # chat_id -> {job_id: JobProgress}
+        self._tasks = {}  # chat_id -> asyncio.Task
+        self._paused_until = {} # chat_id -> loop time (RetryAfter ke baad)
+
+        # Counters (debugging ke liye)
+        self.edits = 0
+        self.skipped = 0
+
+    def track(self, job_id, chat_id, message, label, total, done, original_total, file_format, destination) -> JobProgress:
+        """Job ka progress register karta hai; chat ka reporter task na chal raha ho toh shuru karta hai."""
+        progress = JobProgress(job_id, chat_id, message, label, total, done, original_total, file_format, destination)
+        self._chats.setdefault(chat_id, {})[job_id] = progress
+        task = self._tasks.get(chat_id)
+        if task is None or task.done():
+            self._tasks[chat_id] = asyncio.create_task(self._run_chat(chat_id))
+        return progress
+
+    async def finish(self, progress: JobProgress):
+        """
+        Job ke reporting band karta hai. Chal raha edit (agar ho) poora hone ka intezaar karta hai,
+        taaki uske baad likha gaya final message overwrite na ho. Dobara call karna safe hai.
+        """
+        if progress.finished:
+            return
+        async with progress.edit_lock:
+            progress.finished = True
+        jobs = self._chats.get(progress.chat_id)
+        if jobs is not None:
+            jobs.pop(progress.job_id, None)
+            if not jobs:
+                self._chats.pop(progress.chat_id, None)
+
+    def _next_due(self, chat_id):
+        """Us chat ka woh job jiska message sabse pehle edit hua tha aur jiska text badal gaya hai."""
+        now = time.monotonic()
+        candidates = []
+        for progress in list(self._chats.get(chat_id, {}).values()):
+            if progress.finished or progress.message is None:
+                continue
+            text = progress.render(now, self.window, stuck_after=self.interval * 3)
+            if text == progress.last_text:
+                self.skipped += 1
+                continue
+            candidates.append((progress.last_edit_at, progress, text))
+        if not candidates:
+            return None, None
+        _, progress, text = min(candidates, key=lambda item: item[0])
+        return progress, text
+
+    async def _run_chat(self, chat_id):
+        loop = asyncio.get_running_loop()
+        while self._chats.get(chat_id):
+            await asyncio.sleep(self.interval)
+            paused_until = self._paused_until.get(chat_id, 0.0)
+            if loop.time() < paused_until:
+                continue
+            progress, text = self._next_due(chat_id)
+            if progress is None:
+                continue
+            await self._edit(chat_id, progress, text)
+        self._tasks.pop(chat_id, None)
+        self._paused_until.pop(chat_id, None)
+
+    async def _edit(self, chat_id, progress: JobProgress, text: str):
+        async with progress.edit_lock:
+            if progress.finished:
+                return
+            try:
+                await progress.message.edit_text(text, parse_mode=ParseMode.MARKDOWN)
+                self.edits += 1
+            except RetryAfter as e:
+                # Is chat mein edits utni der ke liye band; workers par koi asar nahi
+                self._paused_until[chat_id] = asyncio.get_running_loop().time() + _retry_after_seconds(e)
+                return
+            except BadRequest as e:
+                if "message is not modified" not in str(e).lower():
+                    logger.warning(f"Job {progress.job_id} ka progress message edit nahi hua, aage edits band: {e}")
+                    progress.message = None
+                    return
+            except TelegramError as e:
+                logger.debug(f"Job {progress.job_id} progress edit fail (agle tick par dobara): {e}")
+                return
+            progress.last_text = text
+            progress.last_edit_at = time.monotonic()
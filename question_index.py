@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+import unicodedata
+
+import storage
+from txt_generator import _clean_html_to_text # TXT files wala hi cleaner, taaki search text same dikhe
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Question Full-Text Search (SQLite FTS5)
+# -----------------------------------------------------------------------------
+# Question store (question_store.py) mein har naya unique question aate hi
+# uska cleaned text (har language alag row) FTS5 index mein chala jaata hai -
+# usi transaction mein, koi batch rebuild nahi. /findq isi index se question
+# aur uska source test milliseconds mein dhoondhta hai.
+# -----------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5 (
+    question, options, solution, lang UNINDEXED, qhash UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2 categories 'L* N* Co Mn Mc'"
+);
+CREATE TABLE IF NOT EXISTS question_fts_state (
+    qhash TEXT PRIMARY KEY
+);
+"""
+
+# bm25 weights: question text sabse zaroori, phir options, phir solution
+_RANK = "bm25(question_fts, 10.0, 3.0, 1.0)"
+
+# Tokenizer jaisi hi categories - Mn/Mc (Devanagari matras) ke bina Hindi words toot jaate hain
+_TOKEN_CATEGORIES = ('L', 'N', 'Co', 'Mn', 'Mc')
+
+
+def _lang(code: str) -> str:
+    return 'hi' if code == 'hn' else code
+
+
+def _tokens(text: str) -> list:
+    tokens, current = [], []
+    for char in text.lower():
+        category = unicodedata.category(char)
+        if category in _TOKEN_CATEGORIES or category[0] in _TOKEN_CATEGORIES:
+            current.append(char)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+
+def build_match_query(text: str) -> str | None:
+    """User ke text se safe FTS5 query (har word quoted, aakhri word prefix match). Kuch na bache toh None."""
+    tokens = _tokens(text)
+    if not tokens:
+        return None
+    parts = [f'"{token}"' for token in tokens[:-1]]
+    parts.append(f'"{tokens[-1]}"*')
+    return " ".join(parts)
+
+
+class QuestionIndex:
+    """Unique questions (hash se) ka FTS5 index."""
+
+    def __init__(self):
+        storage.executescript(_SCHEMA)
+        self.indexed = 0 # Is process mein index hue questions
+
+    @staticmethod
+    def rows_for(bodies: dict) -> list:
+        """{qhash: question body} -> FTS rows (har language ek row). CPU wala kaam, transaction ke bahar chalayein."""
+        rows = []
+        for qhash, body in bodies.items():
+            content = body.get('content') or {}
+            options = body.get('options') or {}
+            solution = body.get('solution') or {}
+            for lang in sorted(set(content) | set(options)):
+                question_text = _clean_html_to_text(content.get(lang) or '')
+                option_text = " | ".join(
+                    _clean_html_to_text(option.get('text') or '') for option in options.get(lang) or []
+                    if isinstance(option, dict)
+                )
+                solution_text = _clean_html_to_text(solution.get(lang) or '')
+                if question_text or option_text:
+                    rows.append((question_text, option_text, solution_text, _lang(lang), qhash))
+        return rows
+
+    def insert(self, conn, qhashes: list, rows: list):
+        """`rows_for` ke rows likhta hai (caller ke transaction ke andar)."""
+        fresh = [
+            qhash for qhash in qhashes
+            if not conn.execute("SELECT 1 FROM question_fts_state WHERE qhash = ?", (qhash,)).fetchone()
+        ]
+        if not fresh:
+            return
+        fresh_set = set(fresh)
+        conn.executemany(
+            "INSERT INTO question_fts (question, options, solution, lang, qhash) VALUES (?, ?, ?, ?, ?)",
+            [row for row in rows if row[4] in fresh_set]
+        )
+        conn.executemany("INSERT INTO question_fts_state (qhash) VALUES (?)", [(qhash,) for qhash in fresh])
+        self.indexed += len(fresh)
+
+    def backfill(self, store, batch: int = 500) -> int:
+        """Index banne se pehle store hue questions ko index karta hai (startup par, ek baar). Kitne hue, return."""
+        total = 0
+        while True:
+            rows = storage.execute(
+                "SELECT b.qhash FROM question_bodies b LEFT JOIN question_fts_state s ON s.qhash = b.qhash "
+                "WHERE s.qhash IS NULL LIMIT ?", (batch,)
+            ).fetchall()
+            if not rows:
+                break
+            qhashes = [row['qhash'] for row in rows]
+            bodies = store.get_bodies(qhashes)
+            fts_rows = self.rows_for(bodies)
+            with storage.transaction() as conn:
+                self.insert(conn, qhashes, fts_rows)
+            total += len(qhashes)
+        if total:
+            logger.info(f"Question search index mein {total} purane questions jode gaye.")
+        return total
+
+    def search(self, text: str, limit: int = 10) -> tuple[list, float]:
+        """
+        (results, milliseconds). Har result: qhash, lang, snippet, test_title, series_name, position, test_count.
+        Ek question ki kai languages match hon toh best wali hi aati hai.
+        """
+        query = build_match_query(text)
+        if not query:
+            return [], 0.0
+        started = time.perf_counter()
+        rows = storage.execute(
+            f"SELECT qhash, lang, snippet(question_fts, 0, '[[', ']]', '…', 16) AS question_snippet, "
+            f"snippet(question_fts, 1, '[[', ']]', '…', 12) AS option_snippet, {_RANK} AS rank "
+            f"FROM question_fts WHERE question_fts MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit * 3)
+        ).fetchall()
+
+        results, seen = [], set()
+        for row in rows:
+            if row['qhash'] in seen:
+                continue
+            seen.add(row['qhash'])
+            source = storage.execute(
+                "SELECT t.title, t.series_name, q.position, "
+                "(SELECT COUNT(DISTINCT test_id) FROM test_questions WHERE qhash = q.qhash) AS test_count "
+                "FROM test_questions q JOIN question_tests t ON t.test_id = q.test_id "
+                "WHERE q.qhash = ? ORDER BY t.stored_at DESC LIMIT 1",
+                (row['qhash'],)
+            ).fetchone()
+            snippet = row['question_snippet'] or ''
+            if '[[' not in snippet and '[[' in (row['option_snippet'] or ''):
+                snippet = row['option_snippet'] # Match sirf options mein hai
+            results.append({
+                'qhash': row['qhash'],
+                'lang': row['lang'],
+                'snippet': snippet,
+                'test_title': source['title'] if source else None,
+                'series_name': source['series_name'] if source else None,
+                'position': source['position'] if source else None,
+                'test_count': source['test_count'] if source else 0,
+            })
+            if len(results) >= limit:
+                break
+        return results, (time.perf_counter() - started) * 1000
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+import re
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Content-Addressed Question Store
+# -----------------------------------------------------------------------------
+# Testbook ek hi question kai mocks aur previous-year papers mein reuse karta
+# hai. Har parsed question (content/options/solution) ka normalized hash
+# nikaal kar uski body SQLite mein sirf ek baar (compressed) rakhi jaati hai;
+# test sirf hashes ki list rakhta hai. Memory mein bhi same question ka ek hi
+# object share hota hai, isliye uska cleaning/rendering cache (txt_generator)
+# dobara kaam nahi karta. Series-wise duplication ratio /stats mein dikhta hai.
+# -----------------------------------------------------------------------------
+
+# Question ki woh fields jo uski pehchaan hain (Testbook ka question id har test mein alag ho sakta hai)
+BODY_FIELDS = ('content', 'options', 'solution')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_bodies (
+    qhash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    raw_size INTEGER NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_tests (
+    test_id TEXT PRIMARY KEY,
+    series_id TEXT,
+    series_name TEXT,
+    title TEXT,
+    question_count INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS test_questions (
+    test_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    qhash TEXT NOT NULL,
+    question_id TEXT,
+    PRIMARY KEY (test_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_test_questions_qhash ON test_questions (qhash);
+CREATE INDEX IF NOT EXISTS idx_question_tests_series ON question_tests (series_id);
+"""
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize(value):
+    """Hash ke liye: strings ka whitespace ek jaisa, baaki structure waisa hi."""
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(' ', value).strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def question_hash(question: dict) -> str:
+    """content/options/solution ka normalized content hash."""
+    body = {field: _normalize(question.get(field) or {}) for field in BODY_FIELDS}
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class QuestionStore:
+    """Questions ko hash se ek baar store karta hai; tests unke references rakhte hain."""
+
+    def __init__(self, memory_entries: int = 20000, indexer=None):
+        self.memory_entries = memory_entries
+        self.indexer = indexer # QuestionIndex (optional) - naye questions usi transaction mein search index mein
+        self._lock = threading.Lock()
+        self._interned = OrderedDict() # qhash -> shared question body (bina id ke)
+
+        # /stats ke liye counters (is process mein)
+        self.questions_seen = 0
+        self.questions_new = 0
+        self.bytes_deduped = 0 # Jo question bodies dobara store nahi karni padi
+
+        storage.executescript(_SCHEMA)
+
+    def _intern(self, qhash: str, body: dict) -> dict:
+        with self._lock:
+            shared = self._interned.get(qhash)
+            if shared is not None:
+                self._interned.move_to_end(qhash)
+                return shared
+            self._interned[qhash] = body
+            while len(self._interned) > self.memory_entries:
+                self._interned.popitem(last=False)
+            return body
+
+    def _existing(self, qhashes: list) -> set:
+        found = set()
+        for start in range(0, len(qhashes), 500):
+            chunk = qhashes[start:start + 500]
+            rows = storage.execute(
+                f"SELECT qhash FROM question_bodies WHERE qhash IN ({','.join('?' * len(chunk))})", tuple(chunk)
+            ).fetchall()
+            found.update(row['qhash'] for row in rows)
+        return found
+
+    def record_test(self, test_id, quiz_data: dict, series_id=None, series_name: str | None = None) -> dict:
+        """
+        Test ke questions store karta hai aur quiz_data ki nayi copy return karta hai jisme
+        same content wale questions ek hi (shared) object use karte hain.
+        """
+        questions = quiz_data.get('questions') or []
+        if not test_id or not questions:
+            return quiz_data
+
+        refs, bodies, interned = [], {}, []
+        for position, question in enumerate(questions):
+            qhash = question_hash(question)
+            body = self._intern(qhash, {field: question.get(field) or {} for field in BODY_FIELDS})
+            bodies[qhash] = body
+            refs.append((str(test_id), position, qhash, question.get('id')))
+            interned.append({'id': question.get('id'), **body})
+
+        existing = self._existing(list(bodies))
+        now, new_rows, deduped = time.time(), [], 0
+        for qhash, body in bodies.items():
+            raw = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            if qhash in existing:
+                deduped += len(raw)
+                continue
+            new_rows.append((qhash, zlib.compress(raw, 6), len(raw), now))
+        new_hashes = [row[0] for row in new_rows]
+        index_rows = self.indexer.rows_for({qhash: bodies[qhash] for qhash in new_hashes}) if self.indexer else []
+
+        with storage.transaction() as conn:
+            if new_rows:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO question_bodies (qhash, body, raw_size, first_seen) VALUES (?, ?, ?, ?)",
+                    new_rows
+                )
+                if self.indexer:
+                    self.indexer.insert(conn, new_hashes, index_rows)
+            conn.execute("DELETE FROM test_questions WHERE test_id = ?", (str(test_id),))
+            conn.executemany(
+                "INSERT INTO test_questions (test_id, position, qhash, question_id) VALUES (?, ?, ?, ?)", refs
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO question_tests (test_id, series_id, series_name, title, question_count, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(test_id), str(series_id) if series_id else None, series_name,
+                 quiz_data.get('title'), len(refs), now)
+            )
+
+        with self._lock:
+            self.questions_seen += len(refs)
+            self.questions_new += len(new_rows)
+            self.bytes_deduped += deduped
+        return {**quiz_data, 'questions': interned}
+
+    def get_bodies(self, qhashes: list) -> dict:
+        """{qhash: question body} (memory se, warna SQLite se)."""
+        result, missing = {}, []
+        with self._lock:
+            for qhash in qhashes:
+                body = self._interned.get(qhash)
+                if body is not None:
+                    result[qhash] = body
+                else:
+                    missing.append(qhash)
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = storage.execute(
+                f"SELECT qhash, body FROM question_bodies WHERE qhash IN ({','.join('?' * len(chunk))})", tuple(chunk)
+            ).fetchall()
+            for row in rows:
+                result[row['qhash']] = json.loads(zlib.decompress(row['body']))
+        return result
+
+    def series_stats(self, series_id) -> dict:
+        """Ek series ke tests mein kitne question references, kitne unique, aur duplication ratio."""
+        row = storage.execute(
+            "SELECT COUNT(DISTINCT t.test_id) AS tests, COUNT(*) AS refs, COUNT(DISTINCT q.qhash) AS unique_questions "
+            "FROM question_tests t JOIN test_questions q ON q.test_id = t.test_id WHERE t.series_id = ?",
+            (str(series_id),)
+        ).fetchone()
+        refs = row['refs'] or 0
+        return {
+            'tests': row['tests'] or 0,
+            'refs': refs,
+            'unique': row['unique_questions'] or 0,
+            'dup_ratio': (1 - (row['unique_questions'] or 0) / refs) if refs else 0.0,
+        }
+
+    def top_duplicated_series(self, limit: int = 3) -> list:
+        rows = storage.execute(
+            "SELECT t.series_id, MAX(t.series_name) AS series_name, COUNT(*) AS refs, "
+            "COUNT(DISTINCT q.qhash) AS unique_questions "
+            "FROM question_tests t JOIN test_questions q ON q.test_id = t.test_id "
+            "WHERE t.series_id IS NOT NULL GROUP BY t.series_id "
+            "ORDER BY 1.0 * COUNT(DISTINCT q.qhash) / COUNT(*) LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [
+            {'series_id': row['series_id'], 'series_name': row['series_name'], 'refs': row['refs'],
+             'unique': row['unique_questions'], 'dup_ratio': 1 - row['unique_questions'] / row['refs']}
+            for row in rows
+        ]
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        row = storage.execute(
+            "SELECT (SELECT COUNT(*) FROM test_questions) AS refs, (SELECT COUNT(*) FROM question_bodies) AS bodies"
+        ).fetchone()
+        refs, bodies = row['refs'], row['bodies']
+        ratio = (1 - bodies / refs) * 100 if refs else 0
+        lines = [
+            f"🧩 **Question store:** {bodies} unique / {refs} refs ({ratio:.0f}% duplicate) | "
+            f"is run mein {self.questions_new}/{self.questions_seen} naye, {self.bytes_deduped // 1024} KB dedup"
+        ]
+        for series in self.top_duplicated_series():
+            if series['dup_ratio'] > 0:
+                lines.append(
+                    f"  • {series['series_name'] or series['series_id']}: {series['unique']}/{series['refs']} unique "
+                    f"({series['dup_ratio'] * 100:.0f}% duplicate)"
+                )
+        return "\n".join(lines)
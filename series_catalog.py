@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import re
+import json
+import time
+import logging
+import threading
+import unicodedata
+
+import storage
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Local Series Catalogue (fuzzy /search)
+# -----------------------------------------------------------------------------
+# Search results aur kholi gayi series (name, slug, testsCount, sections) ek
+# local catalogue mein jama hoti hain. Series names ka trigram index memory
+# mein rehta hai, isliye "ssc cgl mok" jaisi typo wali query bhi bina API call
+# ke turant match ho jaati hai. Pehle se API se poochhi gayi query ke results
+# TTL tak seedhe catalogue se aate hain; purane/fuzzy hit par API refresh
+# background mein hota hai. Sirf miss par user API ka intezaar karta hai.
+# -----------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series_catalog (
+    slug TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    tests_count INTEGER,
+    sections TEXT,
+    result TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series_search_log (
+    query TEXT PRIMARY KEY,
+    slugs TEXT NOT NULL,
+    searched_at REAL NOT NULL
+);
+"""
+
+# Query ke kitne trigrams series name mein hone chahiye: MIN_SCORE se kam = match nahi,
+# STRONG_SCORE ya zyada wala top result ho (aur query ke saare numbers uske naam mein hon) tabhi local
+# answer kaafi maana jaata hai
+MIN_SCORE = 0.5
+STRONG_SCORE = 0.75
+
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, Latin accents hata kar, punctuation ko space bana kar (Devanagari matras bachi rehti hain)."""
+    chars = []
+    for char in unicodedata.normalize('NFKD', (text or '').lower()):
+        if 0x300 <= ord(char) <= 0x36F:
+            continue # é -> e
+        chars.append(char if unicodedata.category(char)[0] in 'LNM' else ' ')
+    return _SPACES_RE.sub(' ', "".join(chars)).strip()
+
+
+def number_tokens(text: str) -> set:
+    """Words jinme digit hai (saal, tier, number) - inka typo nahi hota, yeh exact match hone chahiye."""
+    return {word for word in normalize_text(text).split() if any(char.isdigit() for char in word)}
+
+
+def trigrams(text: str) -> set:
+    """pg_trgm jaisa: har word ke aage do aur peeche ek space lagakar 3-char tukde."""
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SeriesCatalog:
+    """Dekhi gayi series ka SQLite catalogue + memory mein trigram index."""
+
+    def __init__(self, query_ttl: float = 24 * 3600):
+        self.query_ttl = query_ttl
+        self._lock = threading.Lock()
+        self._results = {}  # slug -> search result dict (API wala shape)
+        self._grams = {}    # slug -> name ke trigrams
+        self._index = {}    # trigram -> set(slug)
+
+        # /stats ke liye counters
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+        storage.executescript(_SCHEMA)
+        for row in storage.execute("SELECT slug, result FROM series_catalog").fetchall():
+            self._index_series(row['slug'], json.loads(row['result']))
+
+    def _index_series(self, slug: str, result: dict):
+        grams = trigrams(result.get('name', ''))
+        with self._lock:
+            for gram in self._grams.get(slug, ()):
+                slugs = self._index.get(gram)
+                if slugs:
+                    slugs.discard(slug)
+            self._results[slug] = result
+            self._grams[slug] = grams
+            for gram in grams:
+                self._index.setdefault(gram, set()).add(slug)
+
+    def add_results(self, results: list):
+        """Search results (API se) catalogue mein upsert karta hai."""
+        now, rows = time.time(), []
+        for result in results or []:
+            slug = result.get('slug')
+            if not slug or not result.get('name'):
+                continue
+            self._index_series(slug, result)
+            rows.append((slug, result['name'], result.get('testsCount'), json.dumps(result, ensure_ascii=False), now))
+        if rows:
+            storage.executemany(
+                "INSERT INTO series_catalog (slug, name, tests_count, result, seen_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (slug) DO UPDATE SET name = excluded.name, tests_count = excluded.tests_count, "
+                "result = excluded.result, seen_at = excluded.seen_at",
+                rows
+            )
+
+    def add_details(self, slug: str, details: dict):
+        """Kholi gayi series ki details se sections (aur naam) catalogue mein update karta hai."""
+        if not slug or not details:
+            return
+        with self._lock:
+            result = dict(self._results.get(slug) or {'slug': slug})
+        result['name'] = details.get('name') or result.get('name')
+        if not result['name']:
+            return
+        sections = [section.get('name') for section in details.get('sections', []) if section.get('name')]
+        self._index_series(slug, result)
+        storage.execute(
+            "INSERT INTO series_catalog (slug, name, tests_count, sections, result, seen_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (slug) DO UPDATE SET name = excluded.name, sections = excluded.sections, "
+            "result = excluded.result, seen_at = excluded.seen_at",
+            (slug, result['name'], result.get('testsCount'), json.dumps(sections, ensure_ascii=False),
+             json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+    def record_search(self, query: str, results: list):
+        """API ke results catalogue mein daal kar query ka answer (slugs ka order) yaad rakhta hai."""
+        self.add_results(results)
+        slugs = [result.get('slug') for result in results or [] if result.get('slug')]
+        storage.execute(
+            "INSERT OR REPLACE INTO series_search_log (query, slugs, searched_at) VALUES (?, ?, ?)",
+            (normalize_text(query), json.dumps(slugs), time.time())
+        )
+
+    def fuzzy(self, query: str, limit: int = 30) -> list:
+        """[(score, result), ...] - score = query ke kitne trigrams name mein hain (typo tolerant)."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        counts = {}
+        with self._lock:
+            for gram in query_grams:
+                for slug in self._index.get(gram, ()):
+                    counts[slug] = counts.get(slug, 0) + 1
+            scored = []
+            for slug, common in counts.items():
+                score = common / len(query_grams)
+                if score >= MIN_SCORE:
+                    # Barabar score par chhota (zyada specific) naam pehle
+                    tie_break = common / (len(query_grams) + len(self._grams[slug]) - common)
+                    scored.append((score, tie_break, self._results[slug]))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [(score, result) for score, _, result in scored[:limit]]
+
+    def lookup(self, query: str, limit: int = 30):
+        """
+        (results, fresh). Pehle poochhi gayi query -> wahi results (fresh = TTL ke andar);
+        warna strong fuzzy match -> local results (fresh=False, background refresh karein); warna (None, False).
+        """
+        row = storage.execute(
+            "SELECT slugs, searched_at FROM series_search_log WHERE query = ?", (normalize_text(query),)
+        ).fetchone()
+        if row:
+            with self._lock:
+                results = [self._results[slug] for slug in json.loads(row['slugs']) if slug in self._results]
+            if results:
+                self.exact_hits += 1
+                return results[:limit], time.time() - row['searched_at'] < self.query_ttl
+
+        ranked = self.fuzzy(query, limit)
+        # "ssc cgl 2024" ka "SSC CGL 2023" se score ~0.85 hai - numbers alag hon toh local answer galat hoga
+        if ranked and ranked[0][0] >= STRONG_SCORE and number_tokens(query) <= number_tokens(ranked[0][1].get('name', '')):
+            self.fuzzy_hits += 1
+            return [result for _, result in ranked], False
+        self.misses += 1
+        return None, False
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        return (
+            f"📇 **Catalogue:** {len(self._results)} series | search: {self.exact_hits} exact + "
+            f"{self.fuzzy_hits} fuzzy local hits, {self.misses} API misses"
+        )
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Compact Navigation Sessions
+# -----------------------------------------------------------------------------
+# Pehle har admin ke user_data mein poore search results, series details aur
+# har test ke saath section/subsection dicts (nested subsection lists samet)
+# rakhe jaate the - lambe uptime par yeh bina limit badhta tha (aur har baar
+# SQLite mein pickle hota tha). Ab session mein sirf chhote records hain:
+#   - search results: SeriesHit (slug, naam, tests count)
+#   - test list: TestRef (caption wali fields + section/subsection ka index)
+# Series details sab admins ke liye ek hi SeriesCache (LRU + TTL) mein rehti
+# hain; cache se nikal jaayein toh slug se dobara load hoti hain. Kaafi der
+# se idle sessions ki navigation state SessionTracker hata deta hai.
+# -----------------------------------------------------------------------------
+
+# Test summary ki woh fields jo caption/file name ke liye chahiye (extractor._get_caption_details)
+SUMMARY_FIELDS = ('id', 'title', 'questionCount', 'duration', 'totalMark')
+
+# Navigation keys (idle eviction aur main menu par hatti hain)
+NAV_KEYS = ('search_hits', 'current_series_slug', 'section_index', 'test_refs', 'selected_test')
+# Purane versions ki badi keys - session mein mil jaayein toh seedha hata di jaati hain
+LEGACY_KEYS = ('search_results', 'series_details', 'last_tests', 'selected_test_info', 'selected_section')
+
+
+class SeriesHit:
+    """Ek search result (series) - sirf list dikhane aur kholne ke liye."""
+
+    __slots__ = ('slug', 'name', 'tests_count')
+
+    def __init__(self, slug, name, tests_count):
+        self.slug = slug
+        self.name = name
+        self.tests_count = tests_count
+
+    @classmethod
+    def from_result(cls, result: dict) -> 'SeriesHit':
+        return cls(result.get('slug'), result.get('name', 'Unknown Series'), result.get('testsCount', 0))
+
+
+class TestRef:
+    """Test list ka ek test: summary fields (tuple) + series details mein section/subsection ke index."""
+
+    __slots__ = ('summary', 'section_index', 'subsection_index')
+
+    def __init__(self, summary: tuple, section_index: int, subsection_index: int):
+        self.summary = summary
+        self.section_index = section_index
+        self.subsection_index = subsection_index
+
+    @classmethod
+    def from_test(cls, test: dict, section_index: int, subsection_index: int) -> 'TestRef':
+        return cls(tuple(test.get(field) for field in SUMMARY_FIELDS), section_index, subsection_index)
+
+    @property
+    def test_id(self):
+        return self.summary[0]
+
+    @property
+    def title(self):
+        return self.summary[1]
+
+    def as_dict(self) -> dict:
+        """Test summary dict (jo fields None hain woh nahi aati, taaki .get() defaults kaam karein)."""
+        return {field: value for field, value in zip(SUMMARY_FIELDS, self.summary) if value is not None}
+
+    def resolve(self, series_details: dict):
+        """(test, section, subsection) dicts; series ka structure badal gaya ho toh None."""
+        try:
+            section = series_details['sections'][self.section_index]
+            subsection = section['subsections'][self.subsection_index]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return self.as_dict(), section, subsection
+
+
+class SeriesCache:
+    """slug -> series details, sab sessions ke liye ek hi copy (LRU, `ttl` ke baad dobara load)."""
+
+    def __init__(self, max_entries: int = 32, ttl: float = 3600):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # slug -> (expires_at, details)
+
+        # /memstats ke liye counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, slug: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(slug)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(slug, None)
+            self.misses += 1
+            return None
+
+    def put(self, slug: str, details: dict):
+        if not slug or not details:
+            return
+        with self._lock:
+            self._entries[slug] = (time.monotonic() + self.ttl, details)
+            self._entries.move_to_end(slug)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def render_text(self) -> str:
+        with self._lock:
+            entries = [details for _, details in self._entries.values()]
+        size = sum(_pickled_size(details) for details in entries)
+        return (
+            f"📦 **Series cache:** {len(entries)}/{self.max_entries} series (~{size // 1024} KB), "
+            f"{self.hits} hits, {self.misses} misses"
+        )
+
+
+def _pickled_size(value) -> int:
+    """Persistence jaisa hi (pickle) size - memory ka andaaza."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class SessionTracker:
+    """Har user ka last activity time; idle sessions se navigation state hatata hai."""
+
+    def __init__(self, idle_seconds: float = 3600):
+        self.idle_seconds = idle_seconds
+        self.started_at = time.time() # Restart ke baad jo user abhi tak nahi aaya, uska "last seen"
+        self._last_seen = {}          # user_id -> timestamp
+
+        # /memstats ke liye counters
+        self.evicted_sessions = 0
+        self.evicted_bytes = 0
+
+    def touch(self, user_id: int, user_data: dict | None = None):
+        """Har update par: last seen update, aur purane format ki badi keys (agar hon) hata deta hai."""
+        self._last_seen[user_id] = time.time()
+        if user_data:
+            for key in LEGACY_KEYS:
+                user_data.pop(key, None)
+
+    def is_idle(self, user_id: int, now: float | None = None) -> bool:
+        now = now or time.time()
+        return now - self._last_seen.get(user_id, self.started_at) > self.idle_seconds
+
+    @staticmethod
+    def clear(user_data: dict, extra_keys: tuple = ()) -> int:
+        """Navigation keys (aur `extra_keys`) hatata hai. Kitne bytes (pickled) hate, return."""
+        freed = 0
+        for key in NAV_KEYS + LEGACY_KEYS + tuple(extra_keys):
+            if key in user_data:
+                freed += _pickled_size(user_data.pop(key))
+        return freed
+
+    def evict_idle(self, all_user_data, extra_keys: tuple = ()) -> list:
+        """`all_user_data` (user_id -> dict) mein se idle users ki navigation state hatata hai. Evicted user ids return."""
+        now, evicted = time.time(), []
+        for user_id, user_data in list(all_user_data.items()):
+            if not user_data or not self.is_idle(user_id, now):
+                continue
+            freed = self.clear(user_data, extra_keys)
+            if freed:
+                evicted.append(user_id)
+                self.evicted_sessions += 1
+                self.evicted_bytes += freed
+        if evicted:
+            logger.info(f"{len(evicted)} idle sessions ki navigation state hatayi gayi.")
+        return evicted
+
+    def render_text(self, all_user_data) -> str:
+        """/memstats: sessions ka pickled size (key-wise) aur idle/eviction counters."""
+        now, sessions, idle, total = time.time(), 0, 0, 0
+        by_key = {}
+        for user_id, user_data in list(all_user_data.items()):
+            if not user_data:
+                continue
+            sessions += 1
+            idle += self.is_idle(user_id, now)
+            for key, value in list(user_data.items()):
+                size = _pickled_size(value)
+                by_key[key] = by_key.get(key, 0) + size
+                total += size
+        lines = [
+            f"🧠 **Sessions:** {sessions} memory mein ({idle} idle > {int(self.idle_seconds // 60)} min), "
+            f"~{total // 1024} KB (pickled)"
+        ]
+        for key, size in sorted(by_key.items(), key=lambda item: item[1], reverse=True)[:5]:
+            lines.append(f"  • `{key}`: {size / 1024:.1f} KB")
+        lines.append(
+            f"🧹 **Evicted:** {self.evicted_sessions} idle sessions, {self.evicted_bytes // 1024} KB"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import logging
+import threading
+
+from config import BOT_DB_FILE
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Shared SQLite Storage
+# -----------------------------------------------------------------------------
+# Bot ka saara local durable data (file_id cache, jobs, ledgers, indexes)
+# ek hi SQLite file mein rehta hai. Har module apni tables khud banata hai.
+# -----------------------------------------------------------------------------
+
+_connection = None
+_lock = threading.RLock() # Ek connection, kai threads - writes serialize karein
+
+
+def get_connection() -> sqlite3.Connection:
+    """Process-wide SQLite connection return karta hai (pehli call par banata hai)."""
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = sqlite3.connect(BOT_DB_FILE, check_same_thread=False, isolation_level=None)
+            _connection.row_factory = sqlite3.Row
+            # WAL = readers writers ko block nahi karte, aur har commit par poori file sync nahi hoti
+            _connection.execute("PRAGMA journal_mode=WAL")
+            _connection.execute("PRAGMA synchronous=NORMAL")
+            logger.info(f"SQLite storage khola gaya: {BOT_DB_FILE}")
+        return _connection
+
+
+def execute(sql: str, params: tuple = ()) -> sqlite3.Cursor:
+    """Lock ke saath ek statement chalata hai."""
+    with _lock:
+        return get_connection().execute(sql, params)
+
+
+def executemany(sql: str, rows) -> sqlite3.Cursor:
+    """Lock ke saath ek hi transaction mein kai rows likhta hai."""
+    with _lock:
+        conn = get_connection()
+        conn.execute("BEGIN")
+        try:
+            cursor = conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+            return cursor
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def executescript(script: str):
+    """Schema (CREATE TABLE ...) banane ke liye."""
+    with _lock:
+        get_connection().executescript(script)
+
+
+def transaction():
+    """`with storage.transaction() as conn:` - kai statements ek atomic transaction mein."""
+    return _Transaction()
+
+
+class _Transaction:
+    def __enter__(self) -> sqlite3.Connection:
+        _lock.acquire()
+        self.conn = get_connection()
+        self.conn.execute("BEGIN")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            _lock.release()
+        return False
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
 import html
+from functools import lru_cache
 
 def _clean_math_tex(math_string: str) -> str:
     """
@@ -39,6 +40,7 @@ def _clean_math_tex(math_string: str) -> str:
     
     return text.strip()
 
+@lru_cache(maxsize=8192) # Repeat questions/options (question store) ek hi baar clean hote hain
 def _clean_html_to_text(html_string: str) -> str:
     """
     Ek simple HTML remover jo HTML ko plain text mein convert karta hai.
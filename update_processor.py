@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Per-Chat Ordered Update Processor
+# -----------------------------------------------------------------------------
+# Alag-alag chats ke updates concurrently process hote hain (ek admin ka lamba
+# download doosre admin ko nahi rokta), lekin ek hi chat ke updates hamesha
+# aane ke order mein, ek-ek karke chalte hain - taaki text_input_handler ki
+# state machine aur ConversationHandler states gadbad na hon.
+# Global limit (CONCURRENT_UPDATES) ka slot chat ka lock milne ke BAAD liya
+# jaata hai: kisi chat ke line mein lage updates slot nahi gherte, isliye ek
+# busy chat baaki chats ko rok nahi sakta. (PTB ka apna semaphore lock se
+# pehle lagta hai, isliye base class ko bahut badi limit di jaati hai.)
+# -----------------------------------------------------------------------------
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Concurrent updates (bounded), lekin har chat ke andar strict ordering."""
+
+    __slots__ = ('_chat_locks', '_chat_waiting', '_running_slots')
+
+    # Base class ka semaphore sirf pending updates ki upper bound hai, asli limit _running_slots hai
+    PENDING_LIMIT = 4096
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max(self.PENDING_LIMIT, max_concurrent_updates))
+        self._running_slots = asyncio.Semaphore(max(1, max_concurrent_updates))
+        self._chat_locks = {}   # chat key -> asyncio.Lock
+        self._chat_waiting = {} # chat key -> kitne updates lock le rahe/le chuke hain
+
+    @staticmethod
+    def _chat_key(update: object):
+        """Update ka chat ID (ya user ID). Inline queries jaise updates ka koi key nahi hota."""
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return f"user:{update.effective_user.id}"
+        return None
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = self._chat_key(update)
+        if key is None:
+            async with self._running_slots:
+                await coroutine
+            return
+
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_waiting[key] = self._chat_waiting.get(key, 0) + 1
+        try:
+            # asyncio.Lock FIFO hai, isliye updates aane ke order mein hi chalte hain.
+            # Global slot lock ke andar - chat ki line mein intezaar karte updates slot nahi gherte.
+            async with lock:
+                async with self._running_slots:
+                    await coroutine
+        finally:
+            self._chat_waiting[key] -= 1
+            if not self._chat_waiting[key]:
+                # Is chat ka koi update baaki nahi - memory free karein
+                del self._chat_waiting[key]
+                del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
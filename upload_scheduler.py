@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import logging
+from collections import deque
+
+from telegram.error import RetryAfter, NetworkError, TimedOut, BadRequest
+
+from metrics import metrics # Stage timings ke liye
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Adaptive Upload Scheduler
+# -----------------------------------------------------------------------------
+# Telegram Bot API ki limits (approx):
+#   - Global: ~30 messages/second
+#   - Private chat: ~1 message/second
+#   - Group/Channel: ~20 messages/minute
+# Fixed sleep ke bajaye yeh scheduler har chat aur global budget track karta hai,
+# RetryAfter aane par exactly utna hi rukta hai aur wahi send dobara try karta hai.
+# -----------------------------------------------------------------------------
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after int ya timedelta ho sakta hai (PTB version par nirbhar)."""
+    value = error.retry_after
+    if hasattr(value, 'total_seconds'):
+        return value.total_seconds()
+    return float(value)
+
+
+class UploadScheduler:
+    """Per-chat aur global send budgets ke hisaab se Bot API calls ko pace karta hai."""
+
+    def __init__(self, global_per_sec: int = 30, private_per_min: int = 60, group_per_min: int = 20,
+                 max_retries: int = 5, max_interval: float = 30.0):
+        self.global_per_sec = max(1, global_per_sec)
+        self.private_interval = 60.0 / max(1, private_per_min)
+        self.group_interval = 60.0 / max(1, group_per_min)
+        self.max_retries = max_retries
+        self.max_interval = max_interval
+
+        self._global_sent = deque() # Pichhle 1 second ke send timestamps
+        self._chat_next_at = {}     # chat key -> agla allowed send time
+        self._chat_interval = {}    # chat key -> current (adaptive) interval
+        self._chat_streak = {}      # chat key -> lagatar successful sends
+
+        # /stats ke liye counters
+        self.sent = 0
+        self.retry_after_hits = 0
+        self.retried = 0
+        self.failed = 0
+
+    @staticmethod
+    def _chat_key(chat_id) -> str:
+        return str(chat_id)
+
+    def _base_interval(self, key: str) -> float:
+        # Positive ID = private chat; '@username' ya negative ID = group/channel
+        if key.isdigit():
+            return self.private_interval
+        return self.group_interval
+
+    def _interval(self, key: str) -> float:
+        return self._chat_interval.get(key, self._base_interval(key))
+
+    def _global_wait(self, now: float, cost: int) -> float:
+        while self._global_sent and now - self._global_sent[0] >= 1.0:
+            self._global_sent.popleft()
+        if len(self._global_sent) + cost <= self.global_per_sec:
+            return 0.0
+        # Jab tak itne purane slots free na ho jaayein ki `cost` naye aa sakein
+        needed = len(self._global_sent) + cost - self.global_per_sec
+        return self._global_sent[needed - 1] + 1.0 - now
+
+    async def _acquire(self, key: str, cost: int = 1):
+        """Jab tak chat aur global dono budget allow na karein, tab tak wait karta hai."""
+        loop = asyncio.get_running_loop()
+        cost = min(max(1, cost), self.global_per_sec)
+        while True:
+            now = loop.time()
+            wait = max(self._chat_next_at.get(key, 0.0) - now, self._global_wait(now, cost))
+            if wait <= 0:
+                # Check aur reserve ke beech koi await nahi hai, isliye yeh atomic hai
+                self._chat_next_at[key] = now + self._interval(key)
+                self._global_sent.extend([now] * cost)
+                return
+            await asyncio.sleep(wait)
+
+    def _on_success(self, key: str):
+        self.sent += 1
+        # Lagatar success par interval dheere-dheere base ki taraf wapas laayein
+        streak = self._chat_streak.get(key, 0) + 1
+        self._chat_streak[key] = streak
+        if key in self._chat_interval and streak % 10 == 0:
+            base = self._base_interval(key)
+            reduced = max(base, self._chat_interval[key] * 0.8)
+            if reduced <= base:
+                self._chat_interval.pop(key, None)
+            else:
+                self._chat_interval[key] = reduced
+
+    def _on_flood(self, key: str, retry_after: float):
+        self.retry_after_hits += 1
+        self._chat_streak[key] = 0
+        # Chat ko exactly retry_after tak block karein aur aage ke liye pace dheema karein
+        loop = asyncio.get_running_loop()
+        self._chat_next_at[key] = max(self._chat_next_at.get(key, 0.0), loop.time() + retry_after)
+        self._chat_interval[key] = min(self.max_interval, self._interval(key) * 1.5)
+
+    async def send(self, chat_id, send_call, cost: int = 1):
+        """
+        `send_call` ek zero-argument function hai jo Bot API coroutine return karta hai
+        (har attempt par naya coroutine banna zaroori hai). Result return karta hai.
+        `cost` = kitne messages banenge (media group ke liye documents ki ginti);
+        yeh global budget se kat-ta hai, chat ka pace ek hi call ke hisaab se chalta hai.
+        """
+        key = self._chat_key(chat_id)
+        attempt = 0
+        while True:
+            with metrics.timed('upload_wait'):
+                await self._acquire(key, cost)
+            started_at = time.perf_counter()
+            try:
+                result = await send_call()
+            except RetryAfter as e:
+                seconds = _retry_after_seconds(e)
+                self._on_flood(key, seconds)
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                attempt += 1
+                self.retried += 1
+                logger.warning(f"Chat {chat_id} par flood limit: {seconds}s ruk kar dobara bhej rahe hain (attempt {attempt}).")
+                continue
+            except TimedOut:
+                # Upload shayad server tak pahunch gaya ho - duplicate se bachne ke liye retry nahi
+                self.failed += 1
+                raise
+            except BadRequest:
+                # BadRequest bhi NetworkError ka subclass hai, par yeh permanent hai (parse error, chat not found,
+                # bad file_id...) - retry bekaar hai, caller turant fallback kar sake
+                self.failed += 1
+                raise
+            except NetworkError as e:
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                attempt += 1
+                self.retried += 1
+                backoff = min(self.max_interval, 2 ** attempt)
+                logger.warning(f"Chat {chat_id} par network error ({e}), {backoff}s baad retry (attempt {attempt}).")
+                await asyncio.sleep(backoff)
+                continue
+            metrics.observe('upload', time.perf_counter() - started_at)
+            self._on_success(key)
+            self.sent += cost - 1 # _on_success ek gin chuka hai
+            return result
+
+    def render_text(self) -> str:
+        """/stats ke liye chhota summary."""
+        slowed = len(self._chat_interval)
+        return (
+            f"📤 **Uploads:** {self.sent} sent, {self.retried} retried, {self.failed} failed\n"
+            f"⏳ **Flood waits (RetryAfter):** {self.retry_after_hits} (abhi {slowed} chat slow pace par)"
+        )
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import zlib
+import logging
+import zipfile
+import tempfile
+
+logger = logging.getLogger(__name__) # Logger instance banayein
+
+# -----------------------------------------------------------------------------
+# Streaming ZIP Parts (bulk "zip" format)
+# -----------------------------------------------------------------------------
+# Bulk run ke saare tests ki files ek-ek document ki jagah ZIP mein jaati hain.
+# ZIP ek SpooledTemporaryFile mein likhi jaati hai (chhoti ho toh memory mein,
+# badi hone par apne-aap disk par), isliye poora archive kabhi RAM mein nahi
+# rehta. Agla test jodne se part upload limit paar kar sakta hai toh pehle
+# wala part band ho kar upload ke liye lauta diya jaata hai aur naya part
+# shuru hota hai. Ek test ki saari files hamesha ek hi part mein rehti hain.
+# -----------------------------------------------------------------------------
+
+# Local file header (30) + data descriptor/zip64 extra ke liye thodi jagah
+_LOCAL_OVERHEAD = 30 + 40
+# Central directory entry (46) + extra
+_CENTRAL_OVERHEAD = 46 + 40
+# End of central directory record (+ zip64 records ki jagah)
+_END_OVERHEAD = 22 + 76
+
+
+def _max_deflated_size(size: int) -> int:
+    """Deflate ka worst case (incompressible data) - isse bada compressed output kabhi nahi hota."""
+    return size + 5 * (size // 16383 + 1) + 64
+
+
+class ZipPart:
+    """Band ho chuka ZIP part - `file` shuru par rewound hai, upload ke baad `close()` karein."""
+
+    __slots__ = ('number', 'file', 'filename', 'size', 'file_count', 'labels')
+
+    def __init__(self, number, file, filename, size, file_count, labels):
+        self.number = number
+        self.file = file
+        self.filename = filename
+        self.size = size
+        self.file_count = file_count
+        self.labels = labels # Is part mein aaye tests (add_files ka `label`)
+
+    def close(self):
+        self.file.close()
+
+
+class ZipPartWriter:
+    """Tests ki files ko ek ke baad ek ZIP parts mein likhta hai, har part `max_bytes` ke andar."""
+
+    def __init__(self, base_name: str, max_bytes: int, spool_bytes: int = 8 * 1024 * 1024, compresslevel: int = 6):
+        self.base_name = base_name
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.compresslevel = compresslevel
+        self.parts_closed = 0
+        self.bytes_in = 0  # Files ka asli size
+        self.bytes_out = 0 # Band hue parts ka total size
+        self._zip = None
+        self._file = None
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self._names = set()
+        self._labels = []
+        self._central_bytes = 0
+        self._file_count = 0
+
+    def _open_part(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        self._zip = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+
+    def _current_size(self) -> int:
+        """Agar part abhi band ho toh kitna bada hoga."""
+        if self._zip is None:
+            return 0
+        return self._file.tell() + self._central_bytes + _END_OVERHEAD
+
+    def _unique_name(self, name: str) -> str:
+        if name not in self._names:
+            return name
+        stem, dot, ext = name.rpartition('.')
+        if not dot:
+            stem, ext = name, ''
+        counter = 2
+        while f"{stem} ({counter}){dot}{ext}" in self._names:
+            counter += 1
+        return f"{stem} ({counter}){dot}{ext}"
+
+    def add_files(self, files: list, label=None) -> ZipPart | None:
+        """
+        `files` = [(naam, bytes), ...] (ek test ki saari files) current part mein jodta hai.
+        Jagah na ho toh pehle current part band karke use return karta hai (upload ke liye), warna None.
+        """
+        needed = sum(
+            _LOCAL_OVERHEAD + _CENTRAL_OVERHEAD + 2 * len(name.encode('utf-8')) + _max_deflated_size(len(data))
+            for name, data in files
+        )
+        closed = None
+        if self._file_count and self._current_size() + needed > self.max_bytes:
+            closed = self.close_part()
+
+        if self._zip is None:
+            self._open_part()
+        for name, data in files:
+            name = self._unique_name(name)
+            self._names.add(name)
+            self._zip.writestr(name, data)
+            self._central_bytes += _CENTRAL_OVERHEAD + len(name.encode('utf-8'))
+            self._file_count += 1
+            self.bytes_in += len(data)
+        self._labels.append(label)
+        if self._current_size() > self.max_bytes:
+            # Akela test hi limit se bada hai - part phir bhi banta hai, upload fail ho sakta hai
+            logger.warning(f"ZIP part {self.parts_closed + 1} ({label}) limit ({self.max_bytes} bytes) se bada ho gaya.")
+        return closed
+
+    def close_part(self) -> ZipPart | None:
+        """Current part band karke return karta hai (khaali ho toh None)."""
+        if self._zip is None:
+            return None
+        self._zip.close()
+        size = self._file.tell()
+        self._file.seek(0)
+        self.parts_closed += 1
+        self.bytes_out += size
+        part = ZipPart(self.parts_closed, self._file, f"{self.base_name} - Part {self.parts_closed}.zip",
+                       size, self._file_count, list(self._labels))
+        self._zip = None
+        self._file = None
+        self._reset_counters()
+        return part
+
+    def discard(self):
+        """Adhoora part phenk deta hai (job fail hone par)."""
+        if self._zip is not None:
+            try:
+                self._zip.close()
+            except (OSError, ValueError, zlib.error):
+                pass
+            self._file.close()
+        self._zip = None
+        self._file = None
+        self._reset_counters()